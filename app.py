@@ -7,12 +7,16 @@ Main application entry point using Google ADK
 
 import sys
 from agents.dearly_agent import DearlyAgent
-from utils.file_importer import FileImporter
 from config import config
 
 
 def main():
     """Main application entry point"""
+    # `dearly serve` runs the chat server instead of the console
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from server import main as serve
+        return serve(sys.argv[2:])
+    
     print(f"Welcome to {config.PROJECT_NAME} v{config.VERSION}")
     print(config.DESCRIPTION)
     print("Bringing cherished messages back to life, one text at a time.\n")
@@ -67,10 +71,12 @@ def load_memories(dearly_agent):
     if file_path.lower() == 'cancel':
         return
     
+    # Chat exports mix both sides of the conversation
+    sender = input("Whose messages should be learned from? (press Enter for all): ").strip()
+    
     try:
-        importer = FileImporter()
-        memory_data = importer.import_file(file_path)
-        dearly_agent.load_memories(memory_data)
+        # Stream the file so large archives never sit in memory whole
+        dearly_agent.load_memory_file(file_path, sender=sender or None)
         print("Memories loaded successfully!")
     except FileNotFoundError:
         print("File not found. Please check the path and try again.")
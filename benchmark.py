@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for Dearly - A Memory-Pattern Companion
+
+Run with:
+    python benchmark.py
+
+Each benchmark doubles its input size and reports the time taken, so
+scaling behavior can be read off directly from the output.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.memory_agent import MemoryAgent
+from agents.personality_agent import PersonalityAgent
+from agents.retrieval import PassageRetriever
+from agents.response_agent import ResponseAgent
+from agents.response_backend import HTTPModelBackend
+from agents.response_cache import ResponseCache
+from agents.semantic_memory import EmbeddingStore, HashedNgramEncoder
+from stub_model_server import StubModelServer
+
+
+def build_corpus(size_bytes):
+    """
+    Build a synthetic message corpus of roughly the given size
+    
+    Args:
+        size_bytes (int): Approximate corpus size in bytes
+    
+    Returns:
+        str: Synthetic corpus
+    """
+    with open("sample_memories.txt", "r", encoding="utf-8") as file:
+        sample = file.read()
+    repeats = max(1, size_bytes // len(sample))
+    return sample * repeats
+
+
+def time_call(func, *args):
+    """
+    Time a single call
+    
+    Returns:
+        float: Elapsed seconds
+    """
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def bench_personality_analysis(sizes_mb=(1, 2, 4, 8)):
+    """Show that PersonalityAgent.analyze_text scales linearly with corpus size"""
+    print("PersonalityAgent.analyze_text")
+    previous = None
+    for size_mb in sizes_mb:
+        corpus = build_corpus(size_mb * 1024 * 1024)
+        elapsed = time_call(PersonalityAgent().analyze_text, corpus)
+        ratio = f"x{elapsed / previous:.2f}" if previous else ""
+        print(f"  {size_mb:>4} MB  {elapsed:8.3f} s  {size_mb / elapsed:8.2f} MB/s  {ratio}")
+        previous = elapsed
+
+
+def bench_parallel_analysis(size_mb=64):
+    """Compare serial and multi-process personality analysis"""
+    print(f"PersonalityAgent.analyze_text_parallel ({size_mb} MB)")
+    corpus = build_corpus(size_mb * 1024 * 1024)
+    serial = time_call(PersonalityAgent().analyze_text, corpus)
+    print(f"  serial      {serial:8.3f} s")
+    workers = os.cpu_count() or 1
+    parallel = time_call(PersonalityAgent().analyze_text_parallel, corpus, workers)
+    print(f"  {workers:>2} workers  {parallel:8.3f} s  x{serial / parallel:.2f} speedup")
+
+
+def bench_memory_search(turn_counts=(125000, 250000, 500000, 1000000)):
+    """Show that indexed memory search stays fast as history grows"""
+    print("MemoryAgent.search_messages (top 20)")
+    lines = [line for line in build_corpus(1).splitlines() if line.strip()]
+    queries = ("smile", "park raining", '"make me smile"')
+    agent = MemoryAgent()
+    for turn_count in turn_counts:
+        while agent.message_count < turn_count:
+            agent.store_message("user", lines[agent.message_count % len(lines)])
+        timings = "  ".join(f"{query} {time_call(agent.search_messages, query, 20) * 1000:7.2f} ms"
+                            for query in queries)
+        print(f"  {turn_count:>8} turns  {timings}")
+
+
+def bench_retrieval(passage_counts=(25000, 50000, 100000)):
+    """Show that BM25 retrieval latency stays bounded as the corpus grows"""
+    print("PassageRetriever.retrieve (top 3, uncached)")
+    lines = [line.strip() for line in build_corpus(1).splitlines() if line.strip()]
+    query = "I remember the rain in the park, you always made me smile"
+    retriever = PassageRetriever(cache_size=0)
+    for passage_count in passage_counts:
+        while len(retriever) < passage_count:
+            retriever.add_passage(f"{lines[len(retriever) % len(lines)]} #{len(retriever)}")
+        elapsed = min(time_call(retriever.retrieve, query) for _ in range(5))
+        print(f"  {passage_count:>8} passages  {elapsed * 1000:7.2f} ms")
+
+
+def bench_semantic_recall(row_counts=(250000, 500000, 1000000)):
+    """Show the cost of one batched top-k recall over the embedding matrix"""
+    print("EmbeddingStore.search (top 5)")
+    encoder = HashedNgramEncoder()
+    lines = [line.strip() for line in build_corpus(1).splitlines() if line.strip()]
+    vectors = encoder.encode_batch(lines)
+    query = encoder.encode("walking in the rain at the park")
+    store = EmbeddingStore(encoder.dimensions)
+    for row_count in row_counts:
+        while len(store) < row_count:
+            store.add_batch(vectors[:min(len(vectors), row_count - len(store))])
+        elapsed = min(time_call(store.search, query, 5) for _ in range(5))
+        print(f"  {row_count:>8} rows  {elapsed * 1000:7.2f} ms")
+
+
+def bench_model_backend(clients=64, prompts=1024, latency=0.02):
+    """Show how batching concurrent prompts raises throughput against a stub model"""
+    print(f"HTTPModelBackend.generate ({clients} clients, {latency * 1000:.0f} ms per model call)")
+    with StubModelServer(latency=latency) as stub:
+        for max_batch in (1, 4, 16):
+            backend = HTTPModelBackend(stub.url, max_batch=max_batch)
+            calls = stub.calls
+            with ThreadPoolExecutor(clients) as executor:
+                elapsed = time_call(lambda: list(executor.map(backend.generate, map(str, range(prompts)))))
+            backend.close()
+            print(f"  batch {max_batch:>3}  {prompts / elapsed:8.0f} replies/s  {stub.calls - calls:>6} model calls")
+
+
+def bench_response_cache(messages=300, latency=0.02):
+    """Show how the reply cache absorbs repeated greetings against a stub model"""
+    greetings = ["hi", "Hi!", "good night", "Good night!", "morning", "Good morning", "miss you", "I miss you"]
+    print(f"ResponseAgent.generate_response ({messages} messages, {len(greetings)} greetings, "
+          f"{latency * 1000:.0f} ms per model call)")
+    with StubModelServer(latency=latency) as stub:
+        backend = HTTPModelBackend(stub.url)
+        for cache in (None, ResponseCache()):
+            agent = ResponseAgent(backend, cache)
+            calls = stub.calls
+            elapsed = time_call(lambda: [agent.generate_response(greetings[i % len(greetings)])
+                                         for i in range(messages)])
+            hit_rate = f"{cache.get_statistics()['hit_rate']:6.1%} hits" if cache is not None else "  no cache"
+            print(f"  {messages / elapsed:8.0f} replies/s  {stub.calls - calls:>6} model calls  {hit_rate}")
+        backend.close()
+
+
+def main():
+    """Run all benchmarks"""
+    bench_personality_analysis()
+    bench_parallel_analysis()
+    bench_memory_search()
+    bench_retrieval()
+    bench_semantic_recall()
+    bench_model_backend()
+    bench_response_cache()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+Conversation Compaction
+
+Rolls older conversation turns into compact summaries (topic keywords,
+a sentiment tally and salient phrases) so long sessions keep their
+continuity without holding every raw turn in RAM.
+"""
+
+from collections import Counter
+
+from .memory_index import tokenize
+from .message_record import to_iso
+from .personality_agent import NEGATIVE_WORDS, POSITIVE_WORDS, STOP_WORDS
+from .text_analysis import TextStatistics
+
+SUMMARY_KEYWORDS = 8
+SUMMARY_PHRASES = 3
+
+_POSITIVE = frozenset(POSITIVE_WORDS)
+_NEGATIVE = frozenset(NEGATIVE_WORDS)
+
+
+def _turn_sentiment(text):
+    """Classify one turn by counting sentiment keywords"""
+    words = tokenize(text)
+    positive = sum(1 for word in words if word in _POSITIVE)
+    negative = sum(1 for word in words if word in _NEGATIVE)
+    if positive > negative:
+        return "positive"
+    if negative > positive:
+        return "negative"
+    return "neutral"
+
+
+class ConversationSummary:
+    """Compact stand-in for a run of consecutive turns"""
+    
+    __slots__ = ("first_id", "last_id", "start", "end", "turn_count",
+                 "keywords", "sentiment", "phrases")
+    
+    def __init__(self, first_id, last_id, start, end, turn_count, keywords, sentiment, phrases):
+        """
+        Initialize a summary
+        
+        Args:
+            first_id (int): Message id of the first summarized turn
+            last_id (int): Message id of the last summarized turn
+            start (float): Epoch timestamp of the first turn
+            end (float): Epoch timestamp of the last turn
+            turn_count (int): Number of summarized turns
+            keywords (dict): Topic keyword counts
+            sentiment (dict): Turns per sentiment ("positive", "negative", "neutral")
+            phrases (dict): Salient phrase counts
+        """
+        self.first_id = first_id
+        self.last_id = last_id
+        self.start = start
+        self.end = end
+        self.turn_count = turn_count
+        self.keywords = keywords
+        self.sentiment = sentiment
+        self.phrases = phrases
+    
+    @classmethod
+    def from_records(cls, first_id, records):
+        """
+        Summarize consecutive turns
+        
+        Args:
+            first_id (int): Message id of the first turn
+            records (list): MessageRecord objects, oldest first
+        
+        Returns:
+            ConversationSummary: The summary
+        """
+        stats = TextStatistics.from_text([record.message for record in records])
+        keywords = Counter({word: count for word, count in stats.word_counts.items()
+                            if len(word) > 3 and word.isalpha() and word not in STOP_WORDS})
+        sentiment = Counter(_turn_sentiment(record.message) for record in records)
+        return cls(
+            first_id,
+            first_id + len(records) - 1,
+            records[0].timestamp,
+            records[-1].timestamp,
+            len(records),
+            dict(_top(keywords, SUMMARY_KEYWORDS)),
+            dict(sentiment),
+            dict(_top(stats.phrase_counts, SUMMARY_PHRASES))
+        )
+    
+    def merge(self, newer):
+        """
+        Combine with the summary that directly follows this one
+        
+        Args:
+            newer (ConversationSummary): The following summary
+        
+        Returns:
+            ConversationSummary: One summary covering both
+        """
+        return ConversationSummary(
+            self.first_id,
+            newer.last_id,
+            self.start,
+            newer.end,
+            self.turn_count + newer.turn_count,
+            dict(_top(Counter(self.keywords) + Counter(newer.keywords), SUMMARY_KEYWORDS)),
+            dict(Counter(self.sentiment) + Counter(newer.sentiment)),
+            dict(_top(Counter(self.phrases) + Counter(newer.phrases), SUMMARY_PHRASES))
+        )
+    
+    @property
+    def overall_sentiment(self):
+        """Most common sentiment across the summarized turns"""
+        if not self.sentiment:
+            return "neutral"
+        return max(sorted(self.sentiment), key=self.sentiment.get)
+    
+    @property
+    def text(self):
+        """Readable one-line summary for response context"""
+        text = f"Earlier ({self.turn_count} turns)"
+        if self.keywords:
+            text += ": talked about " + ", ".join(self.keywords)
+        text += f"; mostly {self.overall_sentiment}"
+        if self.phrases:
+            text += "; said " + ", ".join(f'"{phrase}"' for phrase in self.phrases)
+        return text
+    
+    def to_dict(self):
+        """
+        Get a dict view of the summary
+        
+        Returns:
+            dict: Summary fields with ISO timestamps
+        """
+        return {
+            "first_id": self.first_id,
+            "last_id": self.last_id,
+            "start": to_iso(self.start),
+            "end": to_iso(self.end),
+            "turn_count": self.turn_count,
+            "keywords": list(self.keywords),
+            "sentiment": dict(self.sentiment),
+            "phrases": list(self.phrases),
+            "summary": self.text
+        }
+    
+    def __getitem__(self, key):
+        # Summaries sit in context lists next to turns, so they answer the same keys
+        if key == "sender":
+            return "summary"
+        if key == "message":
+            return self.text
+        if key == "timestamp":
+            return to_iso(self.end)
+        raise KeyError(key)
+    
+    def get(self, key, default=None):
+        """
+        Look up a field like dict.get
+        
+        Args:
+            key (str): "sender", "message" or "timestamp"
+            default (any): Value for unknown keys
+        
+        Returns:
+            any: The field value
+        """
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def __repr__(self):
+        return f"ConversationSummary(first_id={self.first_id}, last_id={self.last_id}, turn_count={self.turn_count})"
+
+
+def _top(counts, limit):
+    """Highest counts first, ties alphabetical"""
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
\ No newline at end of file
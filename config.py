@@ -21,11 +21,56 @@ class Config:
     # Memory settings
     MAX_SESSION_MEMORY = 100
     MEMORY_SAVE_INTERVAL = 10  # Save memory every 10 interactions
+    LOG_SYNC_INTERVAL = 10  # fsync the conversation log every 10 turns
+    
+    # Compaction settings
+    BACKGROUND_COMPACTION = True
+    COMPACTION_THRESHOLD = 1000  # Raw archived turns kept before compacting
+    COMPACTION_BATCH = 200  # Turns rolled into each summary
+    MAX_SUMMARIES = 50  # Oldest summaries are merged beyond this
+    CONTEXT_SUMMARIES = 2  # Summaries included in response context
+    
+    # Session settings
+    MAX_ACTIVE_SESSIONS = 1000  # Sessions kept in RAM; each holds an open log file
+    SESSION_IDLE_TIMEOUT = 1800  # seconds before an idle session is evicted to disk
+    SESSION_EVICTION_INTERVAL = 60  # seconds between the server's sweeps for idle sessions
+    SESSION_EMOTION_HISTORY = 100  # Analyzed messages a session keeps; older ones are only counted
+    
+    # Server settings
+    SERVER_HOST = "127.0.0.1"
+    SERVER_PORT = 8765
+    SERVER_MAX_CONCURRENT = 32  # Replies generated at once
+    SERVER_MAX_PENDING = 256  # Replies waiting for a slot before new ones get 503
+    
+    # Retrieval settings
+    RETRIEVAL_TOP_K = 3  # Passages added to the response context
+    RETRIEVAL_PASSAGE_WORDS = 80
+    RETRIEVAL_MAX_POSTINGS = 1000  # Postings scored per query term
+    RETRIEVAL_MAX_QUERY_TERMS = 6
+    RETRIEVAL_CACHE_SIZE = 256  # Queries kept in the LRU cache
+    RETRIEVAL_CONVERSATION_PASSAGES = 500  # Newest conversation turns kept retrievable
+    
+    # Semantic memory settings
+    ENABLE_SEMANTIC_MEMORY = True
+    EMBEDDING_DIMENSIONS = 256
     
     # Response settings
     MAX_RESPONSE_LENGTH = 500
     DEFAULT_RESPONSE_TIMEOUT = 30  # seconds
     
+    # Model backend settings; without a URL, replies come from built-in templates
+    MODEL_BACKEND_URL = os.environ.get("DEARLY_MODEL_URL")
+    MODEL_NAME = "gemini-2.5-flash"
+    MODEL_POOL_SIZE = 8  # Connections, and batches in flight
+    MODEL_MAX_BATCH = 16  # Prompts per request
+    MODEL_BATCH_WINDOW = 0.0  # seconds to wait for more prompts before sending
+    
+    # Response cache settings; repeated messages reuse model replies
+    RESPONSE_CACHE_SIZE = 1024  # Keys kept per companion; 0 disables the cache
+    RESPONSE_CACHE_TTL = 3600  # seconds
+    RESPONSE_CACHE_VARIANTS = 3  # Replies generated per key before hits sample among them
+    RESPONSE_CACHE_CONTEXT_TURNS = 2  # Earlier turns that are part of the key
+    
     # Safety settings
     ENABLE_SAFETY_CHECKS = True
     BLOCK_INAPPROPRIATE_CONTENT = True
@@ -35,8 +80,12 @@ class Config:
     EMOTION_LOGGING = True
     
     # File import settings
-    SUPPORTED_FILE_FORMATS = [".txt", ".json", ".csv", ".md"]
+    SUPPORTED_FILE_FORMATS = [".txt", ".json", ".csv", ".md", ".jsonl"]
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+    # Cross-file deduplication of imported messages
+    IMPORT_DEDUP_MIN_LENGTH = 32  # Undated messages shorter than this are never treated as repeats
+    IMPORT_SEEN_MESSAGES_MAX = 1000000  # Message digests the manifest keeps, oldest dropped first
+    IMPORT_SEEN_MESSAGES_MAX_AGE = 365 * 24 * 3600  # seconds since a digest was last seen
     
     # Demo settings
     DEMO_MODE = False
@@ -0,0 +1,198 @@
+"""
+Conversation Log
+
+Durable, append-only JSONL log of conversation turns. Each turn costs
+one line write; fsync is batched so several turns share one disk sync
+(group commit).
+"""
+
+import os
+import json
+import threading
+
+from config import config
+
+from .message_record import MessageRecord
+
+
+class ConversationLog:
+    """Append-only log file of conversation turns"""
+    
+    def __init__(self, log_path, sync_interval=None, truncate=False):
+        """
+        Open a conversation log for appending
+        
+        Args:
+            log_path (str): JSONL file the turns are appended to
+            sync_interval (int, optional): Turns per fsync; defaults to
+                config.LOG_SYNC_INTERVAL
+            truncate (bool): Start a new log instead of extending an existing one
+        """
+        self.log_path = log_path
+        self.sync_interval = max(sync_interval or config.LOG_SYNC_INTERVAL, 1)
+        self.pending = 0
+        self._lock = threading.Lock()
+        if not truncate:
+            _trim_torn_tail(log_path)
+        # newline='' keeps line lengths, and so offsets, the same on every platform
+        self._file = open(log_path, 'w' if truncate else 'a', encoding='utf-8', newline='')
+        # Bytes in the log, which is the offset the next line starts at
+        self.size = 0 if truncate else os.path.getsize(log_path)
+    
+    def append(self, record):
+        """
+        Append one turn, syncing once a full group is pending
+        
+        Args:
+            record (MessageRecord): The turn to log
+        
+        Returns:
+            int: Byte offset of the turn's line, for read_log_entry
+        """
+        line = json.dumps(record.to_dict(), ensure_ascii=False) + "\n"
+        with self._lock:
+            offset = self.size
+            self._file.write(line)
+            self.size += len(line.encode('utf-8'))
+            self.pending += 1
+            if self.pending >= self.sync_interval:
+                self._sync()
+        return offset
+    
+    def extend(self, records):
+        """
+        Append several turns with a single sync at the end
+        
+        Args:
+            records (iterable): MessageRecord objects
+        
+        Returns:
+            list: Byte offset of each turn's line
+        """
+        offsets = []
+        with self._lock:
+            for record in records:
+                line = json.dumps(record.to_dict(), ensure_ascii=False) + "\n"
+                offsets.append(self.size)
+                self._file.write(line)
+                self.size += len(line.encode('utf-8'))
+                self.pending += 1
+            self._sync()
+        return offsets
+    
+    def commit(self):
+        """Flush and fsync every pending turn"""
+        with self._lock:
+            self._sync()
+    
+    def _sync(self):
+        """Flush the buffer and fsync the file; the lock must be held"""
+        if self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.pending = 0
+    
+    def close(self):
+        """Commit pending turns and close the file"""
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _trim_torn_tail(log_path, block_size=4096):
+    """Cut a partial last line off a log so new turns start on a fresh line"""
+    try:
+        file = open(log_path, 'r+b')
+    except FileNotFoundError:
+        return
+    with file:
+        end = file.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(position - block_size, 0)
+            file.seek(start)
+            block = file.read(position - start)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            file.truncate(position)
+
+
+def iter_log(log_path):
+    """
+    Stream turns back from a conversation log, oldest first
+    
+    A torn last line, left by a crash mid-write, is ignored.
+    
+    Args:
+        log_path (str): JSONL conversation log
+    
+    Yields:
+        MessageRecord: Logged turns
+    
+    Raises:
+        ValueError: If a line other than the last one is corrupt
+    """
+    for offset, record in iter_log_entries(log_path):
+        yield record
+
+
+def iter_log_entries(log_path):
+    """
+    Stream turns with the byte offset of their line, for read_log_entry
+    
+    Args:
+        log_path (str): JSONL conversation log
+    
+    Yields:
+        tuple: (offset, MessageRecord) per logged turn
+    
+    Raises:
+        ValueError: If a line other than the last one is corrupt
+    """
+    with open(log_path, 'rb') as file:
+        offset = 0
+        for line in file:
+            line_offset = offset
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                if file.readline():
+                    raise
+                return
+            yield line_offset, _record_from_entry(entry)
+
+
+def read_log_entry(log_path, offset):
+    """
+    Read the single turn logged at a byte offset
+    
+    Args:
+        log_path (str): JSONL conversation log
+        offset (int): Offset from iter_log_entries
+    
+    Returns:
+        MessageRecord: The logged turn
+    """
+    with open(log_path, 'rb') as file:
+        file.seek(offset)
+        return _record_from_entry(json.loads(file.readline()))
+
+
+def _record_from_entry(entry):
+    """Build a message record from a decoded log line"""
+    return MessageRecord(entry["sender"], entry["message"], entry.get("timestamp"))
\ No newline at end of file
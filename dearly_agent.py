@@ -4,24 +4,50 @@ Dearly Agent - Core orchestrator for the memory-pattern companion
 This agent coordinates all sub-agents to provide a cohesive experience.
 """
 
+import os
+import heapq
+
+from config import config
 from google.adk.agents import Agent
+from utils.file_importer import FileImporter
 from .personality_agent import PersonalityAgent
 from .memory_agent import MemoryAgent
 from .response_agent import ResponseAgent
+from .response_backend import HTTPModelBackend
+from .response_cache import ResponseCache
 from .emotion_agent import EmotionAgent
+from .pipeline import AsyncResponsePipeline
+from .retrieval import PassageRetriever
+from .text_analysis import iter_documents
 
 
-class DearlyAgent:
+class DearlyAgent(AsyncResponsePipeline):
     """Main orchestrator agent for Dearly using Google ADK"""
     
-    def __init__(self):
-        """Initialize the Dearly agent and all sub-agents"""
+    def __init__(self, backend=None):
+        """
+        Initialize the Dearly agent and all sub-agents
+        
+        Args:
+            backend (ResponseBackend, optional): Model writing the replies;
+                defaults to one for config.MODEL_BACKEND_URL, if set
+        """
         # Initialize all sub-agents
         self.personality_agent = PersonalityAgent()
         self.memory_agent = MemoryAgent()
-        self.response_agent = ResponseAgent()
+        # Replies come from the model server when one is configured
+        if backend is None and config.MODEL_BACKEND_URL:
+            backend = HTTPModelBackend()
+        self.response_agent = ResponseAgent(backend, ResponseCache() if backend is not None else None)
         self.emotion_agent = EmotionAgent()
         
+        # BM25 index over imported letters
+        self.retriever = PassageRetriever()
+        # Separate, bounded index over the newest turns of the conversation,
+        # so a long session neither grows the letter index nor clears its cache
+        self.conversation_retriever = PassageRetriever()
+        self.conversation_passages = []
+        
         # Store personality profile
         self.personality_profile = {}
     
@@ -34,10 +60,16 @@ class DearlyAgent:
             user_input = input("You: ")
             if user_input.lower() in ['quit', 'exit', 'bye']:
                 print("Goodbye! Take care.")
+                self.memory_agent.close()
+                if self.response_agent.backend is not None:
+                    self.response_agent.backend.close()
                 break
             
-            response = self.generate_response(user_input)
-            print(f"Companion: {response}")
+            # Show the reply as it is written rather than once it is finished
+            print("Companion: ", end="", flush=True)
+            for chunk in self.stream_response(user_input):
+                print(chunk, end="", flush=True)
+            print()
     
     def generate_response(self, user_input):
         """
@@ -56,33 +88,163 @@ class DearlyAgent:
         user_sentiment = self.emotion_agent.analyze_sentiment(user_input, "user")
         
         # Generate response using response agent with personality context
-        context = self.memory_agent.get_recent_context()
+        context = self.memory_agent.get_recent_context(include_summaries=True)
+        
+        # Pull in the past memories most relevant to this message
+        memories = self._retrieve_memories(user_input)
+        
+        response = self.response_agent.generate_response(user_input, context, memories)
+        
+        self._record_reply(user_input, response)
+        
+        return response
+    
+    def stream_response(self, user_input):
+        """
+        Generate a response chunk by chunk
+        
+        The turn is prepared as in generate_response; the reply is then
+        passed on as the response agent produces it, and stored once it is
+        complete (or, if the caller stops early, as far as it was sent).
+        
+        Args:
+            user_input (str): The user's message
         
-        # Enhance response with personality profile
-        if self.personality_profile:
-            # Pass personality profile to response agent
-            self.response_agent.set_personality_profile(self.personality_profile)
+        Yields:
+            str: Chunks of the companion's response
+        """
+        self.memory_agent.store_message("user", user_input)
+        self.emotion_agent.analyze_sentiment(user_input, "user")
+        context = self.memory_agent.get_recent_context(include_summaries=True)
+        memories = self._retrieve_memories(user_input)
         
-        response = self.response_agent.generate_response(user_input, context)
+        sent = []
+        try:
+            for chunk in self.response_agent.stream_response(user_input, context, memories):
+                sent.append(chunk)
+                yield chunk
+        finally:
+            if sent:
+                self._record_reply(user_input, "".join(sent))
+    
+    def _retrieve_memories(self, user_input):
+        """
+        Find the past memories most relevant to a message
         
+        Args:
+            user_input (str): The user's message
+        
+        Returns:
+            list: Passages from PassageRetriever.retrieve
+        """
+        memories = self.retriever.retrieve(user_input) + self.conversation_retriever.retrieve(user_input)
+        return heapq.nlargest(config.RETRIEVAL_TOP_K, memories, key=lambda memory: memory["score"])
+        
+    def _record_reply(self, user_input, response):
+        """
+        Store a reply and index the exchange
+        
+        Args:
+            user_input (str): The user's message
+            response (str): The companion's response
+        """
         # Store companion response in memory
         self.memory_agent.store_message("companion", response)
         
+        # Make this exchange retrievable in later turns
+        self._index_conversation(user_input)
+        self._index_conversation(response)
+        
         # Analyze sentiment of companion response
-        companion_sentiment = self.emotion_agent.analyze_sentiment(response, "companion")
+        self.emotion_agent.analyze_sentiment(response, "companion")
+    
+    def _index_conversation(self, text):
+        """
+        Add a turn to the conversation index
         
-        return response
+        Once the index holds twice config.RETRIEVAL_CONVERSATION_PASSAGES
+        turns it is rebuilt from the newest half, so its size, and the
+        latency of searching it, stay bounded at an amortized constant
+        cost per turn.
+        
+        Args:
+            text (str): The message
+        """
+        limit = config.RETRIEVAL_CONVERSATION_PASSAGES
+        self.conversation_passages.append(text)
+        if len(self.conversation_passages) <= 2 * limit:
+            self.conversation_retriever.add_passage(text, "conversation")
+            return
+        
+        self.conversation_passages = self.conversation_passages[-limit:]
+        self.conversation_retriever = PassageRetriever()
+        for passage in self.conversation_passages:
+            self.conversation_retriever.add_passage(passage, "conversation")
     
-    def load_memories(self, memory_data):
+    def load_memories(self, memory_data, max_workers=None):
         """
         Load memory data for the companion
         
         Args:
             memory_data (dict): The memory data to load
+            max_workers (int, optional): Processes to analyze with; serial if not given
         """
+        # Index passages for retrieval as the analysis reads the documents
+        memory_data = self._index_documents(iter_documents(memory_data))
+        
         # Analyze personality from memory data
-        personality_profile = self.personality_agent.analyze_text(memory_data)
+        if max_workers:
+            personality_profile = self.personality_agent.analyze_text_parallel(memory_data, max_workers)
+        else:
+            personality_profile = self.personality_agent.analyze_text(memory_data)
+        
+        return self._apply_personality_profile(personality_profile)
+    
+    def load_memory_file(self, file_path, max_workers=None, sender=None):
+        """
+        Load memories straight from a file without reading it whole
+        
+        Text and Markdown archives are memory-mapped and analyzed range by
+        range; chat exports are parsed into message records so only the
+        message text is analyzed.
         
+        Args:
+            file_path (str): Path to the memory file
+            max_workers (int, optional): Processes to analyze with; serial if not given
+            sender (str, optional): Only learn from this sender's messages
+        """
+        importer = FileImporter()
+        _, ext = os.path.splitext(file_path)
+        if ext in ('.txt', '.md'):
+            ranges = list(importer.iter_message_ranges(file_path))
+            # Passages are kept as offsets into the file, not as text
+            self.retriever.add_mapped_file(file_path, "letters")
+            personality_profile = self.personality_agent.analyze_mapped_file(file_path, ranges, max_workers or 1)
+            return self._apply_personality_profile(personality_profile)
+        
+        return self.load_memories(importer.iter_messages(file_path, sender), max_workers)
+    
+    def _index_documents(self, documents):
+        """
+        Index documents for retrieval while passing them through
+        
+        Args:
+            documents (iterable): Document strings
+        
+        Yields:
+            str: The same documents, in order
+        """
+        for document in documents:
+            self.retriever.add_document(document, "letters")
+            yield document
+    
+    def _apply_personality_profile(self, personality_profile):
+        """
+        Make a freshly analyzed personality profile the active one
+        
+        Args:
+            personality_profile (dict): The analyzed profile
+        """
         # Store personality profile
         self.personality_profile = personality_profile
         
@@ -5,45 +5,176 @@ Monitors emotional tone in both user and agent messages.
 Logs shifts over time for observability and insight.
 """
 
+from array import array
+from collections import Counter, deque
+
+from .message_record import MessageColumns, MessageRecord, to_iso
+
+
+class SentimentLog(MessageColumns):
+    """Columnar log of analyzed messages and their sentiment"""
+    
+    def __init__(self):
+        """Initialize empty columns"""
+        super().__init__()
+        self.sentiment_codes = array("B")
+        self.confidences = array("f")
+        self.tones = []
+        self._sentiment_names = []
+        self._sentiment_index = {}
+        self._tone_cache = {}
+        # Sentiment codes of discarded messages, which still count
+        self._discarded = Counter()
+    
+    def append_sentiment(self, record, sentiment, confidence, emotional_tone):
+        """
+        Append an analyzed message
+        
+        Args:
+            record (MessageRecord): The analyzed message
+            sentiment (str): Detected sentiment
+            confidence (float): Confidence of the detection
+            emotional_tone (list): Emotional tones detected
+        """
+        code = self._sentiment_index.get(sentiment)
+        if code is None:
+            code = len(self._sentiment_names)
+            self._sentiment_names.append(sentiment)
+            self._sentiment_index[sentiment] = code
+        
+        # Identical tone lists share one tuple
+        tones = tuple(emotional_tone)
+        tones = self._tone_cache.setdefault(tones, tones)
+        
+        self.append(record)
+        self.sentiment_codes.append(code)
+        self.confidences.append(confidence)
+        self.tones.append(tones)
+    
+    def sentiment_at(self, index):
+        """
+        Get the sentiment of one logged message
+        
+        Args:
+            index (int): Position in the log; negative counts from the end
+        
+        Returns:
+            str: Detected sentiment
+        """
+        return self._sentiment_names[self.sentiment_codes[index]]
+    
+    def count_sentiment(self, sentiment):
+        """
+        Count logged messages with a sentiment, including discarded ones
+        
+        Args:
+            sentiment (str): Sentiment to count
+        
+        Returns:
+            int: Number of messages
+        """
+        code = self._sentiment_index.get(sentiment)
+        return self.sentiment_codes.count(code) + self._discarded[code] if code is not None else 0
+    
+    def entry(self, index):
+        """
+        Build the dict view of one logged message
+        
+        Args:
+            index (int): Position in the log; negative counts from the end
+        
+        Returns:
+            dict: Sentiment analysis results
+        """
+        return {
+            "sender": self._sender_names[self.sender_codes[index]],
+            "message": self.messages[index],
+            "sentiment": self.sentiment_at(index),
+            "confidence": self.confidences[index],
+            "emotional_tone": list(self.tones[index]),
+            "timestamp": to_iso(self.timestamps[index])
+        }
+    
+    def iter_dicts(self):
+        """
+        Stream dict views of the logged messages
+        
+        Yields:
+            dict: Sentiment analysis results per message
+        """
+        for index in range(len(self)):
+            yield self.entry(index)
+    
+    def discard_oldest(self, count):
+        """
+        Remove the oldest messages, keeping them in the sentiment counts
+        
+        Args:
+            count (int): Number of messages to remove
+        """
+        self._discarded.update(self.sentiment_codes[:count])
+        super().discard_oldest(count)
+        del self.sentiment_codes[:count]
+        del self.confidences[:count]
+        del self.tones[:count]
+    
+    def clear(self):
+        """Remove all logged messages"""
+        super().clear()
+        del self.sentiment_codes[:]
+        del self.confidences[:]
+        self.tones.clear()
+        self._discarded.clear()
+
+
 class EmotionAgent:
     """Agent responsible for tracking emotional sentiment in conversations"""
     
-    def __init__(self):
-        """Initialize the emotion tracker"""
-        self.emotional_log = []
-        self.sentiment_history = []
-        self.emotional_shifts = []
+    def __init__(self, max_history=None):
+        """
+        Initialize the emotion tracker
+        
+        Args:
+            max_history (int, optional): Analyzed messages and shifts to keep;
+                older ones still count in the summary. Unbounded by default.
+        """
+        # The log and the history are one columnar store, not two lists
+        self.emotional_log = SentimentLog()
+        self.sentiment_history = self.emotional_log
+        self.max_history = max_history
+        self.emotional_shifts = deque(maxlen=max_history)
+        self.shift_count = 0
     
-    def analyze_sentiment(self, message, sender="user"):
+    def analyze_sentiment(self, message, sender="user", timestamp=None):
         """
         Analyze the sentiment of a message
         
         Args:
             message (str): The message to analyze
             sender (str): Who sent the message ("user" or "companion")
+            timestamp (datetime, str, float, optional): When the message was
+                sent, e.g. when replaying a saved conversation; defaults to now
             
         Returns:
-            dict: Sentiment analysis results
+            dict: Sentiment analysis results (a view; the log stores columns)
         """
         # Placeholder for actual sentiment analysis
         # In a full implementation, this would use NLP techniques
-        sentiment_data = {
-            "sender": sender,
-            "message": message,
-            "sentiment": self._detect_sentiment(message),
-            "confidence": 0.75,
-            "emotional_tone": self._detect_emotional_tone(message),
-            "timestamp": self._get_current_timestamp()
-        }
-        
-        # Log the sentiment analysis
-        self.emotional_log.append(sentiment_data)
-        self.sentiment_history.append(sentiment_data)
+        self.emotional_log.append_sentiment(
+            MessageRecord(sender, message, timestamp),
+            self._detect_sentiment(message),
+            0.75,
+            self._detect_emotional_tone(message)
+        )
         
         # Check for emotional shifts
-        self._check_for_emotional_shifts(sentiment_data)
+        self._check_for_emotional_shifts()
         
-        return sentiment_data
+        entry = self.emotional_log.entry(-1)
+        # Trim in blocks, so the columns are not shifted on every message
+        if self.max_history and len(self.emotional_log) >= 2 * self.max_history:
+            self.emotional_log.discard_oldest(len(self.emotional_log) - self.max_history)
+        return entry
     
     def _detect_sentiment(self, message):
         """
@@ -72,22 +203,17 @@ class EmotionAgent:
         # Placeholder implementation
         return ["neutral"]
     
-    def _check_for_emotional_shifts(self, current_sentiment):
-        """
-        Check for emotional shifts and log them
-        
-        Args:
-            current_sentiment (dict): Current sentiment data
-        """
-        if len(self.sentiment_history) > 1:
-            previous_sentiment = self.sentiment_history[-2]
-            if previous_sentiment["sentiment"] != current_sentiment["sentiment"]:
-                shift_data = {
-                    "from": previous_sentiment["sentiment"],
-                    "to": current_sentiment["sentiment"],
-                    "timestamp": current_sentiment["timestamp"]
-                }
-                self.emotional_shifts.append(shift_data)
+    def _check_for_emotional_shifts(self):
+        """Check whether the latest message shifted sentiment and log it"""
+        history = self.sentiment_history
+        if len(history) > 1 and history.sentiment_codes[-2] != history.sentiment_codes[-1]:
+            shift_data = {
+                "from": history.sentiment_at(-2),
+                "to": history.sentiment_at(-1),
+                "timestamp": to_iso(history.timestamps[-1])
+            }
+            self.emotional_shifts.append(shift_data)
+            self.shift_count += 1
     
     def get_emotional_summary(self):
         """
@@ -99,11 +225,10 @@ class EmotionAgent:
         if not self.sentiment_history:
             return {"overall_trend": "neutral", "shifts_count": 0}
         
-        # Simple summary calculation
-        sentiments = [entry["sentiment"] for entry in self.sentiment_history]
-        positive_count = sentiments.count("positive")
-        negative_count = sentiments.count("negative")
-        neutral_count = sentiments.count("neutral")
+        # Simple summary calculation over the sentiment column
+        positive_count = self.sentiment_history.count_sentiment("positive")
+        negative_count = self.sentiment_history.count_sentiment("negative")
+        neutral_count = self.sentiment_history.count_sentiment("neutral")
         
         if positive_count > negative_count and positive_count > neutral_count:
             overall_trend = "positive"
@@ -117,7 +242,7 @@ class EmotionAgent:
             "positive_count": positive_count,
             "negative_count": negative_count,
             "neutral_count": neutral_count,
-            "shifts_count": len(self.emotional_shifts)
+            "shifts_count": self.shift_count
         }
     
     def get_emotional_log(self):
@@ -127,14 +252,4 @@ class EmotionAgent:
         Returns:
             list: Full emotional log
         """
-        return self.emotional_log.copy()
-    
-    def _get_current_timestamp(self):
-        """
-        Get current timestamp
-        
-        Returns:
-            str: Current timestamp
-        """
-        from datetime import datetime
-        return datetime.now().isoformat()
\ No newline at end of file
+        return list(self.emotional_log.iter_dicts())
\ No newline at end of file
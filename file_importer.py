@@ -4,39 +4,128 @@ File Importer Utility
 Securely uploads messages, emails, and letters.
 """
 
+import io
 import os
+import re
 import json
-from typing import Union, List, Dict
+import mmap
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Union, List, Dict, Iterator, Optional, Tuple
+
+from agents.text_analysis import SENTENCE_BOUNDARY_PATTERN
+from config import config
+from .import_cache import ImportManifest, content_digest
+from .message_parser import (
+    Message, is_json_lines, parse_csv_messages, parse_json_messages, parse_jsonl_messages
+)
+
+DEFAULT_CHUNK_SIZE = 64 * 1024  # characters per streamed chunk
+DEFAULT_MAPPED_CHUNK_SIZE = 4 * 1024 * 1024  # bytes per memory-mapped slice
+
+# Message separators for memory-mapped archives, most preferred first.
+# All are ASCII, so splitting on them never cuts a UTF-8 sequence.
+MESSAGE_SEPARATORS = (b'\n\n', b'\n', b' ')
+
+# Blank lines between the paragraphs of a letter, its unit of deduplication
+PARAGRAPH_BREAK_PATTERN = re.compile(r"\n[ \t]*\n")
+
+# Chat exports, imported as message records rather than raw text
+MESSAGE_FORMATS = ('.json', '.jsonl', '.csv')
+
+# Formats worth handing to a worker process during batch imports, and the
+# size below which pickling costs more than parsing on the reader thread
+PROCESS_PARSED_FORMATS = MESSAGE_FORMATS
+PROCESS_PARSE_MIN_SIZE = 256 * 1024
+
+
+def _decode_text(data: bytes, encoding: str = 'utf-8') -> str:
+    """Decode UTF-8 file bytes with the same newline handling as open()"""
+    return data.decode(encoding).replace('\r\n', '\n').replace('\r', '\n')
+
+
+def _file_encoding(ext: str) -> str:
+    """Encoding to read a format with; spreadsheet CSV exports often start with a BOM"""
+    return 'utf-8-sig' if ext == '.csv' else 'utf-8'
+
+
+def _parse_messages(ext: str, data: bytes) -> List[Message]:
+    """
+    Parse a chat export's raw bytes into message records
+    
+    Module-level so it can run in a worker process.
+    
+    Args:
+        ext (str): File extension, one of MESSAGE_FORMATS
+        data (bytes): Raw file contents
+    
+    Returns:
+        List[Message]: Records in file order, as iter_messages yields them
+    """
+    file = io.StringIO(_decode_text(data, _file_encoding(ext)))
+    if ext == '.csv':
+        return list(parse_csv_messages(file))
+    if ext == '.jsonl' or is_json_lines(file):
+        return list(parse_jsonl_messages(file))
+    return list(parse_json_messages(json.load(file)))
+
+
+def _parse_content(ext: str, data: bytes) -> Union[str, List[str]]:
+    """
+    Parse raw file bytes the same way import_file parses the file
+    
+    Module-level so it can run in a worker process.
+    
+    Args:
+        ext (str): File extension
+        data (bytes): Raw file contents
+    
+    Returns:
+        Union[str, List[str]]: Text of a letter, or the message texts of a chat export
+    """
+    if ext in MESSAGE_FORMATS:
+        return [message.text for message in _parse_messages(ext, data)]
+    return _decode_text(data, _file_encoding(ext))
 
 
 class FileImporter:
     """Utility for importing various types of text files"""
     
-    def __init__(self):
-        """Initialize the file importer"""
-        self.supported_formats = ['.txt', '.json', '.csv', '.md']
+    def __init__(self, max_file_size: Optional[int] = None, cache_path: Optional[str] = None):
+        """
+        Initialize the file importer
+        
+        Args:
+            max_file_size (int, optional): Largest file import_file will load
+                into memory; defaults to config.MAX_FILE_SIZE
+            cache_path (str, optional): Manifest file that lets directory imports
+                skip unchanged files and drop already imported messages
+        """
+        self.supported_formats = ['.txt', '.json', '.csv', '.md', '.jsonl']
+        self.max_file_size = max_file_size or config.MAX_FILE_SIZE
+        self.manifest = ImportManifest(cache_path) if cache_path else None
     
-    def import_file(self, file_path: str) -> Union[str, List[str], Dict]:
+    def import_file(self, file_path: str) -> Union[str, List[str]]:
         """
         Import a file and return its contents
         
+        Chat exports (JSON, JSONL, CSV) are parsed into message records and
+        only their text is returned, so headers, timestamps and sender
+        columns never reach personality analysis.
+        
         Args:
             file_path (str): Path to the file to import
             
         Returns:
-            Union[str, List[str], Dict]: File contents in appropriate format
+            Union[str, List[str]]: Text of a letter, or the message texts of a chat export
             
         Raises:
             FileNotFoundError: If file doesn't exist
-            ValueError: If file format is not supported
+            ValueError: If file format is not supported or the file is larger
+                than max_file_size (use iter_chunks for large files)
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
-        _, ext = os.path.splitext(file_path)
-        
-        if ext not in self.supported_formats:
-            raise ValueError(f"Unsupported file format: {ext}")
+        ext = self._validate_file(file_path)
+        self._check_file_size(file_path)
         
         if ext == '.txt':
             return self._import_txt(file_path)
@@ -46,10 +135,284 @@ class FileImporter:
             return self._import_csv(file_path)
         elif ext == '.md':
             return self._import_md(file_path)
+        elif ext == '.jsonl':
+            return self._import_jsonl(file_path)
         
         # Fallback - should not reach here due to validation above
         raise ValueError(f"Unsupported file format: {ext}")
     
+    def iter_chunks(self, file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+        """
+        Stream a file as bounded-size chunks without loading it whole
+        
+        Text and Markdown files yield chunks of about chunk_size characters
+        ending on a sentence boundary where possible; chat exports yield
+        the text of one message at a time (see iter_messages).
+        The chunks can be passed straight to PersonalityAgent.analyze_text.
+        
+        Args:
+            file_path (str): Path to the file to import
+            chunk_size (int): Preferred chunk size in characters
+        
+        Yields:
+            str: Text chunks or message texts in file order
+        
+        Raises:
+            FileNotFoundError: If file doesn't exist
+            ValueError: If file format is not supported, or a JSON array
+                file is larger than max_file_size
+        """
+        ext = self._validate_file(file_path)
+        
+        if ext in ('.txt', '.md'):
+            yield from self._iter_text_chunks(file_path, chunk_size)
+        else:
+            for message in self.iter_messages(file_path):
+                yield message.text
+    
+    def iter_messages(self, file_path: str, sender: Optional[str] = None) -> Iterator[Message]:
+        """
+        Stream typed message records from a chat export or letter file
+        
+        CSV files are read with the csv module using their header row,
+        JSONL files (.jsonl, or .json holding one object per line) are read
+        line by line, and JSON arrays or objects nesting a "messages" list
+        are loaded whole. Text and Markdown files are letters with no
+        sender column; they yield one record per streamed chunk whatever
+        the sender filter.
+        
+        Args:
+            file_path (str): Path to the file to import
+            sender (str, optional): Only yield messages from this sender,
+                compared case-insensitively, e.g. the loved one's name
+        
+        Yields:
+            Message: Records with sender, timestamp and text
+        
+        Raises:
+            FileNotFoundError: If file doesn't exist
+            ValueError: If file format is not supported, or a JSON array
+                file is larger than max_file_size
+        """
+        ext = self._validate_file(file_path)
+        
+        if ext in ('.txt', '.md'):
+            for chunk in self._iter_text_chunks(file_path, DEFAULT_CHUNK_SIZE):
+                yield Message(None, None, chunk)
+            return
+        
+        with open(file_path, 'r', encoding=_file_encoding(ext), newline='' if ext == '.csv' else None) as file:
+            if ext == '.csv':
+                yield from parse_csv_messages(file, sender)
+            elif ext == '.jsonl' or is_json_lines(file):
+                yield from parse_jsonl_messages(file, sender)
+            else:
+                self._check_file_size(file_path)
+                yield from parse_json_messages(json.load(file), sender)
+    
+    def _iter_text_chunks(self, file_path: str, chunk_size: int) -> Iterator[str]:
+        """
+        Read a text file in blocks and yield chunks split on boundaries
+        
+        At most about two blocks are held in memory at any time.
+        
+        Args:
+            file_path (str): Path to the text file
+            chunk_size (int): Preferred chunk size in characters
+        
+        Yields:
+            str: Consecutive chunks of the file
+        """
+        carry = ''
+        with open(file_path, 'r', encoding='utf-8') as file:
+            while True:
+                block = file.read(chunk_size)
+                if not block:
+                    break
+                buffer = carry + block
+                if len(block) < chunk_size:
+                    # Short read: end of file, nothing left to split for
+                    yield buffer
+                    return
+                split_at = self._find_chunk_boundary(buffer)
+                yield buffer[:split_at]
+                carry = buffer[split_at:]
+        if carry:
+            yield carry
+    
+    def _find_chunk_boundary(self, buffer: str) -> int:
+        """
+        Find where to end a chunk within a buffer
+        
+        Prefers the last sentence boundary in the second half of the
+        buffer, then the last whitespace, then the end of the buffer.
+        
+        Args:
+            buffer (str): Buffered text
+        
+        Returns:
+            int: Index to split the buffer at
+        """
+        last_match = None
+        for last_match in SENTENCE_BOUNDARY_PATTERN.finditer(buffer, len(buffer) // 2):
+            pass
+        if last_match is not None:
+            return last_match.end()
+        
+        whitespace = max(buffer.rfind(' '), buffer.rfind('\n'))
+        return whitespace + 1 if whitespace > 0 else len(buffer)
+    
+    def iter_message_ranges(self, file_path: str,
+                            chunk_size: int = DEFAULT_MAPPED_CHUNK_SIZE) -> Iterator[Tuple[int, int]]:
+        """
+        Split a memory-mapped text file into byte ranges on message boundaries
+        
+        Ranges are about chunk_size bytes and end after a blank line where
+        possible, then after a line break or a space. Only the pages
+        around each boundary are touched.
+        
+        Args:
+            file_path (str): Path to a .txt or .md file
+            chunk_size (int): Preferred range size in bytes
+        
+        Yields:
+            Tuple[int, int]: (start, end) byte offsets covering the file
+        
+        Raises:
+            FileNotFoundError: If file doesn't exist
+            ValueError: If the file is not a .txt or .md file
+        """
+        self._validate_mappable(file_path)
+        with open(file_path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield from self._find_message_ranges(mapped, chunk_size)
+    
+    def iter_mapped_chunks(self, file_path: str,
+                           chunk_size: int = DEFAULT_MAPPED_CHUNK_SIZE) -> Iterator[memoryview]:
+        """
+        Stream a text file as zero-copy memoryview slices of a memory map
+        
+        Nothing is decoded or copied up front; the slices point straight
+        into the page cache, which other processes mapping the same file
+        share. Each slice is released when the next one is requested, so
+        decode or copy it before advancing. PersonalityAgent.analyze_text
+        accepts the slices directly.
+        
+        Args:
+            file_path (str): Path to a .txt or .md file
+            chunk_size (int): Preferred slice size in bytes
+        
+        Yields:
+            memoryview: UTF-8 encoded slices split on message boundaries
+        
+        Raises:
+            FileNotFoundError: If file doesn't exist
+            ValueError: If the file is not a .txt or .md file
+        """
+        self._validate_mappable(file_path)
+        with open(file_path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for start, end in self._find_message_ranges(mapped, chunk_size):
+                        piece = view[start:end]
+                        try:
+                            yield piece
+                        finally:
+                            piece.release()
+                finally:
+                    view.release()
+    
+    def _find_message_ranges(self, mapped: mmap.mmap, chunk_size: int) -> Iterator[Tuple[int, int]]:
+        """
+        Compute message-aligned byte ranges over a memory map
+        
+        Args:
+            mapped (mmap.mmap): Mapped file contents
+            chunk_size (int): Preferred range size in bytes
+        
+        Yields:
+            Tuple[int, int]: (start, end) byte offsets
+        """
+        size = len(mapped)
+        start = 0
+        while size - start > chunk_size:
+            limit = start + chunk_size
+            end = -1
+            for separator in MESSAGE_SEPARATORS:
+                found = mapped.rfind(separator, start + chunk_size // 2, limit)
+                if found != -1:
+                    end = found + len(separator)
+                    break
+            if end == -1:
+                # One oversized message: extend to its next separator
+                found = mapped.find(b'\n', limit)
+                end = size if found == -1 else found + 1
+            yield start, end
+            start = end
+        if start < size:
+            yield start, size
+    
+    def _validate_mappable(self, file_path: str) -> None:
+        """
+        Check that a file can be read through the memory-mapped path
+        
+        Args:
+            file_path (str): Path to the file
+        
+        Raises:
+            FileNotFoundError: If file doesn't exist
+            ValueError: If the file is not a .txt or .md file
+        """
+        ext = self._validate_file(file_path)
+        if ext not in ('.txt', '.md'):
+            raise ValueError(f"Memory-mapped import supports .txt and .md files, not {ext}")
+    
+    def _validate_file(self, file_path: str) -> str:
+        """
+        Check that a file exists and has a supported format
+        
+        Args:
+            file_path (str): Path to the file
+        
+        Returns:
+            str: The file extension
+        
+        Raises:
+            FileNotFoundError: If file doesn't exist
+            ValueError: If file format is not supported
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        
+        _, ext = os.path.splitext(file_path)
+        
+        if ext not in self.supported_formats:
+            raise ValueError(f"Unsupported file format: {ext}")
+        
+        return ext
+    
+    def _check_file_size(self, file_path: str) -> None:
+        """
+        Enforce max_file_size for APIs that load a whole file
+        
+        Args:
+            file_path (str): Path to the file
+        
+        Raises:
+            ValueError: If the file is larger than max_file_size
+        """
+        file_size = os.path.getsize(file_path)
+        if file_size > self.max_file_size:
+            raise ValueError(
+                f"File too large: {file_path} is {file_size} bytes "
+                f"(limit {self.max_file_size}); use iter_chunks to stream it"
+            )
+    
     def _import_txt(self, file_path: str) -> str:
         """
         Import a text file
@@ -63,31 +426,41 @@ class FileImporter:
         with open(file_path, 'r', encoding='utf-8') as file:
             return file.read()
     
-    def _import_json(self, file_path: str) -> Dict:
+    def _import_json(self, file_path: str) -> List[str]:
         """
-        Import a JSON file
+        Import a JSON chat export
         
         Args:
             file_path (str): Path to the JSON file
             
         Returns:
-            Dict: Parsed JSON data
+            List[str]: Message texts
         """
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
+        return [message.text for message in self.iter_messages(file_path)]
     
     def _import_csv(self, file_path: str) -> List[str]:
         """
-        Import a CSV file (returns list of lines)
+        Import a CSV chat export, without its header or non-text columns
         
         Args:
             file_path (str): Path to the CSV file
             
         Returns:
-            List[str]: List of CSV lines
+            List[str]: Message texts
         """
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return [line.strip() for line in file.readlines()]
+        return [message.text for message in self.iter_messages(file_path)]
+    
+    def _import_jsonl(self, file_path: str) -> List[str]:
+        """
+        Import a JSONL chat export
+        
+        Args:
+            file_path (str): Path to the JSONL file
+        
+        Returns:
+            List[str]: Message texts
+        """
+        return [message.text for message in self.iter_messages(file_path)]
     
     def _import_md(self, file_path: str) -> str:
         """
@@ -102,29 +475,217 @@ class FileImporter:
         with open(file_path, 'r', encoding='utf-8') as file:
             return file.read()
     
-    def batch_import(self, directory_path: str) -> Dict[str, Union[str, List[str], Dict]]:
+    def batch_import(self, directory_path: str) -> Dict[str, Union[str, List[str]]]:
         """
         Import all supported files from a directory
         
+        Files are imported concurrently; see import_directory for
+        recursive scans, progress reporting and structured errors.
+        
         Args:
             directory_path (str): Path to directory containing files
             
         Returns:
-            Dict[str, Union[str, List[str], Dict]]: Dictionary mapping filenames to contents
+            Dict[str, Union[str, List[str]]]: Dictionary mapping filenames to contents
+        """
+        result = self.import_directory(directory_path, recursive=False)
+        
+        for failure in result["errors"]:
+            print(f"Warning: Could not import {failure['name']}: {failure['error']['message']}")
+        
+        return result["files"]
+    
+    def scan_directory(self, directory_path: str, recursive: bool = True) -> Iterator[os.DirEntry]:
+        """
+        Lazily find supported files with os.scandir
+        
+        Args:
+            directory_path (str): Directory to scan
+            recursive (bool): Descend into subdirectories
+        
+        Yields:
+            os.DirEntry: Entries for supported files
+        """
+        pending = [directory_path]
+        while pending:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            pending.append(entry.path)
+                    elif entry.is_file() and os.path.splitext(entry.name)[1] in self.supported_formats:
+                        yield entry
+    
+    def iter_directory(self, directory_path: str, recursive: bool = True,
+                       max_workers: Optional[int] = None, parse_workers: Optional[int] = None,
+                       max_in_flight: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Concurrently import a directory, yielding results as files finish
+        
+        Files are read on a thread pool; parsing of large JSON and CSV
+        files runs on a process pool. At most max_in_flight files are being read or parsed
+        at once, so memory stays bounded however large the directory is.
+        
+        Args:
+            directory_path (str): Directory to import
+            recursive (bool): Descend into subdirectories
+            max_workers (int, optional): Reader threads
+            parse_workers (int, optional): Parser processes; 0 parses on the reader threads
+            max_in_flight (int, optional): Files read or parsed at the same time
+        
+        With a cache manifest, files whose size and mtime are unchanged are
+        skipped without being read, files whose content was already
+        imported are skipped after hashing, and messages (or paragraphs of
+        letters) already imported from another file are dropped; see
+        ImportManifest.drop_seen_messages.
+        
+        Yields:
+            Dict[str, Any]: {"path", "name", "content"} for imported files,
+                {"path", "name", "skipped"} with reason "unchanged" or "duplicate",
+                or {"path", "name", "error"} where error holds "stage", "type" and "message"
+        
+        Raises:
+            FileNotFoundError: If the directory doesn't exist
         """
-        if not os.path.exists(directory_path):
+        if not os.path.isdir(directory_path):
             raise FileNotFoundError(f"Directory not found: {directory_path}")
         
-        imported_files = {}
+        max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        max_in_flight = max_in_flight or max_workers * 4
+        if parse_workers is None:
+            parse_workers = os.cpu_count() or 1
+        
+        parse_pool = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers else None
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as io_pool:
+                in_flight = set()
+                for entry in self.scan_directory(directory_path, recursive):
+                    if len(in_flight) >= max_in_flight:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                    name = os.path.relpath(entry.path, directory_path)
+                    if self.manifest is not None and self.manifest.is_unchanged(entry.path, entry.stat()):
+                        yield {"path": entry.path, "name": name, "skipped": "unchanged"}
+                        continue
+                    in_flight.add(io_pool.submit(self._import_for_batch, entry.path, name, parse_pool))
+        
+                while in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+        finally:
+            if parse_pool is not None:
+                parse_pool.shutdown(wait=True)
+    
+    def import_directory(self, directory_path: str, recursive: bool = True,
+                         progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                         **pool_options) -> Dict[str, Any]:
+        """
+        Concurrently import all supported files under a directory
+        
+        Args:
+            directory_path (str): Directory to import
+            recursive (bool): Descend into subdirectories
+            progress_callback (callable, optional): Called after every file with
+                {"path", "name", "status", "completed", "skipped", "failed", "elapsed"}
+            **pool_options: max_workers, parse_workers and max_in_flight for iter_directory
+        
+        Returns:
+            Dict[str, Any]: {"files": name -> contents of new or changed files,
+                "errors": list of per-file error records, "completed", "skipped",
+                "failed", "elapsed"}
+        """
+        started = time.perf_counter()
+        files = {}
+        errors = []
+        skipped = 0
+        
+        for result in self.iter_directory(directory_path, recursive, **pool_options):
+            if "error" in result:
+                errors.append(result)
+                status = "error"
+            elif "skipped" in result:
+                skipped += 1
+                status = "skipped"
+            else:
+                files[result["name"]] = result["content"]
+                status = "imported"
+            
+            if progress_callback:
+                progress_callback({
+                    "path": result["path"],
+                    "name": result["name"],
+                    "status": status,
+                    "completed": len(files),
+                    "skipped": skipped,
+                    "failed": len(errors),
+                    "elapsed": time.perf_counter() - started
+                })
         
-        for filename in os.listdir(directory_path):
-            file_path = os.path.join(directory_path, filename)
-            if os.path.isfile(file_path):
-                _, ext = os.path.splitext(filename)
-                if ext in self.supported_formats:
-                    try:
-                        imported_files[filename] = self.import_file(file_path)
-                    except Exception as e:
-                        print(f"Warning: Could not import {filename}: {e}")
+        if self.manifest is not None:
+            self.manifest.save()
+        
+        return {
+            "files": files,
+            "errors": errors,
+            "completed": len(files),
+            "skipped": skipped,
+            "failed": len(errors),
+            "elapsed": time.perf_counter() - started
+        }
+    
+    def _import_for_batch(self, file_path: str, name: str,
+                          parse_pool: Optional[ProcessPoolExecutor]) -> Dict[str, Any]:
+        """
+        Read and parse one file for a batch import, capturing any error
+        
+        Args:
+            file_path (str): Path to the file
+            name (str): Name relative to the imported directory
+            parse_pool (ProcessPoolExecutor, optional): Pool for JSON/CSV parsing
+        
+        Returns:
+            Dict[str, Any]: Result record as yielded by iter_directory
+        """
+        stage = "read"
+        digest = None
+        try:
+            self._check_file_size(file_path)
+            with open(file_path, 'rb') as file:
+                stat_result = os.fstat(file.fileno())
+                data = file.read()
+            
+            if self.manifest is not None:
+                digest = content_digest(data)
+                # Identical files read at the same time must not all be imported
+                if not self.manifest.claim_content(file_path, stat_result, digest):
+                    return {"path": file_path, "name": name, "skipped": "duplicate"}
+            
+            stage = "parse"
+            ext = os.path.splitext(file_path)[1]
+            # With a manifest, chat exports are deduplicated as records, not texts
+            parse = _parse_messages if self.manifest is not None and ext in MESSAGE_FORMATS else _parse_content
+            if (parse_pool is not None and ext in PROCESS_PARSED_FORMATS
+                    and len(data) >= PROCESS_PARSE_MIN_SIZE):
+                content = parse_pool.submit(parse, ext, data).result()
+            else:
+                content = parse(ext, data)
+            
+            if self.manifest is not None:
+                if ext in MESSAGE_FORMATS:
+                    content = [message.text for message in self.manifest.drop_seen_messages(content)]
+                else:
+                    paragraphs = PARAGRAPH_BREAK_PATTERN.split(content)
+                    content = "\n\n".join(self.manifest.drop_seen_messages(paragraphs))
+                self.manifest.record_file(file_path, stat_result, digest)
+        except Exception as e:
+            if digest is not None and stage == "parse":
+                self.manifest.release_content(digest)
+            return {
+                "path": file_path,
+                "name": name,
+                "error": {"stage": stage, "type": type(e).__name__, "message": str(e)}
+            }
         
-        return imported_files
\ No newline at end of file
+        return {"path": file_path, "name": name, "content": content}
\ No newline at end of file
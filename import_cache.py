@@ -0,0 +1,236 @@
+"""
+Import Cache Utility
+
+Keeps an on-disk manifest of imported files and messages so re-imports
+skip unchanged files and drop messages that were already imported.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional
+
+from config import config
+
+
+def content_digest(data: bytes) -> str:
+    """
+    Hash raw file contents
+    
+    Args:
+        data (bytes): File contents
+    
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def message_digest(message: Any, min_length: Optional[int] = None) -> Optional[str]:
+    """
+    Hash one message for cross-file deduplication
+    
+    A dated message is identified by its sender, timestamp and text, so
+    the same words sent on another day are a different message. Without
+    a timestamp only the exact text is left to go on, and short undated
+    messages such as "love you" are genuinely repeated too often for that.
+    
+    Args:
+        message (Any): A parsed Message record, or a paragraph of text
+        min_length (int, optional): Shortest undated text that gets a
+            digest; defaults to config.IMPORT_DEDUP_MIN_LENGTH
+    
+    Returns:
+        Optional[str]: Hex digest, or None if the message is never treated as a repeat
+    """
+    if isinstance(message, str):
+        sender, timestamp, text = None, None, message
+    else:
+        sender, timestamp, text = message.sender, message.timestamp, message.text
+    if timestamp is None:
+        if min_length is None:
+            min_length = config.IMPORT_DEDUP_MIN_LENGTH
+        if len(text) < min_length:
+            return None
+        key = ["text", text]
+    else:
+        key = ["record", sender, timestamp, text]
+    encoded = json.dumps(key, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class ImportManifest:
+    """Manifest of content hashes, sizes and mtimes for imported files"""
+    
+    def __init__(self, manifest_path: str, max_messages: Optional[int] = None,
+                 max_message_age: Optional[float] = None):
+        """
+        Initialize the manifest, loading it from disk if it exists
+        
+        Args:
+            manifest_path (str): JSON file the manifest is stored in
+            max_messages (int, optional): Message digests kept, least recently
+                seen dropped first; defaults to config.IMPORT_SEEN_MESSAGES_MAX
+            max_message_age (float, optional): Seconds a digest is kept after it
+                was last seen; defaults to config.IMPORT_SEEN_MESSAGES_MAX_AGE
+        """
+        self.manifest_path = manifest_path
+        self.max_messages = max_messages or config.IMPORT_SEEN_MESSAGES_MAX
+        self.max_message_age = max_message_age or config.IMPORT_SEEN_MESSAGES_MAX_AGE
+        self.files = {}
+        # Digest -> epoch seconds it was last seen, least recently seen first
+        self.message_digests = OrderedDict()
+        self._content_digests = set()
+        # Contents claimed by an import that has not finished yet
+        self._claimed_digests = set()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+    
+    def load(self) -> None:
+        """Load the manifest from disk; a missing file means an empty manifest"""
+        if not os.path.exists(self.manifest_path):
+            return
+        
+        with open(self.manifest_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        
+        self.files = data.get("files", {})
+        now = time.time()
+        for entry in data.get("messages", []):
+            # Manifests written before digests were aged hold bare digests
+            digest, seen = (entry, now) if isinstance(entry, str) else entry
+            self.message_digests[digest] = seen
+        self._content_digests = {record["sha256"] for record in self.files.values()}
+        self._trim_messages(now)
+    
+    def save(self) -> None:
+        """Write the manifest atomically so a crash never leaves half a file"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._trim_messages(time.time())
+            data = {"files": self.files,
+                    "messages": [[digest, seen] for digest, seen in self.message_digests.items()]}
+            self._dirty = False
+        
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(temp_path, self.manifest_path)
+    
+    def is_unchanged(self, file_path: str, stat_result: os.stat_result) -> bool:
+        """
+        Check whether a file matches its manifest entry without reading it
+        
+        Args:
+            file_path (str): Path to the file
+            stat_result (os.stat_result): Current stat of the file
+        
+        Returns:
+            bool: True if size and mtime match the recorded import
+        """
+        record = self.files.get(os.path.abspath(file_path))
+        return (record is not None
+                and record["size"] == stat_result.st_size
+                and record["mtime_ns"] == stat_result.st_mtime_ns)
+    
+    def claim_content(self, file_path: str, stat_result: os.stat_result, digest: str) -> bool:
+        """
+        Reserve a file's content for import unless it is already imported
+        
+        Checking and reserving is one step, so of several identical files
+        imported at once exactly one is imported. A duplicate of imported
+        content is recorded, so the next scan skips it unread.
+        
+        Args:
+            file_path (str): Path to the file
+            stat_result (os.stat_result): Stat of the file when it was read
+            digest (str): Content digest of the file
+        
+        Returns:
+            bool: True if the caller should import the file and then call
+                record_file, or release_content if the import fails
+        """
+        path = os.path.abspath(file_path)
+        with self._lock:
+            if digest in self._claimed_digests:
+                return False
+            record = self.files.get(path)
+            if (record is not None and record["sha256"] == digest) or digest in self._content_digests:
+                self._record(path, stat_result, digest)
+                return False
+            self._claimed_digests.add(digest)
+            return True
+    
+    def release_content(self, digest: str) -> None:
+        """
+        Give up a claim after a failed import, so a later copy can be imported
+        
+        Args:
+            digest (str): Content digest passed to claim_content
+        """
+        with self._lock:
+            self._claimed_digests.discard(digest)
+    
+    def record_file(self, file_path: str, stat_result: os.stat_result, digest: str) -> None:
+        """
+        Record a successfully imported file
+        
+        Args:
+            file_path (str): Path to the file
+            stat_result (os.stat_result): Stat of the file when it was read
+            digest (str): Content digest of the file
+        """
+        with self._lock:
+            self._record(os.path.abspath(file_path), stat_result, digest)
+            self._claimed_digests.discard(digest)
+    
+    def _record(self, path: str, stat_result: os.stat_result, digest: str) -> None:
+        """Add a manifest entry; the lock must be held"""
+        self.files[path] = {
+            "size": stat_result.st_size,
+            "mtime_ns": stat_result.st_mtime_ns,
+            "sha256": digest
+        }
+        self._content_digests.add(digest)
+        self._dirty = True
+    
+    def drop_seen_messages(self, messages: Iterable[Any]) -> List[Any]:
+        """
+        Drop messages that an earlier import already contained
+        
+        Messages are compared as message_digest describes. Repeats within
+        the same file are kept, since people do send the same message more
+        than once.
+        
+        Args:
+            messages (Iterable[Any]): Parsed Message records, or paragraphs
+                of a letter, of one file
+        
+        Returns:
+            List[Any]: Messages not imported before, in their original order
+        """
+        messages = list(messages)
+        digests = [message_digest(message) for message in messages]
+        now = time.time()
+        with self._lock:
+            new_messages = [message for message, digest in zip(messages, digests)
+                            if digest is None or digest not in self.message_digests]
+            for digest in digests:
+                if digest is not None:
+                    self.message_digests[digest] = now
+                    self.message_digests.move_to_end(digest)
+            self._trim_messages(now)
+            self._dirty = True
+        return new_messages
+    
+    def _trim_messages(self, now: float) -> None:
+        """Age out and cap the message digests; the lock must be held, or not yet shared"""
+        digests = self.message_digests
+        cutoff = now - self.max_message_age
+        while digests and (len(digests) > self.max_messages or next(iter(digests.values())) < cutoff):
+            digests.popitem(last=False)
\ No newline at end of file
@@ -5,16 +5,81 @@ Handles session and long-term memory using ADK's Memory Bank and InMemorySession
 Stores conversation history, recurring phrases, and emotional context.
 """
 
+import os
+import json
+import threading
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from config import config
+
+from .compaction import ConversationSummary
+from .conversation_log import ConversationLog, iter_log, iter_log_entries, read_log_entry
+from .memory_index import MessageIndex
+from .memory_store import InMemoryStore
+from .semantic_memory import EmbeddingStore, HashedNgramEncoder
+from .message_record import MessageColumns, MessageRecord
+
+
 class MemoryAgent:
     """Agent responsible for managing memories and conversation history"""
     
-    def __init__(self):
-        """Initialize the memory manager"""
-        self.session_memory = []
-        self.long_term_memory = {}
-        self.conversation_history = []
+    def __init__(self, max_session_memory=None, spill_path=None, log_path=None, store=None,
+                 embedding_path=None, encoder=None, executor=None):
+        """
+        Initialize the memory manager
+        
+        Args:
+            max_session_memory (int, optional): Turns kept in RAM; defaults to
+                config.MAX_SESSION_MEMORY
+            spill_path (str, optional): JSONL file older turns are appended to
+                when they fall out of session memory
+            log_path (str, optional): Durable conversation log every turn is
+                appended to
+            store (MemoryStore, optional): Long-term memory backend, e.g. a
+                SQLiteMemoryStore; defaults to a process-local store
+            embedding_path (str, optional): .npy file to memory-map turn
+                embeddings into; kept in RAM if not given
+            encoder (HashedNgramEncoder, optional): Encoder to share with
+                other agents, e.g. across sessions
+            executor (Executor, optional): Executor to run background
+                compaction on; one worker thread is started if needed
+        """
+        # One fixed-capacity ring buffer serves as both session memory and
+        # recent conversation history, so each turn is stored once
+        self.session_memory = deque(maxlen=max_session_memory or config.MAX_SESSION_MEMORY)
+        self.conversation_history = self.session_memory
+        # Turns evicted from the ring buffer, stored column-wise, and the
+        # summaries older archived turns are compacted into
+        self.archive = MessageColumns()
+        self.summaries = deque()
+        self._lock = threading.RLock()
+        self._compaction_lock = threading.Lock()
+        self._compaction = None
+        self._executor = executor
+        self._owns_executor = executor is None
+        self.long_term_memory = store if store is not None else InMemoryStore()
+        self.interaction_count = 0
         self.recurring_phrases = []
         self.emotional_context = {}
+        self.spill_path = spill_path
+        self.spilled_count = 0
+        self.conversation_log = ConversationLog(log_path) if log_path else None
+        # Message ids number turns in the order they were stored
+        self.message_count = 0
+        self.message_index = MessageIndex()
+        # Log offsets of turns by message id, so turns no longer in RAM can
+        # still be read back
+        self._log_offsets = array("Q")
+        self._log_offsets_path = None
+        # Turn embeddings for recall by meaning; row i is message id i
+        self.encoder = None
+        self.semantic_memory = None
+        if config.ENABLE_SEMANTIC_MEMORY:
+            self.encoder = encoder or HashedNgramEncoder()
+            self.semantic_memory = EmbeddingStore(self.encoder.dimensions, embedding_path)
     
     def store_message(self, sender, message, timestamp=None):
         """
@@ -24,15 +89,70 @@ class MemoryAgent:
             sender (str): Who sent the message ("user" or "companion")
             message (str): The message content
             timestamp (datetime, optional): When the message was sent
+        
+        Raises:
+            ValueError: If the embedding store cannot be aligned with the
+                conversation (see _align_embeddings)
         """
-        memory_entry = {
-            "sender": sender,
-            "message": message,
-            "timestamp": timestamp or self._get_current_timestamp()
-        }
+        memory_entry = MessageRecord(sender, message, timestamp)
+        embedding = self.encoder.encode(message) if self.semantic_memory is not None else None
+        
+        # Index rows, embedding rows and log offsets are all keyed by message
+        # id, so concurrent turns must append to them in the same order
+        with self._lock:
+            # Checked first, so a store that cannot be aligned stores nothing
+            if self.semantic_memory is not None:
+                self._align_embeddings(self.message_count)
+            
+            # A full ring buffer drops its oldest turn on append; spill it first
+            if len(self.session_memory) == self.session_memory.maxlen:
+                self._spill([self.session_memory[0]])
+        
+            message_id = self.message_count
+            self.session_memory.append(memory_entry)
+            self.message_count += 1
+        
+            self.message_index.add(message_id, message)
+            if self.semantic_memory is not None:
+                self.semantic_memory.add(embedding)
+            if self.conversation_log is not None:
+                offset = self.conversation_log.append(memory_entry)
+                log_path = self.conversation_log.log_path
+                if len(self._log_offsets) == message_id and self._log_offsets_path in (None, log_path):
+                    self._log_offsets_path = log_path
+                    self._log_offsets.append(offset)
+        
+        # Long-term memory writes are batched across interactions
+        self.interaction_count += 1
+        if self.interaction_count % config.MEMORY_SAVE_INTERVAL == 0:
+            self.long_term_memory.flush()
+    
+    def _align_embeddings(self, count):
+        """
+        Make the embedding store hold a row for each of the first count turns
+        
+        Rows missing for earlier turns, e.g. when the embedding file was last
+        flushed before them, are re-encoded. The lock must be held.
+        
+        Args:
+            count (int): Turns that must have embeddings
         
-        self.session_memory.append(memory_entry)
-        self.conversation_history.append(memory_entry)
+        Raises:
+            ValueError: If the store holds more rows than there are turns,
+                i.e. it belongs to another conversation, or a missing
+                turn can no longer be read back
+        """
+        stored = len(self.semantic_memory)
+        if stored == count:
+            return
+        if stored > count:
+            raise ValueError(f"Embedding store has {stored} rows but the conversation only {count} turns; "
+                             "it belongs to another conversation")
+        records = [self.get_message(message_id) for message_id in range(stored, count)]
+        if any(record is None for record in records):
+            raise ValueError(f"Cannot rebuild embeddings for turns {stored} to {count - 1}; "
+                             "they are no longer held or logged")
+        self.semantic_memory.add_batch(self.encoder.encode_batch([record.message for record in records]))
     
     def store_long_term_memory(self, key, value):
         """
@@ -56,17 +176,97 @@ class MemoryAgent:
         """
         return self.long_term_memory.get(key)
     
-    def get_recent_context(self, num_messages=5):
+    def get_recent_context(self, num_messages=5, include_summaries=False):
         """
         Get recent conversation context
         
+        Only the requested turns are visited, newest first, so the cost is
+        O(num_messages) regardless of how much history is held.
+        
         Args:
             num_messages (int): Number of recent messages to retrieve
+            include_summaries (bool): Lead with the newest
+                config.CONTEXT_SUMMARIES summaries of compacted history
             
         Returns:
-            list: Recent messages
+            list: Recent MessageRecord entries, oldest first, after any
+                ConversationSummary entries
+        """
+        with self._lock:
+            recent = list(islice(reversed(self.conversation_history), max(num_messages, 0)))
+            if include_summaries:
+                recent.extend(islice(reversed(self.summaries), config.CONTEXT_SUMMARIES))
+        recent.reverse()
+        return recent
+    
+    def get_message(self, message_id):
+        """
+        Look up a turn by message id, wherever it is held
+        
+        Args:
+            message_id (int): Id assigned when the turn was stored
+        
+        Returns:
+            MessageRecord: The turn, or None if it is no longer available
+        """
+        with self._lock:
+            session_start = self.message_count - len(self.session_memory)
+            archive_start = session_start - len(self.archive)
+            if message_id >= self.message_count or message_id < 0:
+                return None
+            if message_id >= session_start:
+                return self.session_memory[message_id - session_start]
+            if message_id >= archive_start:
+                return self.archive[message_id - archive_start]
+        if message_id < len(self._log_offsets):
+            if self.conversation_log is not None and self.conversation_log.log_path == self._log_offsets_path:
+                self.conversation_log.commit()
+            return read_log_entry(self._log_offsets_path, self._log_offsets[message_id])
+        return None
+    
+    def search_messages(self, query, limit=None):
+        """
+        Search every stored turn through the inverted index
+        
+        All words must match; "quoted phrases" must appear verbatim.
+        
+        Args:
+            query (str): Words to search for
+            limit (int, optional): Maximum number of results
+        
+        Returns:
+            list: (message_id, MessageRecord) pairs, best matches first
+        """
+        def text_lookup(message_id):
+            record = self.get_message(message_id)
+            return record.message if record is not None else None
+        
+        results = []
+        for message_id in self.message_index.search(query, limit, text_lookup):
+            record = self.get_message(message_id)
+            if record is not None:
+                results.append((message_id, record))
+        return results
+    
+    def recall_similar(self, text, top_k=5):
+        """
+        Recall the stored turns closest in meaning to a text
+        
+        Args:
+            text (str): Text to compare against, e.g. the user's message
+            top_k (int): Number of turns to recall
+        
+        Returns:
+            list: (message_id, MessageRecord, similarity) triples, most similar first
         """
-        return self.conversation_history[-num_messages:] if self.conversation_history else []
+        if self.semantic_memory is None:
+            return []
+        results = []
+        for message_id, similarity in self.semantic_memory.search(self.encoder.encode(text), top_k):
+            record = self.get_message(message_id)
+            if record is not None:
+                results.append((message_id, record, similarity))
+        return results
     
     def update_emotional_context(self, context_data):
         """
@@ -87,35 +287,200 @@ class MemoryAgent:
         return self.emotional_context.copy()
     
     def clear_session_memory(self):
-        """Clear session memory"""
-        self.session_memory = []
+        """Clear session memory, spilling its turns to persistent storage first"""
+        with self._lock:
+            self._spill(self.session_memory)
+            self.session_memory.clear()
+    
+    def _spill(self, entries):
+        """
+        Move turns leaving session memory to the archive and spill file
+        
+        Without a spill file the turns are only archived in RAM.
+        
+        Args:
+            entries (iterable): MessageRecord entries to spill
+        """
+        entries = list(entries)
+        with self._lock:
+            self.archive.extend(entries)
+            archived = len(self.archive)
+        if self.spill_path and entries:
+            with open(self.spill_path, 'a', encoding='utf-8') as file:
+                for entry in entries:
+                    file.write(json.dumps(entry.to_dict(), ensure_ascii=False) + "\n")
+        self.spilled_count += len(entries)
+        
+        if archived >= config.COMPACTION_THRESHOLD:
+            self._schedule_compaction()
+    
+    def _schedule_compaction(self):
+        """Run compaction in the background, or inline if configured so"""
+        if not config.BACKGROUND_COMPACTION:
+            self.compact()
+            return
+        if self._compaction is not None and not self._compaction.done():
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="compaction")
+        self._compaction = self._executor.submit(self.compact)
+    
+    def compact(self):
+        """
+        Roll the oldest archived turns into summaries
+        
+        Batches of config.COMPACTION_BATCH turns are summarized until fewer
+        than config.COMPACTION_THRESHOLD raw turns remain archived. The raw
+        turns leave RAM; if they were logged, get_message still reads them
+        back from the log. At most config.MAX_SUMMARIES summaries are
+        kept, the oldest being merged together.
+        
+        Returns:
+            int: Number of turns compacted
+        """
+        compacted = 0
+        with self._compaction_lock:
+            while True:
+                with self._lock:
+                    if len(self.archive) < config.COMPACTION_THRESHOLD:
+                        break
+                    batch_size = min(config.COMPACTION_BATCH, len(self.archive))
+                    first_id = self.message_count - len(self.session_memory) - len(self.archive)
+                    records = [self.archive[i] for i in range(batch_size)]
+                
+                # Summarizing is the expensive part and needs no lock
+                summary = ConversationSummary.from_records(first_id, records)
+                
+                with self._lock:
+                    self.archive.discard_oldest(batch_size)
+                    self.summaries.append(summary)
+                    if len(self.summaries) > config.MAX_SUMMARIES:
+                        oldest = self.summaries.popleft()
+                        self.summaries[0] = oldest.merge(self.summaries[0])
+                compacted += batch_size
+        return compacted
+    
+    def wait_for_compaction(self):
+        """Block until any background compaction has finished"""
+        if self._compaction is not None:
+            self._compaction.result()
+    
+    def iter_history(self):
+        """
+        Stream every turn held in RAM, archived turns first
+        
+        Yields:
+            MessageRecord: Turns, oldest first
+        """
+        yield from self.archive
+        yield from self.session_memory
+    
+    def iter_spilled_history(self):
+        """
+        Stream turns previously spilled to disk, oldest first
+        
+        Yields:
+            dict: Memory entries
+        """
+        if not self.spill_path:
+            return
+        try:
+            with open(self.spill_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if line.strip():
+                        yield json.loads(line)
+        except FileNotFoundError:
+            return
     
     def save_conversation(self, filename):
         """
         Save conversation to a file
         
+        Saving to the active log only syncs it. Any other file gets a
+        snapshot of the conversation and becomes the active log, so later
+        turns are appended to it one line at a time.
+        
         Args:
             filename (str): File to save conversation to
         """
-        # Placeholder for saving conversation
-        pass
+        log = self.conversation_log
+        if log is not None and os.path.abspath(log.log_path) == os.path.abspath(filename):
+            log.commit()
+            return
+        
+        # The active log holds every turn, including ones no longer in RAM
+        turns = self.iter_logged_history() if log is not None else self.iter_history()
+        snapshot = ConversationLog(filename, truncate=True)
+        offsets = snapshot.extend(turns)
+        if log is not None:
+            log.close()
+        self.conversation_log = snapshot
+        
+        # Offsets only map message ids if no compacted turn went missing
+        with self._lock:
+            if len(offsets) == self.message_count:
+                self._log_offsets = array("Q", offsets)
+                self._log_offsets_path = filename
+            else:
+                self._log_offsets = array("Q")
+                self._log_offsets_path = None
     
     def load_conversation(self, filename):
         """
         Load conversation from a file
         
+        The log is streamed; only the newest turns that fit in session
+        memory are kept, older ones stay on disk (see iter_logged_history).
+        New turns are appended to the same file.
+        
         Args:
             filename (str): File to load conversation from
         """
-        # Placeholder for loading conversation
-        pass
+        self.wait_for_compaction()
+        self.session_memory.clear()
+        self.archive.clear()
+        self.summaries.clear()
+        self.message_index.clear()
+        self._log_offsets = array("Q")
+        self._log_offsets_path = filename
+        
+        for message_id, (offset, record) in enumerate(iter_log_entries(filename)):
+            self.session_memory.append(record)
+            self.message_index.add(message_id, record.message)
+            self._log_offsets.append(offset)
+        self.message_count = len(self._log_offsets)
+        
+        # A memory-mapped embedding file saved with this log is reused as is
+        if self.semantic_memory is not None and len(self.semantic_memory) != self.message_count:
+            self.semantic_memory.clear()
+            for record in iter_log(filename):
+                self.semantic_memory.add(self.encoder.encode(record.message))
+            self.semantic_memory.truncate(self.message_count)
+        
+        if self.conversation_log is not None:
+            self.conversation_log.close()
+        self.conversation_log = ConversationLog(filename)
     
-    def _get_current_timestamp(self):
+    def iter_logged_history(self):
         """
-        Get current timestamp
+        Stream every turn in the conversation log, oldest first
         
-        Returns:
-            str: Current timestamp
+        Yields:
+            MessageRecord: Logged turns
         """
-        from datetime import datetime
-        return datetime.now().isoformat()
\ No newline at end of file
+        if self.conversation_log is None:
+            return
+        self.conversation_log.commit()
+        yield from iter_log(self.conversation_log.log_path)
+    
+    def close(self):
+        """Finish compaction, then sync and close the conversation log, embeddings and long-term memory store"""
+        self.wait_for_compaction()
+        if self._executor is not None and self._owns_executor:
+            self._executor.shutdown()
+            self._executor = None
+        if self.conversation_log is not None:
+            self.conversation_log.close()
+        if self.semantic_memory is not None:
+            self.semantic_memory.flush()
+        self.long_term_memory.close()
\ No newline at end of file
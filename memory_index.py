@@ -0,0 +1,243 @@
+"""
+Memory Index
+
+Inverted index over conversation turns, maintained as turns are stored.
+Posting lists hold message ids in increasing order, so multi-term
+queries intersect them by binary search instead of scanning history.
+"""
+
+import re
+import math
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+WORD_PATTERN = re.compile(r"\w+")
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text):
+    """
+    Split text into lowercase word tokens
+    
+    Args:
+        text (str): Text to tokenize
+    
+    Returns:
+        list: Word tokens
+    """
+    return WORD_PATTERN.findall(text.casefold())
+
+
+def parse_query(query):
+    """
+    Split a query into required terms and quoted phrases
+    
+    Args:
+        query (str): Words, optionally with "quoted phrases"
+    
+    Returns:
+        tuple: (terms, phrases); phrases are token lists of two or more words
+    """
+    terms = []
+    phrases = []
+    for phrase, word in QUERY_PATTERN.findall(query):
+        tokens = tokenize(phrase if phrase else word)
+        terms.extend(tokens)
+        if len(tokens) > 1 and phrase:
+            phrases.append(tokens)
+    return list(dict.fromkeys(terms)), phrases
+
+
+def _contains_phrase(tokens, phrase):
+    """Check whether a token list contains a phrase as a contiguous run"""
+    first = phrase[0]
+    length = len(phrase)
+    for start, token in enumerate(tokens):
+        if token == first and tokens[start:start + length] == phrase:
+            return True
+    return False
+
+
+class Posting:
+    """Message ids containing one token, with impact levels for repeats"""
+    
+    __slots__ = ("ids", "repeats", "levels")
+    
+    def __init__(self):
+        """Initialize an empty posting"""
+        self.ids = array("L")
+        # Most words occur once per message, so only repeats are recorded:
+        # by message id, and grouped by frequency for impact-ordered access
+        self.repeats = {}
+        self.levels = {}
+    
+    def add(self, message_id, frequency):
+        """Record a message containing the token"""
+        self.ids.append(message_id)
+        if frequency > 1:
+            self.repeats[message_id] = frequency
+            level = self.levels.get(frequency)
+            if level is None:
+                level = self.levels[frequency] = array("L")
+            level.append(message_id)
+    
+    def __contains__(self, message_id):
+        found = bisect_left(self.ids, message_id)
+        return found < len(self.ids) and self.ids[found] == message_id
+    
+    def frequency(self, message_id):
+        """Occurrences of the token in a message it is known to contain"""
+        return self.repeats.get(message_id, 1)
+    
+    def iter_impacts(self):
+        """Yield (frequency, message id) for repeats, highest frequency then newest first"""
+        for frequency in sorted(self.levels, reverse=True):
+            for message_id in reversed(self.levels[frequency]):
+                yield frequency, message_id
+
+
+class MessageIndex:
+    """Incrementally maintained inverted index of message ids"""
+    
+    def __init__(self):
+        """Initialize an empty index"""
+        self.postings = {}
+        self.document_count = 0
+    
+    def add(self, message_id, text):
+        """
+        Index one message
+        
+        Ids must be added in increasing order.
+        
+        Args:
+            message_id (int): Id of the message
+            text (str): Message text
+        """
+        for token, frequency in Counter(tokenize(text)).items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = Posting()
+            posting.add(message_id, frequency)
+        self.document_count += 1
+    
+    def clear(self):
+        """Remove every posting"""
+        self.postings.clear()
+        self.document_count = 0
+    
+    def search(self, query, limit=None, text_lookup=None):
+        """
+        Find messages containing every query term, best matches first
+        
+        Results are ranked by tf-idf; ties go to the newer message. With a
+        limit, messages repeating a query term are visited in impact order
+        until no unvisited one can make the top results; the rest share the
+        base score, so the newest of them fill any remaining places.
+        
+        Args:
+            query (str): Words, optionally with "quoted phrases"
+            limit (int, optional): Maximum number of results
+            text_lookup (callable, optional): Maps a message id to its text;
+                required to check quoted phrases
+        
+        Returns:
+            list: Matching message ids
+        """
+        terms, phrases = parse_query(query)
+        postings = [self.postings.get(term) for term in terms]
+        if not terms or any(posting is None for posting in postings) or limit == 0:
+            return []
+        if phrases and text_lookup is None:
+            raise ValueError("text_lookup is required for phrase queries")
+        
+        # Walk the shortest list and binary-search the others
+        postings.sort(key=lambda posting: len(posting.ids))
+        weights = [math.log(1 + self.document_count / len(posting.ids)) for posting in postings]
+        
+        def score(message_id):
+            return sum(posting.frequency(message_id) * weight
+                       for weight, posting in zip(weights, postings))
+        
+        def matches(message_id):
+            if not all(message_id in posting for posting in postings[1:]):
+                return False
+            return not phrases or self._matches_phrases(text_lookup(message_id), phrases)
+        
+        # Scoring the shortest list outright beats walking longer repeat
+        # streams, e.g. a rare word next to a very common one
+        if limit is None or len(postings[0].ids) <= sum(len(posting.repeats) for posting in postings):
+            scored = [(score(message_id), message_id)
+                      for message_id in postings[0].ids if matches(message_id)]
+            if limit is None:
+                scored.sort(reverse=True)
+            else:
+                scored = heapq.nlargest(limit, scored)
+            return [message_id for _, message_id in scored]
+        
+        top = self._top_repeated(postings, weights, limit, score, matches)
+        
+        # Everything else scores exactly the base; take the newest
+        base = []
+        if len(top) < limit:
+            for message_id in reversed(postings[0].ids):
+                if len(base) >= limit:
+                    break
+                if (not any(message_id in posting.repeats for posting in postings)
+                        and matches(message_id)):
+                    base.append((sum(weights), message_id))
+        return [message_id for _, message_id in heapq.nlargest(limit, top + base)]
+    
+    @staticmethod
+    def _top_repeated(postings, weights, limit, score, matches):
+        """
+        Find the best messages that repeat a query term
+        
+        Each term's repeats are read in impact order. An unvisited message
+        can score at most the sum of every term's current impact, so the
+        walk stops once the top results all rank above that threshold.
+        
+        Returns:
+            list: Up to limit (score, message id) pairs, best first
+        """
+        streams = [posting.iter_impacts() for posting in postings]
+        heads = [next(stream, None) for stream in streams]
+        heap = []
+        seen = set()
+        while any(head is not None for head in heads):
+            threshold = sum(weight * (head[0] if head is not None else 1)
+                            for weight, head in zip(weights, heads))
+            # Streams run newest first within a level, so an unvisited message
+            # reaching the threshold is no newer than the oldest head
+            newest_unvisited = min(head[1] for head in heads if head is not None)
+            if len(heap) == limit and heap[0] > (threshold, newest_unvisited):
+                break
+            
+            # Advance the stream with the highest impact
+            index = max((i for i, head in enumerate(heads) if head is not None),
+                        key=lambda i: weights[i] * heads[i][0])
+            message_id = heads[index][1]
+            heads[index] = next(streams[index], None)
+            if message_id in seen or message_id not in postings[0]:
+                continue
+            seen.add(message_id)
+            
+            entry = (score(message_id), message_id)
+            if len(heap) == limit and entry <= heap[0]:
+                continue
+            if matches(message_id):
+                if len(heap) < limit:
+                    heapq.heappush(heap, entry)
+                else:
+                    heapq.heapreplace(heap, entry)
+        return sorted(heap, reverse=True)
+    
+    @staticmethod
+    def _matches_phrases(text, phrases):
+        """Check a message text against every quoted phrase"""
+        if text is None:
+            return False
+        tokens = tokenize(text)
+        return all(_contains_phrase(tokens, phrase) for phrase in phrases)
\ No newline at end of file
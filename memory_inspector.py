@@ -4,7 +4,7 @@ Memory Inspector Utility
 Lets users review and optionally edit stored memories.
 """
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
 
 class MemoryInspector:
@@ -61,31 +61,52 @@ class MemoryInspector:
             timestamp = entry.get('timestamp', 'unknown')
             print(f"{i+1}. [{timestamp}] {sender}: {message}")
     
-    def search_memories(self, search_term: str) -> List[Dict]:
+    def display_summaries(self) -> None:
+        """Display summaries of compacted conversation history"""
+        summaries = getattr(self.memory_agent, 'summaries', [])
+        
+        print("\n=== Conversation Summaries ===")
+        if not summaries:
+            print("No conversation summaries available.")
+            return
+        
+        for i, summary in enumerate(summaries):
+            print(f"{i+1}. [{summary.get('timestamp', 'unknown')}] {summary.get('message', '')}")
+    
+    def search_memories(self, search_term: str, limit: Optional[int] = None) -> List[Dict]:
         """
         Search memories for a specific term
         
+        Uses the memory agent's inverted index when it has one: every word
+        must match, "quoted phrases" must match verbatim and each turn is
+        returned once, best matches first.
+        
         Args:
             search_term (str): Term to search for
+            limit (int, optional): Maximum number of results
             
         Returns:
             List[Dict]: Matching memory entries
         """
-        matches = []
-        
-        # Search session memory
-        session_memory = getattr(self.memory_agent, 'session_memory', [])
-        for entry in session_memory:
-            if search_term.lower() in entry.get('message', '').lower():
-                matches.append(entry)
-        
-        # Search conversation history
-        conversation_history = getattr(self.memory_agent, 'conversation_history', [])
-        for entry in conversation_history:
-            if search_term.lower() in entry.get('message', '').lower():
+        if hasattr(self.memory_agent, 'search_messages'):
+            matches = []
+            for message_id, record in self.memory_agent.search_messages(search_term, limit):
+                entry = record.to_dict()
+                entry["id"] = message_id
                 matches.append(entry)
+            return matches
         
-        return matches
+        # Without an index, scan session memory and history once each
+        matches = []
+        seen = set()
+        term = search_term.lower()
+        for entries in (getattr(self.memory_agent, 'session_memory', []),
+                        getattr(self.memory_agent, 'conversation_history', [])):
+            for entry in entries:
+                if id(entry) not in seen and term in entry.get('message', '').lower():
+                    seen.add(id(entry))
+                    matches.append(entry)
+        return matches[:limit]
     
     def get_memory_statistics(self) -> Dict[str, Any]:
         """
@@ -97,11 +118,13 @@ class MemoryInspector:
         session_memory = getattr(self.memory_agent, 'session_memory', [])
         long_term_memory = getattr(self.memory_agent, 'long_term_memory', {})
         conversation_history = getattr(self.memory_agent, 'conversation_history', [])
+        summaries = getattr(self.memory_agent, 'summaries', [])
         
         return {
             "session_memory_count": len(session_memory),
             "long_term_memory_count": len(long_term_memory),
             "conversation_history_count": len(conversation_history),
+            "summary_count": len(summaries),
             "total_entries": len(session_memory) + len(conversation_history)
         }
     
@@ -117,14 +140,21 @@ class MemoryInspector:
         session_memory = getattr(self.memory_agent, 'session_memory', [])
         long_term_memory = getattr(self.memory_agent, 'long_term_memory', {})
         conversation_history = getattr(self.memory_agent, 'conversation_history', [])
+        summaries = getattr(self.memory_agent, 'summaries', [])
         
         export_data = {
-            "session_memory": session_memory,
-            "long_term_memory": long_term_memory,
-            "conversation_history": conversation_history
+            "session_memory": [self._as_dict(entry) for entry in session_memory],
+            "long_term_memory": dict(long_term_memory),
+            "conversation_history": [self._as_dict(entry) for entry in conversation_history],
+            "summaries": [summary.to_dict() for summary in summaries]
         }
         
         with open(filepath, 'w', encoding='utf-8') as file:
             json.dump(export_data, file, indent=2, ensure_ascii=False)
         
-        print(f"Memories exported to {filepath}")
\ No newline at end of file
+        print(f"Memories exported to {filepath}")
+    
+    @staticmethod
+    def _as_dict(entry) -> Dict:
+        """Build a dict view of a memory entry; compact records convert on demand"""
+        return entry.to_dict() if hasattr(entry, 'to_dict') else dict(entry)
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+Long-Term Memory Stores
+
+Pluggable key/value backends for MemoryAgent.long_term_memory. Stores
+behave like dicts; writes are buffered until flush() so a batch of
+interactions costs one transaction.
+"""
+
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+
+
+class MemoryStore(MutableMapping):
+    """Base class for long-term memory backends"""
+    
+    def flush(self):
+        """Persist buffered writes; a no-op for stores without a buffer"""
+    
+    def close(self):
+        """Persist buffered writes and release resources"""
+        self.flush()
+
+
+class InMemoryStore(MemoryStore):
+    """Process-local store, lost on exit"""
+    
+    def __init__(self):
+        """Initialize an empty store"""
+        self._data = {}
+    
+    def __getitem__(self, key):
+        return self._data[key]
+    
+    def __setitem__(self, key, value):
+        self._data[key] = value
+    
+    def __delitem__(self, key):
+        del self._data[key]
+    
+    def __iter__(self):
+        return iter(self._data)
+    
+    def __len__(self):
+        return len(self._data)
+
+
+# Statements are constant strings so sqlite3 reuses the prepared form
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS long_term_memory (
+    companion_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (companion_id, session_id, key)
+) WITHOUT ROWID
+"""
+_SELECT = "SELECT value FROM long_term_memory WHERE companion_id = ? AND session_id = ? AND key = ?"
+_SELECT_KEYS = "SELECT key FROM long_term_memory WHERE companion_id = ? AND session_id = ? ORDER BY key"
+_COUNT = "SELECT COUNT(*) FROM long_term_memory WHERE companion_id = ? AND session_id = ?"
+_UPSERT = ("INSERT INTO long_term_memory (companion_id, session_id, key, value) VALUES (?, ?, ?, ?) "
+           "ON CONFLICT (companion_id, session_id, key) DO UPDATE SET value = excluded.value")
+_DELETE = "DELETE FROM long_term_memory WHERE companion_id = ? AND session_id = ? AND key = ?"
+
+# Marks a buffered delete
+_DELETED = object()
+
+
+class SQLiteMemoryStore(MemoryStore):
+    """
+    Long-term memory in a local SQLite database
+    
+    The database runs in WAL mode, so any number of processes can read
+    while one writes. Keys are indexed per companion and session.
+    """
+    
+    def __init__(self, db_path, companion_id="default", session_id="", timeout=30.0):
+        """
+        Open (and if needed create) a memory database
+        
+        Args:
+            db_path (str): SQLite database file
+            companion_id (str): Companion the memories belong to
+            session_id (str): Session scope; empty for memories shared by all sessions
+            timeout (float): Seconds to wait for another process's write lock
+        """
+        self.db_path = db_path
+        self.companion_id = companion_id
+        self.session_id = session_id
+        self._scope = (companion_id, session_id)
+        self._pending = {}
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(db_path, timeout=timeout, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute(_SCHEMA)
+    
+    def __getitem__(self, key):
+        with self._lock:
+            if key in self._pending:
+                encoded = self._pending[key]
+                if encoded is _DELETED:
+                    raise KeyError(key)
+            else:
+                row = self._connection.execute(_SELECT, self._scope + (key,)).fetchone()
+                if row is None:
+                    raise KeyError(key)
+                encoded = row[0]
+        return json.loads(encoded)
+    
+    def __setitem__(self, key, value):
+        # Encode now so later mutation of value cannot change what is saved
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._pending[key] = encoded
+    
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        with self._lock:
+            self._pending[key] = _DELETED
+    
+    def __iter__(self):
+        with self._lock:
+            keys = [row[0] for row in self._connection.execute(_SELECT_KEYS, self._scope)]
+            pending = dict(self._pending)
+        for key in keys:
+            if pending.pop(key, None) is not _DELETED:
+                yield key
+        for key, value in pending.items():
+            if value is not _DELETED:
+                yield key
+    
+    def __len__(self):
+        with self._lock:
+            if not self._pending:
+                return self._connection.execute(_COUNT, self._scope).fetchone()[0]
+        return sum(1 for _ in self)
+    
+    @property
+    def pending_count(self):
+        """Number of buffered writes and deletes"""
+        return len(self._pending)
+    
+    def flush(self):
+        """Write buffered changes in a single transaction"""
+        with self._lock:
+            if not self._pending:
+                return
+            upserts = [self._scope + (key, encoded)
+                       for key, encoded in self._pending.items() if encoded is not _DELETED]
+            deletes = [self._scope + (key,)
+                       for key, value in self._pending.items() if value is _DELETED]
+            with self._connection:
+                self._connection.executemany(_UPSERT, upserts)
+                self._connection.executemany(_DELETE, deletes)
+            self._pending.clear()
+    
+    def close(self):
+        """Flush buffered changes and close the connection"""
+        with self._lock:
+            self.flush()
+            self._connection.close()
\ No newline at end of file
@@ -0,0 +1,221 @@
+"""
+Message Parser Utility
+
+Turns CSV, JSON and JSONL chat exports into compact message records so
+only the message text, not headers, timestamps or sender columns,
+reaches personality analysis.
+"""
+
+import csv
+import sys
+import json
+import itertools
+from typing import Any, Dict, IO, Iterator, Optional
+
+# Column / key names recognized in exports, most specific first
+SENDER_FIELDS = ("sender", "from", "author", "sender_name", "name", "user")
+TIMESTAMP_FIELDS = ("timestamp", "date", "datetime", "time", "sent_at", "created_at")
+TEXT_FIELDS = ("text", "message", "body", "content")
+
+# Keys under which exports commonly nest their message list
+MESSAGE_LIST_FIELDS = ("messages", "conversation", "chats")
+
+
+class Message:
+    """A single parsed message"""
+    
+    __slots__ = ("sender", "timestamp", "text")
+    
+    def __init__(self, sender: Optional[str], timestamp: Any, text: str):
+        """
+        Initialize a message record
+        
+        Args:
+            sender (str, optional): Who sent the message; interned
+            timestamp (Any): Timestamp as given by the export
+            text (str): Message text
+        """
+        self.sender = sys.intern(sender) if sender else None
+        self.timestamp = timestamp
+        self.text = text
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get a dict view of the message
+        
+        Returns:
+            Dict[str, Any]: Sender, timestamp and text
+        """
+        return {"sender": self.sender, "timestamp": self.timestamp, "text": self.text}
+    
+    def __eq__(self, other):
+        if not isinstance(other, Message):
+            return NotImplemented
+        return (self.sender, self.timestamp, self.text) == (other.sender, other.timestamp, other.text)
+    
+    def __repr__(self):
+        return f"Message(sender={self.sender!r}, timestamp={self.timestamp!r}, text={self.text!r})"
+
+
+def _find_field(names, candidates) -> Optional[str]:
+    """Return the first name matching a candidate field, case-insensitively"""
+    lowered = {name.strip().lower(): name for name in names if isinstance(name, str)}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    return None
+
+
+def _matches_sender(message: Message, sender: Optional[str]) -> bool:
+    """Check a message against an optional case-insensitive sender filter"""
+    if sender is None:
+        return True
+    return message.sender is not None and message.sender.casefold() == sender.casefold()
+
+
+def message_from_record(record: Any) -> Optional[Message]:
+    """
+    Build a message from one parsed JSON value
+    
+    Args:
+        record (Any): A JSON object or string
+    
+    Returns:
+        Optional[Message]: The message, or None if the record holds no text
+    """
+    if isinstance(record, str):
+        return Message(None, None, record)
+    if not isinstance(record, dict):
+        return None
+    
+    text_field = _find_field(record, TEXT_FIELDS)
+    if text_field is None or not isinstance(record[text_field], str):
+        return None
+    
+    sender_field = _find_field(record, SENDER_FIELDS)
+    timestamp_field = _find_field(record, TIMESTAMP_FIELDS)
+    sender = record[sender_field] if sender_field else None
+    return Message(
+        sender if isinstance(sender, str) else None,
+        record[timestamp_field] if timestamp_field else None,
+        record[text_field]
+    )
+
+
+def parse_csv_messages(file: IO[str], sender: Optional[str] = None) -> Iterator[Message]:
+    """
+    Stream messages from a CSV export
+    
+    A header row naming a text column (text, message, body or content) is
+    used to pick the sender, timestamp and text columns. Without one,
+    every row is treated as data and its last column as the text.
+    
+    Args:
+        file (IO[str]): Open CSV file
+        sender (str, optional): Only yield messages from this sender
+    
+    Yields:
+        Message: Parsed messages in file order
+    """
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None:
+        return
+    
+    text_field = _find_field(header, TEXT_FIELDS)
+    if text_field is None:
+        # No recognizable header: the first row is a message too
+        rows = itertools.chain([header], reader)
+        text_index, sender_index, timestamp_index = -1, None, None
+        min_length = 1
+    else:
+        rows = reader
+        sender_field = _find_field(header, SENDER_FIELDS)
+        timestamp_field = _find_field(header, TIMESTAMP_FIELDS)
+        text_index = header.index(text_field)
+        sender_index = header.index(sender_field) if sender_field else None
+        timestamp_index = header.index(timestamp_field) if timestamp_field else None
+        min_length = max(index for index in (text_index, sender_index, timestamp_index)
+                         if index is not None) + 1
+    
+    for row in rows:
+        if len(row) < min_length:
+            continue
+        message = Message(
+            row[sender_index] if sender_index is not None else None,
+            row[timestamp_index] if timestamp_index is not None else None,
+            row[text_index]
+        )
+        if message.text.strip() and _matches_sender(message, sender):
+            yield message
+
+
+def parse_jsonl_messages(file: IO[str], sender: Optional[str] = None) -> Iterator[Message]:
+    """
+    Stream messages from a JSON Lines export, one line at a time
+    
+    Args:
+        file (IO[str]): Open JSONL file
+        sender (str, optional): Only yield messages from this sender
+    
+    Yields:
+        Message: Parsed messages in file order
+    """
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        yield from parse_json_messages(json.loads(line), sender)
+
+
+def parse_json_messages(data: Any, sender: Optional[str] = None) -> Iterator[Message]:
+    """
+    Extract messages from a parsed JSON export
+    
+    Accepts an array of messages, an object nesting one under a key such
+    as "messages", or a single message object.
+    
+    Args:
+        data (Any): Parsed JSON document
+        sender (str, optional): Only yield messages from this sender
+    
+    Yields:
+        Message: Parsed messages in document order
+    """
+    if isinstance(data, dict):
+        list_field = _find_field(data, MESSAGE_LIST_FIELDS)
+        records = data[list_field] if list_field and isinstance(data[list_field], list) else [data]
+    elif isinstance(data, list):
+        records = data
+    else:
+        records = [data]
+    
+    for record in records:
+        message = message_from_record(record)
+        if message is not None and _matches_sender(message, sender):
+            yield message
+
+
+def is_json_lines(file: IO[str]) -> bool:
+    """
+    Detect whether an open .json file actually holds JSON Lines
+    
+    The first line must be a complete JSON object on its own. The file
+    position is restored afterwards.
+    
+    Args:
+        file (IO[str]): Open JSON file
+    
+    Returns:
+        bool: True if the file should be parsed line by line
+    """
+    position = file.tell()
+    first_line = file.readline().strip()
+    file.seek(position)
+    if not first_line.startswith("{"):
+        return False
+    try:
+        json.loads(first_line)
+    except ValueError:
+        return False
+    return True
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+Compact Message Records
+
+Slotted per-turn records and columnar stores for bulk history. Dict
+views are only built on demand, e.g. for the Memory Inspector.
+"""
+
+import sys
+from array import array
+from datetime import datetime
+
+
+def to_epoch(timestamp=None):
+    """
+    Normalize a timestamp to epoch seconds
+    
+    Args:
+        timestamp (datetime, str, float, optional): ISO string, datetime or
+            epoch seconds; None means now
+    
+    Returns:
+        float: Seconds since the epoch
+    """
+    if timestamp is None:
+        return datetime.now().timestamp()
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    if isinstance(timestamp, str):
+        return datetime.fromisoformat(timestamp).timestamp()
+    return float(timestamp)
+
+
+def to_iso(epoch):
+    """
+    Format epoch seconds as a local ISO timestamp
+    
+    Args:
+        epoch (float): Seconds since the epoch
+    
+    Returns:
+        str: ISO 8601 timestamp
+    """
+    return datetime.fromtimestamp(epoch).isoformat()
+
+
+class MessageRecord:
+    """A single conversation turn"""
+    
+    __slots__ = ("sender", "message", "timestamp")
+    
+    def __init__(self, sender, message, timestamp=None):
+        """
+        Initialize a message record
+        
+        Args:
+            sender (str): Who sent the message; interned, so all records
+                share one string per sender
+            message (str): The message content, referenced, not copied
+            timestamp (datetime, str, float, optional): When the message was sent
+        """
+        self.sender = sys.intern(sender)
+        self.message = message
+        self.timestamp = to_epoch(timestamp)
+    
+    def to_dict(self):
+        """
+        Get a dict view of the record
+        
+        Returns:
+            dict: Sender, message and ISO timestamp
+        """
+        return {"sender": self.sender, "message": self.message, "timestamp": to_iso(self.timestamp)}
+    
+    def __getitem__(self, key):
+        # Read-only mapping access keeps code written for dict entries working
+        if key == "timestamp":
+            return to_iso(self.timestamp)
+        if key in ("sender", "message"):
+            return getattr(self, key)
+        raise KeyError(key)
+    
+    def get(self, key, default=None):
+        """
+        Look up a field like dict.get
+        
+        Args:
+            key (str): "sender", "message" or "timestamp"
+            default (any): Value for unknown keys
+        
+        Returns:
+            any: The field value
+        """
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def __repr__(self):
+        return f"MessageRecord(sender={self.sender!r}, message={self.message!r}, timestamp={self.timestamp!r})"
+
+
+class MessageColumns:
+    """Columnar store of conversation turns"""
+    
+    def __init__(self):
+        """Initialize empty columns"""
+        self.sender_codes = array("H")
+        self.timestamps = array("d")
+        self.messages = []
+        self._sender_names = []
+        self._sender_index = {}
+    
+    def _sender_code(self, sender):
+        """Map a sender to its small integer code"""
+        code = self._sender_index.get(sender)
+        if code is None:
+            code = len(self._sender_names)
+            self._sender_names.append(sys.intern(sender))
+            self._sender_index[sender] = code
+        return code
+    
+    def append(self, record):
+        """
+        Append a turn
+        
+        Args:
+            record (MessageRecord): The turn to store
+        """
+        self.sender_codes.append(self._sender_code(record.sender))
+        self.timestamps.append(record.timestamp)
+        self.messages.append(record.message)
+    
+    def extend(self, records):
+        """
+        Append several turns
+        
+        Args:
+            records (iterable): MessageRecord objects
+        """
+        for record in records:
+            self.append(record)
+    
+    def discard_oldest(self, count):
+        """
+        Remove the oldest turns
+        
+        Args:
+            count (int): Number of turns to remove
+        """
+        del self.sender_codes[:count]
+        del self.timestamps[:count]
+        del self.messages[:count]
+    
+    def clear(self):
+        """Remove all turns"""
+        del self.sender_codes[:]
+        del self.timestamps[:]
+        self.messages.clear()
+    
+    def __len__(self):
+        return len(self.messages)
+    
+    def __getitem__(self, index):
+        record = MessageRecord.__new__(MessageRecord)
+        record.sender = self._sender_names[self.sender_codes[index]]
+        record.message = self.messages[index]
+        record.timestamp = self.timestamps[index]
+        return record
+    
+    def __iter__(self):
+        for index in range(len(self.messages)):
+            yield self[index]
+    
+    def iter_dicts(self):
+        """
+        Stream dict views of the stored turns
+        
+        Yields:
+            dict: Sender, message and ISO timestamp per turn
+        """
+        for record in self:
+            yield record.to_dict()
\ No newline at end of file
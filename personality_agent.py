@@ -6,8 +6,18 @@ Builds a "memory profile" for the agent.
 Implemented as a LoopAgent to improve accuracy iteratively.
 """
 
-import re
-import random
+from .text_analysis import TextStatistics, collect_statistics, collect_mapped_statistics
+
+# Keyword tables used by the trait extractors
+WARM_WORDS = ("love", "care", "happy", "wonderful", "amazing", "beautiful", "sweet", "kind", "gentle")
+FORMAL_WORDS = ("therefore", "consequently", "however", "nevertheless", "furthermore", "moreover", "additionally")
+CASUAL_WORDS = ("hey", "cool", "awesome", "gonna", "wanna", "dunno", "lol", "omg")
+HUMOR_WORDS = ("haha", "lol", "lmao", "rofl", "jk", "kidding")
+PLAYFUL_WORDS = ("funny", "joke", "laugh", "silly", "goofy", "wacky")
+POSITIVE_WORDS = ("happy", "joy", "love", "wonderful", "amazing", "great", "excellent", "fantastic", "good")
+NEGATIVE_WORDS = ("sad", "angry", "hate", "terrible", "awful", "horrible", "bad", "worst", "disappointed")
+STOP_WORDS = frozenset(["the", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with", "by", "is", "are", "was", "were", "be", "been", "have", "has", "had", "do", "does", "did", "will", "would", "could", "should", "may", "might", "must", "can", "this", "that", "these", "those", "a", "an"])
+
 
 class PersonalityAgent:
     """Agent responsible for analyzing personality traits from text data"""
@@ -15,6 +25,7 @@ class PersonalityAgent:
     def __init__(self):
         """Initialize the personality analyzer"""
         self.memory_profile = {}
+        self.statistics = TextStatistics()
         self.tone_patterns = []
         self.humor_indicators = []
         self.sentiment_patterns = []
@@ -24,49 +35,100 @@ class PersonalityAgent:
         """
         Analyze text data to extract personality characteristics
         
+        The text is tokenized once; every extractor reads the shared
+        statistics instead of rescanning the corpus. The statistics
+        replace any previously accumulated ones. Iterators such as
+        FileImporter.iter_chunks are consumed chunk by chunk.
+        
         Args:
-            text_data (str or list): Text data to analyze
+            text_data (str, list or iterator): Text data to analyze
             
         Returns:
             dict: Analysis results including tone, humor, and sentiment patterns
         """
-        # Convert to string if it's a list
-        if isinstance(text_data, list):
-            text_content = " ".join(str(item) for item in text_data)
-        else:
-            text_content = str(text_data)
-        
-        # Perform analysis
-        analysis_results = {
-            "tone": self._extract_tone(text_content),
-            "humor": self._detect_humor(text_content),
-            "sentiment": self._analyze_sentiment(text_content),
-            "vocabulary": self._extract_vocabulary_patterns(text_content),
-            "phrases": self._identify_common_phrases(text_content)
+        self.statistics = TextStatistics.from_text(text_data)
+        return self._refresh_profile()
+    
+    def analyze_text_parallel(self, text_data, max_workers=None):
+        """
+        Analyze a large corpus across several processes
+        
+        The corpus is sharded on document and sentence boundaries, each
+        shard is analyzed in a worker process and the partial statistics
+        are merged. The resulting profile is identical to analyze_text.
+        
+        Args:
+            text_data (str or list): Text data to analyze
+            max_workers (int, optional): Worker processes; defaults to the CPU count
+        
+        Returns:
+            dict: Analysis results including tone, humor, and sentiment patterns
+        """
+        self.statistics = collect_statistics(text_data, max_workers=max_workers)
+        return self._refresh_profile()
+    
+    def analyze_mapped_file(self, file_path, ranges, max_workers=None):
+        """
+        Analyze a memory-mapped text archive without loading it whole
+        
+        Each worker maps the file and decodes only its own byte range, so
+        the processes share the page cache rather than copies of the text.
+        
+        Args:
+            file_path (str): Path to a UTF-8 text file
+            ranges (iterable): (start, end) byte offsets on message boundaries,
+                e.g. from FileImporter.iter_message_ranges
+            max_workers (int, optional): Worker processes; defaults to the CPU count
+        
+        Returns:
+            dict: Analysis results including tone, humor, and sentiment patterns
+        """
+        self.statistics = collect_mapped_statistics(file_path, ranges, max_workers=max_workers)
+        return self._refresh_profile()
+        
+    def build_profile(self, stats):
+        """
+        Derive personality characteristics from text statistics
+        
+        Args:
+            stats (TextStatistics): Tokenized text statistics
+        
+        Returns:
+            dict: Analysis results including tone, humor, and sentiment patterns
+        """
+        return {
+            "tone": self._extract_tone(stats),
+            "humor": self._detect_humor(stats),
+            "sentiment": self._analyze_sentiment(stats),
+            "vocabulary": self._extract_vocabulary_patterns(stats),
+            "phrases": self._identify_common_phrases(stats)
         }
         
-        # Update the memory profile
+    def _refresh_profile(self):
+        """
+        Rebuild the memory profile from the accumulated statistics
+        
+        Returns:
+            dict: Analysis results for everything analyzed so far
+        """
+        analysis_results = self.build_profile(self.statistics)
         self.memory_profile.update(analysis_results)
         return analysis_results
     
-    def _extract_tone(self, text_data):
+    def _extract_tone(self, stats):
         """
         Extract tone patterns from text
         
         Args:
-            text_data (str): Text data to analyze
+            stats (TextStatistics): Tokenized text statistics
             
         Returns:
             dict: Tone analysis results
         """
         # Count emotional words
-        warm_words = ["love", "care", "happy", "wonderful", "amazing", "beautiful", "sweet", "kind", "gentle"]
-        formal_words = ["therefore", "consequently", "however", "nevertheless", "furthermore", "moreover", "additionally"]
-        casual_words = ["hey", "cool", "awesome", "gonna", "wanna", "dunno", "lol", "omg"]
-        
-        warm_count = sum(1 for word in warm_words if word in text_data.lower())
-        formal_count = sum(1 for word in formal_words if word in text_data.lower())
-        casual_count = sum(1 for word in casual_words if word in text_data.lower())
+        warm_count = stats.count_present(WARM_WORDS)
+        formal_count = stats.count_present(FORMAL_WORDS)
+        casual_count = stats.count_present(CASUAL_WORDS)
         
         # Determine dominant tone
         if warm_count > formal_count and warm_count > casual_count:
@@ -84,31 +146,21 @@ class PersonalityAgent:
             "directness": "high" if casual_count > 0 else "moderate"
         }
     
-    def _detect_humor(self, text_data):
+    def _detect_humor(self, stats):
         """
         Detect humor patterns in text
         
         Args:
-            text_data (str): Text data to analyze
+            stats (TextStatistics): Tokenized text statistics
             
         Returns:
             dict: Humor detection results
         """
-        # Look for humor indicators
-        humor_patterns = [
-            r"\b(haha|lol|lmao|rofl)\b",
-            r"[!?]{2,}",  # Multiple exclamation or question marks
-            r"\b(jk|just kidding|kidding)\b",
-            r":\)+|:\(+|;\)+",  # Emoticons
-        ]
-        
-        humor_count = 0
-        for pattern in humor_patterns:
-            humor_count += len(re.findall(pattern, text_data, re.IGNORECASE))
+        # Laughter words, "jk"/"kidding", emoticons and runs of !? marks
+        humor_count = stats.count_occurrences(HUMOR_WORDS) + stats.humor_marks
         
         # Check for playful language
-        playful_words = ["funny", "joke", "laugh", "silly", "goofy", "wacky"]
-        playful_count = sum(1 for word in playful_words if word in text_data.lower())
+        playful_count = stats.count_present(PLAYFUL_WORDS)
         
         uses_humor = humor_count > 2 or playful_count > 1
         humor_frequency = "high" if humor_count > 5 else "moderate" if humor_count > 2 else "low"
@@ -119,22 +171,19 @@ class PersonalityAgent:
             "frequency": humor_frequency
         }
     
-    def _analyze_sentiment(self, text_data):
+    def _analyze_sentiment(self, stats):
         """
         Analyze sentiment in text
         
         Args:
-            text_data (str): Text data to analyze
+            stats (TextStatistics): Tokenized text statistics
             
         Returns:
             dict: Sentiment analysis results
         """
         # Simple sentiment analysis based on keywords
-        positive_words = ["happy", "joy", "love", "wonderful", "amazing", "great", "excellent", "fantastic", "good"]
-        negative_words = ["sad", "angry", "hate", "terrible", "awful", "horrible", "bad", "worst", "disappointed"]
-        
-        positive_count = sum(1 for word in positive_words if word in text_data.lower())
-        negative_count = sum(1 for word in negative_words if word in text_data.lower())
+        positive_count = stats.count_present(POSITIVE_WORDS)
+        negative_count = stats.count_present(NEGATIVE_WORDS)
         
         if positive_count > negative_count:
             overall_sentiment = "positive"
@@ -152,75 +201,53 @@ class PersonalityAgent:
             "emotional_range": emotional_range
         }
     
-    def _extract_vocabulary_patterns(self, text_data):
+    def _extract_vocabulary_patterns(self, stats):
         """
         Extract vocabulary patterns from text
         
         Args:
-            text_data (str): Text data to analyze
+            stats (TextStatistics): Tokenized text statistics
             
         Returns:
             dict: Vocabulary patterns
         """
-        # Split into words and get unique words
-        words = re.findall(r'\b\w+\b', text_data.lower())
-        unique_words = set(words)
-        
-        # Get most common words (excluding common stop words)
-        stop_words = {"the", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with", "by", "is", "are", "was", "were", "be", "been", "have", "has", "had", "do", "does", "did", "will", "would", "could", "should", "may", "might", "must", "can", "this", "that", "these", "those", "a", "an"}
-        filtered_words = [word for word in words if word not in stop_words and len(word) > 3]
+        word_counts = stats.word_counts
         
-        # Get word frequency
-        word_freq = {}
-        for word in filtered_words:
-            word_freq[word] = word_freq.get(word, 0) + 1
-        
-        # Get top preferred words
-        preferred_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:10]
+        # Most common words, excluding stop words; ties break alphabetically
+        word_freq = [(word, count) for word, count in word_counts.items()
+                     if len(word) > 3 and word not in STOP_WORDS]
+        preferred_words = sorted(word_freq, key=lambda x: (-x[1], x[0]))[:5]
         preferred_words = [word for word, freq in preferred_words]
         
         # Estimate complexity
-        avg_word_length = sum(len(word) for word in unique_words) / len(unique_words) if unique_words else 0
+        avg_word_length = sum(len(word) for word in word_counts) / len(word_counts) if word_counts else 0
         complexity = "high" if avg_word_length > 6 else "low" if avg_word_length < 4 else "moderate"
         
         # Estimate sentence length
-        sentences = re.split(r'[.!?]+', text_data)
-        avg_sentence_length = sum(len(sentence.split()) for sentence in sentences if sentence.strip()) / len([s for s in sentences if s.strip()]) if sentences else 0
+        avg_sentence_length = stats.average_sentence_length
         sentence_length = "long" if avg_sentence_length > 20 else "short" if avg_sentence_length < 10 else "varied"
         
         return {
-            "preferred_words": preferred_words[:5],  # Top 5 preferred words
+            "preferred_words": preferred_words,  # Top 5 preferred words
             "complexity": complexity,
             "sentence_length": sentence_length
         }
     
-    def _identify_common_phrases(self, text_data):
+    def _identify_common_phrases(self, stats):
         """
         Identify commonly used phrases
         
+        Phrases start with "I" or "You", or pivot on "always" or "never".
+        
         Args:
-            text_data (str): Text data to analyze
+            stats (TextStatistics): Tokenized text statistics
             
         Returns:
             list: Common phrases
         """
-        # Look for common phrase patterns
-        phrases = []
-        
-        # Look for phrases that start with "I" or "You"
-        i_phrases = re.findall(r'\b(I\s\w+\s\w+)', text_data)
-        you_phrases = re.findall(r'\b(You\s\w+\s\w+)', text_data)
-        
-        # Look for phrases with "always" or "never"
-        always_phrases = re.findall(r'\b(\w+\s+always\s+\w+)', text_data)
-        never_phrases = re.findall(r'\b(\w+\s+never\s+\w+)', text_data)
-        
-        # Combine and deduplicate
-        all_phrases = i_phrases + you_phrases + always_phrases + never_phrases
-        unique_phrases = list(set(all_phrases))
-        
-        # Return up to 5 common phrases
-        return unique_phrases[:5]
+        # Return up to 5 phrases, most frequent first
+        ranked = sorted(stats.phrase_counts.items(), key=lambda x: (-x[1], x[0]))
+        return [phrase for phrase, count in ranked[:5]]
     
     def get_memory_profile(self):
         """
@@ -231,14 +258,40 @@ class PersonalityAgent:
         """
         return self.memory_profile.copy()
     
+    def get_statistics(self):
+        """
+        Get a copy of the accumulated text statistics
+        
+        Returns:
+            TextStatistics: Statistics behind the current memory profile
+        """
+        return self.statistics.copy()
+    
     def update_analysis(self, new_data):
         """
         Update analysis with new data
         
+        Only the new data is tokenized; its counts are added to the
+        existing statistics, so the profile matches a full re-analysis.
+        
         Args:
             new_data (str or list): New text data to analyze
+        
+        Returns:
+            dict: Analysis results for all data seen so far
+        """
+        self.statistics.merge(TextStatistics.from_text(new_data))
+        return self._refresh_profile()
+    
+    def merge_statistics(self, stats):
+        """
+        Merge statistics built elsewhere, e.g. by another worker
+        
+        Args:
+            stats (TextStatistics): Partial statistics to fold in
+        
+        Returns:
+            dict: Analysis results for the merged statistics
         """
-        # In a full implementation, this would refine the existing analysis
-        # For now, we'll just do a new analysis
-        new_profile = self.analyze_text(new_data)
-        self.memory_profile.update(new_profile)
\ No newline at end of file
+        self.statistics.merge(stats)
+        return self._refresh_profile()
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+Async Response Pipeline
+
+Awaitable variant of the reply pipeline for async servers. Steps that do
+not depend on each other run concurrently on the event loop's executor,
+and bookkeeping after the reply (storing it, logging its sentiment)
+finishes in the background instead of delaying it. Replies can also be
+streamed, chunk by chunk as the model writes them.
+"""
+
+import asyncio
+import logging
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncResponsePipeline:
+    """
+    Mixin adding generate_response_async
+    
+    Classes using it provide memory_agent, emotion_agent, response_agent,
+    _retrieve_memories(user_input) and _record_reply(user_input, response).
+    It also adds stream_response_async, which yields the reply in chunks.
+    """
+    
+    __slots__ = ()
+    
+    def _turn_lock(self):
+        """Lock serializing turns, one per event loop"""
+        loop = asyncio.get_running_loop()
+        if getattr(self, '_async_loop', None) is not loop:
+            self._async_loop = loop
+            self._async_lock = asyncio.Lock()
+        return self._async_lock
+    
+    async def generate_response_async(self, user_input):
+        """
+        Generate a response without blocking the event loop
+        
+        The user's sentiment, the recent context and the relevant memories
+        are worked out concurrently. The reply is returned as soon as it
+        is generated; storing it and analyzing its sentiment finish in the
+        background before the next turn starts (see wait_for_bookkeeping).
+        
+        Args:
+            user_input (str): The user's message
+        
+        Returns:
+            str: The companion's response
+        """
+        async with self._turn_lock():
+            await self.wait_for_bookkeeping()
+            loop = asyncio.get_running_loop()
+            
+            # The context must include this message, so store it first
+            await loop.run_in_executor(None, self.memory_agent.store_message, "user", user_input)
+            sentiment = loop.run_in_executor(None, self.emotion_agent.analyze_sentiment, user_input, "user")
+            context, memories = await asyncio.gather(
+                loop.run_in_executor(None, partial(self.memory_agent.get_recent_context, include_summaries=True)),
+                loop.run_in_executor(None, self._retrieve_memories, user_input)
+            )
+            # A model backend blocks until the reply arrives
+            response = await loop.run_in_executor(
+                None, self.response_agent.generate_response, user_input, context, memories)
+            
+            self._bookkeeping = asyncio.ensure_future(self._finish_turn(sentiment, user_input, response))
+            return response
+    
+    async def stream_response_async(self, user_input):
+        """
+        Generate a response chunk by chunk without blocking the event loop
+        
+        Prepares the turn as generate_response_async does, then passes on
+        the reply as ResponseAgent.stream_response produces it. Once the
+        first chunk is out the turn is committed: when the stream ends, or
+        is closed early, the reply sent so far is stored in the background.
+        
+        Args:
+            user_input (str): The user's message
+        
+        Yields:
+            str: Chunks of the companion's response
+        """
+        async with self._turn_lock():
+            await self.wait_for_bookkeeping()
+            loop = asyncio.get_running_loop()
+            
+            await loop.run_in_executor(None, self.memory_agent.store_message, "user", user_input)
+            sentiment = loop.run_in_executor(None, self.emotion_agent.analyze_sentiment, user_input, "user")
+            context, memories = await asyncio.gather(
+                loop.run_in_executor(None, partial(self.memory_agent.get_recent_context, include_summaries=True)),
+                loop.run_in_executor(None, self._retrieve_memories, user_input)
+            )
+            # Each chunk may wait on the model, so pull them on the executor
+            chunks = self.response_agent.stream_response(user_input, context, memories)
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                return
+            sent = []
+            try:
+                while chunk is not None:
+                    sent.append(chunk)
+                    yield chunk
+                    chunk = await loop.run_in_executor(None, next, chunks, None)
+            finally:
+                try:
+                    chunks.close()
+                except ValueError:
+                    # Cancelled while the executor is still pulling a chunk;
+                    # the generator is closed when it is collected
+                    pass
+                self._bookkeeping = asyncio.ensure_future(self._finish_turn(sentiment, user_input, "".join(sent)))
+    
+    async def _finish_turn(self, sentiment, user_input, response):
+        """Record the reply once the user's sentiment is logged, keeping the log in order"""
+        try:
+            await sentiment
+            await asyncio.get_running_loop().run_in_executor(None, self._record_reply, user_input, response)
+        except Exception:
+            # The reply has been sent; a failure here must not break the next turn
+            logger.exception("Recording a reply failed")
+            self.bookkeeping_failures = getattr(self, 'bookkeeping_failures', 0) + 1
+    
+    async def wait_for_bookkeeping(self):
+        """
+        Wait until the last reply has been recorded
+        
+        Call this before the event loop stops, or the last reply may not
+        be stored.
+        """
+        bookkeeping = getattr(self, '_bookkeeping', None)
+        if bookkeeping is not None:
+            self._bookkeeping = None
+            await bookkeeping
\ No newline at end of file
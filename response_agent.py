@@ -6,206 +6,294 @@ Checks context, sentiment, and conversation continuity using Context Engineering
 """
 
 import random
+from collections import namedtuple
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from itertools import accumulate
+
+from utils.validation_checker import ValidationChecker
+from .response_backend import BackendError
+from .response_cache import profile_fingerprint
+
+# Failures of a model backend that fall back to template replies
+BACKEND_ERRORS = (BackendError, TimeoutError, FutureTimeoutError, OSError)
+
+# Template tables, built once instead of on every reply
+HUMOROUS_RESPONSES = (
+    "Haha, that reminds me of something funny!",
+    "You always know how to make me smile with comments like that.",
+    "That's quite the observation! I bet you're grinning as you type this.",
+    "Only you would say something like that!",
+)
+WARM_RESPONSES = (
+    "I'm so glad you shared that with me.",
+    "Thank you for telling me about this. It means a lot.",
+    "You have such a beautiful way of looking at things.",
+    "I can feel the warmth in your words.",
+)
+FORMAL_RESPONSES = (
+    "Thank you for sharing your thoughts with me.",
+    "I appreciate you taking the time to communicate this to me.",
+    "Your perspective on this matter is quite insightful.",
+    "I find your observations to be particularly noteworthy.",
+)
+PERSONALIZED_RESPONSES = {
+    "positive": (
+        "I'm happy to hear about this!",
+        "That sounds wonderful!",
+        "I can sense the joy in your message.",
+        "What a lovely thing to share.",
+    ),
+    "negative": (
+        "I'm here for you during this difficult time.",
+        "I understand this must be challenging for you.",
+        "It's okay to feel this way.",
+        "I'm listening, and I care about what you're going through.",
+    ),
+    "neutral": (
+        "I've been thinking about what you said.",
+        "That's an interesting point.",
+        "I understand how you feel.",
+        "Thank you for sharing that with me.",
+    ),
+}
+CONTINUATIONS = (
+    "How are you doing today?",
+    "What's been on your mind lately?",
+    "Is there anything specific you'd like to talk about?",
+    "I'm here to listen whenever you need to share.",
+)
+# Used until a personality profile is loaded
+PLACEHOLDER_RESPONSES = (
+    "I've been thinking about what you said.",
+    "That's an interesting point.",
+    "I understand how you feel.",
+    "Thank you for sharing that with me.",
+    "I appreciate you telling me about this.",
+)
+HUMOR_PROBABILITY = 0.3  # Share of replies that joke, for a personality with humor
+
+ResponsePlan = namedtuple("ResponsePlan", "style responses cum_weights humor_probability phrases fingerprint")
+ResponsePlan.__doc__ = """Immutable reply strategy compiled from a personality profile"""
+
+
+def compile_response_plan(profile):
+    """
+    Compile a personality profile into a response plan
+    
+    The profile is read once: the reply style it calls for, its phrases
+    and its humor are flattened into one weighted table of replies, so
+    generating a reply is a single weighted sample.
+    
+    Args:
+        profile (dict): Profile from PersonalityAgent, possibly frozen;
+            empty for placeholder replies
+    
+    Returns:
+        ResponsePlan: The compiled plan
+    """
+    profile = profile or {}
+    tone = profile.get("tone", {}).get("emotional_tone", "neutral")
+    sentiment = profile.get("sentiment", {}).get("overall_sentiment", "neutral")
+    phrases = tuple(profile.get("phrases", ()))
+    
+    if not profile:
+        style, replies = "placeholder", PLACEHOLDER_RESPONSES
+    elif tone == "warm" or sentiment == "positive":
+        style, replies = "warm", WARM_RESPONSES
+    elif tone == "formal":
+        style, replies = "formal", FORMAL_RESPONSES
+    elif phrases:
+        # One of their phrases, then a question to keep the conversation going
+        style, replies = "phrases", tuple(f"{phrase} {continuation}"
+                                          for phrase in phrases for continuation in CONTINUATIONS)
+    else:
+        style, replies = "personalized", PERSONALIZED_RESPONSES.get(sentiment, PERSONALIZED_RESPONSES["neutral"])
+    
+    humor_probability = HUMOR_PROBABILITY if profile and profile.get("humor", {}).get("uses_humor") else 0.0
+    jokes = HUMOROUS_RESPONSES if humor_probability else ()
+    weights = ([humor_probability / len(HUMOROUS_RESPONSES)] * len(jokes)
+               + [(1 - humor_probability) / len(replies)] * len(replies))
+    return ResponsePlan(style, jokes + replies, tuple(accumulate(weights)), humor_probability, phrases,
+                        profile_fingerprint(profile))
+
+
+EMPTY_PLAN = compile_response_plan({})
+
 
 class ResponseAgent:
     """Agent responsible for generating contextually appropriate responses"""
     
-    def __init__(self):
-        """Initialize the response generator"""
+    def __init__(self, backend=None, cache=None, seed=None):
+        """
+        Initialize the response generator
+        
+        Args:
+            backend (ResponseBackend, optional): Model that writes replies;
+                replies come from built-in templates without one
+            cache (ResponseCache, optional): Cache of the backend's replies,
+                which may be shared by agents with the same companion
+            seed (int, optional): Seed for template choices, for reproducible
+                tests and benchmarks
+        """
         self.personality_profile = {}
+        self.plan = EMPTY_PLAN
+        self.profile_fingerprint = EMPTY_PLAN.fingerprint
+        self.random = random.Random(seed)
         self.context_history = []
         self.response_templates = []
+        self.relevant_memories = []
+        self.backend = backend
+        self.cache = cache
+        self.backend_failures = 0
+        self.validator = ValidationChecker()
+        self.unsafe_responses = 0
     
-    def generate_response(self, user_message, context=None):
+    def generate_response(self, user_message, context=None, memories=None):
         """
         Generate a response based on user message and context
         
         Args:
             user_message (str): The user's message
             context (list, optional): Conversation context
+            memories (list, optional): Relevant past passages from
+                PassageRetriever.retrieve
             
         Returns:
             str: Generated response
         """
-        # Use personality profile to customize response
-        if self.personality_profile:
-            response = self._generate_personality_based_response(user_message, context)
-        else:
-            # Fallback to placeholder response
-            response = self._generate_placeholder_response(user_message)
+        self.relevant_memories = memories or []
         
-        return response
-    
-    def _generate_personality_based_response(self, user_message, context):
-        """
-        Generate a response based on personality profile
-        
-        Args:
-            user_message (str): The user's message
-            context (list): Conversation context
-            
-        Returns:
-            str: Personality-based response
-        """
-        # Extract personality characteristics
-        tone = self.personality_profile.get("tone", {}).get("emotional_tone", "neutral")
-        humor = self.personality_profile.get("humor", {}).get("uses_humor", False)
-        sentiment = self.personality_profile.get("sentiment", {}).get("overall_sentiment", "neutral")
-        vocabulary = self.personality_profile.get("vocabulary", {}).get("preferred_words", [])
-        phrases = self.personality_profile.get("phrases", [])
-        
-        # Adjust response based on personality
-        if humor and random.random() < 0.3:  # 30% chance to use humor if personality has it
-            return self._generate_humorous_response(user_message)
-        elif tone == "warm" or sentiment == "positive":
-            return self._generate_warm_response(user_message)
-        elif tone == "formal":
-            return self._generate_formal_response(user_message)
-        elif phrases:
-            # Use common phrases from the personality
-            return f"{random.choice(phrases)} {self._generate_continuation(user_message)}"
-        else:
-            # Default personalized response
-            return self._generate_personalized_response(user_message, tone, sentiment)
-    
-    def _generate_humorous_response(self, user_message):
-        """
-        Generate a humorous response
+        if self.backend is not None:
+            key = self._cache_key(user_message, context)
+            response = self.cache.get(key) if key is not None else None
+            if response is not None:
+                return response
+            try:
+                response = self.backend.generate(self.build_prompt(user_message, context))
+            except BACKEND_ERRORS:
+                # A slow or unreachable model should not leave the user without a reply
+                self.backend_failures += 1
+            else:
+                self._complete(key, response, context)
+                return response
         
-        Args:
-            user_message (str): The user's message
-            
-        Returns:
-            str: Humorous response
-        """
-        humorous_responses = [
-            f"Haha, that reminds me of something funny!",
-            f"You always know how to make me smile with comments like that.",
-            f"That's quite the observation! I bet you're grinning as you type this.",
-            f"Only you would say something like that!",
-        ]
-        return random.choice(humorous_responses)
+        return self._template_response()
     
-    def _generate_warm_response(self, user_message):
+    def stream_response(self, user_message, context=None, memories=None):
         """
-        Generate a warm response
+        Generate a response chunk by chunk
         
-        Args:
-            user_message (str): The user's message
-            
-        Returns:
-            str: Warm response
-        """
-        warm_responses = [
-            f"I'm so glad you shared that with me.",
-            f"Thank you for telling me about this. It means a lot.",
-            f"You have such a beautiful way of looking at things.",
-            f"I can feel the warmth in your words.",
-        ]
-        return random.choice(warm_responses)
-    
-    def _generate_formal_response(self, user_message):
-        """
-        Generate a formal response
+        Model replies are passed on token by token as the backend streams
+        them, so the first words arrive after the model's first-token
+        latency rather than its full generation time. Cached and template
+        replies come as a single chunk. The finished reply is validated and
+        cached, as generate_response does.
         
         Args:
             user_message (str): The user's message
-            
-        Returns:
-            str: Formal response
-        """
-        formal_responses = [
-            f"Thank you for sharing your thoughts with me.",
-            f"I appreciate you taking the time to communicate this to me.",
-            f"Your perspective on this matter is quite insightful.",
-            f"I find your observations to be particularly noteworthy.",
-        ]
-        return random.choice(formal_responses)
-    
-    def _generate_personalized_response(self, user_message, tone, sentiment):
+            context (list, optional): Conversation context
+            memories (list, optional): Relevant past passages from
+                PassageRetriever.retrieve
+        
+        Yields:
+            str: Chunks of the reply; joined they form the whole reply
         """
-        Generate a personalized response based on tone and sentiment
+        self.relevant_memories = memories or []
         
-        Args:
-            user_message (str): The user's message
-            tone (str): Emotional tone
-            sentiment (str): Overall sentiment
-            
-        Returns:
-            str: Personalized response
-        """
-        if sentiment == "positive":
-            responses = [
-                f"I'm happy to hear about this!",
-                f"That sounds wonderful!",
-                f"I can sense the joy in your message.",
-                f"What a lovely thing to share.",
-            ]
-        elif sentiment == "negative":
-            responses = [
-                f"I'm here for you during this difficult time.",
-                f"I understand this must be challenging for you.",
-                f"It's okay to feel this way.",
-                f"I'm listening, and I care about what you're going through.",
-            ]
-        else:  # neutral
-            responses = [
-                f"I've been thinking about what you said.",
-                f"That's an interesting point.",
-                f"I understand how you feel.",
-                f"Thank you for sharing that with me.",
-            ]
-        
-        return random.choice(responses)
-    
-    def _generate_continuation(self, user_message):
-        """
-        Generate a continuation for a response
+        if self.backend is not None:
+            key = self._cache_key(user_message, context)
+            response = self.cache.get(key) if key is not None else None
+            if response is not None:
+                yield response
+                return
+            chunks = []
+            try:
+                for chunk in self.backend.stream(self.build_prompt(user_message, context)):
+                    chunks.append(chunk)
+                    yield chunk
+            except BACKEND_ERRORS:
+                self.backend_failures += 1
+                if chunks:
+                    # Part of the reply is already with the user; end it there
+                    return
+            else:
+                if chunks:
+                    self._complete(key, "".join(chunks), context)
+                    return
         
-        Args:
-            user_message (str): The user's message
-            
-        Returns:
-            str: Response continuation
-        """
-        continuations = [
-            "How are you doing today?",
-            "What's been on your mind lately?",
-            "Is there anything specific you'd like to talk about?",
-            "I'm here to listen whenever you need to share.",
-        ]
-        return random.choice(continuations)
+        yield self._template_response()
+    
+    def _cache_key(self, user_message, context):
+        """Cache key for a reply, or None without a cache"""
+        if self.cache is None:
+            return None
+        return self.cache.key(user_message, self.profile_fingerprint, context, self.relevant_memories)
+    
+    def _complete(self, key, response, context):
+        """Validate a finished model reply and cache it if it is safe"""
+        if not self.validator.validate_response(response, context)["is_safe"]:
+            # Sent as it is, but never repeated from the cache
+            self.unsafe_responses += 1
+        elif key is not None:
+            self.cache.put(key, response)
     
-    def _generate_placeholder_response(self, user_message):
+    def _template_response(self):
+        """Sample a template reply; the plan already reflects the personality profile"""
+        plan = self.plan
+        return self.random.choices(plan.responses, cum_weights=plan.cum_weights)[0]
+    
+    def build_prompt(self, user_message, context=None):
         """
-        Generate a placeholder response
+        Build the model prompt for a reply
         
         Args:
             user_message (str): The user's message
-            
+            context (list, optional): Recent conversation, which may already
+                end with user_message
+        
         Returns:
-            str: Placeholder response
+            str: Prompt describing the personality, memories and conversation
         """
-        # This is a simple placeholder - a real implementation would use
-        # the personality profile and context to generate a meaningful response
-        responses = [
-            "I've been thinking about what you said.",
-            "That's an interesting point.",
-            "I understand how you feel.",
-            "Thank you for sharing that with me.",
-            "I appreciate you telling me about this."
-        ]
+        profile = self.personality_profile
+        lines = ["You are writing as the user's loved one. Reply in their voice, briefly and warmly."]
+        if profile:
+            lines.append(f"Tone: {profile.get('tone', {}).get('emotional_tone', 'neutral')}, "
+                         f"{profile.get('tone', {}).get('formal_level', 'moderate')} formality.")
+            lines.append(f"Overall sentiment: {profile.get('sentiment', {}).get('overall_sentiment', 'neutral')}.")
+            if self.plan.humor_probability:
+                lines.append("They often joked.")
+            if self.plan.phrases:
+                lines.append("Phrases they used: " + "; ".join(self.plan.phrases[:5]))
+        # Earlier turns are not their words, so keep them apart from the letters
+        written = [memory for memory in self.relevant_memories if memory["source"] != "conversation"]
+        recalled = [memory for memory in self.relevant_memories if memory["source"] == "conversation"]
+        if written:
+            lines.append("Things they wrote:")
+            lines.extend(f"- {memory['text']}" for memory in written)
+        if recalled:
+            lines.append("Earlier in your conversations:")
+            lines.extend(f"- {memory['text']}" for memory in recalled)
         
-        return random.choice(responses)
+        lines.append("Conversation:")
+        context = list(context or [])
+        lines.extend(f"{entry['sender']}: {entry['message']}" for entry in context)
+        if not context or context[-1]["message"] != user_message:
+            lines.append(f"user: {user_message}")
+        lines.append("companion:")
+        return "\n".join(lines)
     
-    def set_personality_profile(self, profile):
+    def set_personality_profile(self, profile, plan=None):
         """
         Set the personality profile to use for response generation
         
         Args:
             profile (dict): Personality profile data
+            plan (ResponsePlan, optional): Plan already compiled from this
+                profile, e.g. shared by a companion's sessions
         """
         self.personality_profile = profile
+        self.plan = plan if plan is not None else compile_response_plan(profile)
+        self.profile_fingerprint = self.plan.fingerprint
     
     def add_context(self, context_item):
         """
@@ -0,0 +1,285 @@
+"""
+Response Backends
+
+Pluggable text generators for ResponseAgent. A backend turns a prompt
+into a reply, either whole (generate) or token by token (stream).
+HTTPModelBackend talks to a model server over a small JSON protocol:
+
+    POST /v1/generate  {"model": ..., "prompts": [...]}  ->  {"completions": [...]}
+    POST /v1/stream    {"model": ..., "prompt": ...}     ->  one {"token": ...} JSON line per token
+
+stub_model_server.py serves the same protocol locally and
+deterministically, for offline testing and benchmarks.
+"""
+
+import json
+import queue
+import threading
+import time
+import http.client
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from urllib.parse import urlsplit
+
+from config import config
+
+
+class BackendError(RuntimeError):
+    """Raised when a backend fails to produce a reply"""
+
+
+class ResponseBackend:
+    """Base class for response backends"""
+    
+    def generate(self, prompt):
+        """
+        Generate a complete reply
+        
+        Args:
+            prompt (str): The prompt
+        
+        Returns:
+            str: The reply
+        """
+        return "".join(self.stream(prompt))
+    
+    def stream(self, prompt):
+        """
+        Generate a reply token by token
+        
+        Args:
+            prompt (str): The prompt
+        
+        Yields:
+            str: Tokens; joined they form the reply
+        """
+        yield self.generate(prompt)
+    
+    def close(self):
+        """Release connections and worker threads"""
+
+
+class HTTPModelBackend(ResponseBackend):
+    """
+    Model server client with a connection pool and request batching
+    
+    Concurrent generate() calls are queued and sent together: whenever a
+    pooled connection is free, every waiting prompt (up to max_batch)
+    goes out in one request. An idle backend sends each prompt at once;
+    a busy one amortizes round trips across callers.
+    """
+    
+    def __init__(self, url=None, model=None, pool_size=None, max_batch=None, batch_window=None,
+                 timeout=None):
+        """
+        Initialize the backend
+        
+        Args:
+            url (str, optional): Model server base URL; defaults to
+                config.MODEL_BACKEND_URL
+            model (str, optional): Model name; defaults to config.MODEL_NAME
+            pool_size (int, optional): Connections (and batches in flight);
+                defaults to config.MODEL_POOL_SIZE
+            max_batch (int, optional): Prompts per request; defaults to
+                config.MODEL_MAX_BATCH
+            batch_window (float, optional): Seconds to wait for more prompts
+                before sending a batch; defaults to config.MODEL_BATCH_WINDOW
+            timeout (float, optional): Seconds a reply may take; defaults to
+                config.DEFAULT_RESPONSE_TIMEOUT
+        """
+        url = urlsplit(url or config.MODEL_BACKEND_URL)
+        self.host = url.hostname
+        self.port = url.port
+        self.base_path = url.path.rstrip("/")
+        self.model = model or config.MODEL_NAME
+        self.pool_size = pool_size or config.MODEL_POOL_SIZE
+        self.max_batch = max_batch or config.MODEL_MAX_BATCH
+        self.batch_window = config.MODEL_BATCH_WINDOW if batch_window is None else batch_window
+        self.timeout = timeout or config.DEFAULT_RESPONSE_TIMEOUT
+        self.requests = 0
+        self.batches = 0
+        
+        # Idle keep-alive connections, most recently used first
+        self._idle = queue.LifoQueue()
+        # One slot per pooled connection; the dispatcher takes one per batch
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._pending = queue.Queue()
+        self._workers = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="model")
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch, name="model-batcher", daemon=True)
+        self._dispatcher.start()
+    
+    def submit(self, prompt):
+        """
+        Queue a prompt for the next batch
+        
+        Args:
+            prompt (str): The prompt
+        
+        Returns:
+            concurrent.futures.Future: Resolves to the reply
+        """
+        if self._closed:
+            raise BackendError("Backend is closed")
+        future = Future()
+        self._pending.put((prompt, future))
+        return future
+    
+    def generate(self, prompt):
+        """
+        Generate a complete reply
+        
+        Args:
+            prompt (str): The prompt
+        
+        Returns:
+            str: The reply
+        
+        Raises:
+            TimeoutError: If no reply arrives within the timeout
+            BackendError: If the model server fails
+        """
+        future = self.submit(prompt)
+        try:
+            return future.result(timeout=self.timeout)
+        except (TimeoutError, FutureTimeoutError):
+            # Before Python 3.11 futures raise their own TimeoutError
+            future.cancel()
+            raise TimeoutError(f"No reply within {self.timeout} s")
+    
+    def stream(self, prompt):
+        """
+        Stream a reply token by token; streams are not batched
+        
+        Args:
+            prompt (str): The prompt
+        
+        Yields:
+            str: Tokens as the server produces them
+        
+        Raises:
+            TimeoutError: If the reply takes longer than the timeout
+            BackendError: If the model server fails
+        """
+        deadline = time.monotonic() + self.timeout
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No free connection within {self.timeout} s")
+        try:
+            connection = self._connection()
+            finished = False
+            try:
+                response = self._request(connection, "/v1/stream", {"model": self.model, "prompt": prompt})
+                self.requests += 1
+                for line in response:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Reply took longer than {self.timeout} s")
+                    if line.strip():
+                        yield json.loads(line)["token"]
+                finished = True
+            finally:
+                # A half-read response leaves the connection unusable
+                self._release(connection, reusable=finished)
+        finally:
+            self._slots.release()
+    
+    def _dispatch(self):
+        """Batch queued prompts onto free connections until closed"""
+        while True:
+            # Wait for work before taking a slot, so an idle dispatcher holds none
+            item = self._pending.get()
+            if item is None:
+                return
+            self._slots.acquire()
+            batch = [item]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    item = self._pending.get(timeout=remaining) if remaining > 0 else self._pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Closing: send what is batched, then stop
+                    self._pending.put(None)
+                    break
+                batch.append(item)
+            self._workers.submit(self._send_batch, batch)
+    
+    def _send_batch(self, batch):
+        """Send one batch and resolve its futures; holds a slot taken by the dispatcher"""
+        try:
+            batch = [(prompt, future) for prompt, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                return
+            try:
+                completions = self._post("/v1/generate", {"model": self.model,
+                                                          "prompts": [prompt for prompt, _ in batch]})["completions"]
+                if len(completions) != len(batch):
+                    raise BackendError(f"Expected {len(batch)} completions, got {len(completions)}")
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+                return
+            self.batches += 1
+            for (_, future), completion in zip(batch, completions):
+                future.set_result(completion)
+        finally:
+            self._slots.release()
+    
+    def _connection(self):
+        """Take an idle pooled connection or open a new one"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+    
+    def _release(self, connection, reusable=True):
+        """Return a connection to the pool, or close it"""
+        if reusable and not self._closed:
+            self._idle.put(connection)
+        else:
+            connection.close()
+    
+    def _request(self, connection, path, payload):
+        """Send a JSON POST and return the response once its status is OK"""
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        connection.request("POST", self.base_path + path, body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        if response.status != 200:
+            detail = response.read().decode('utf-8', errors='replace')
+            raise BackendError(f"Model server answered {response.status}: {detail}")
+        return response
+    
+    def _post(self, path, payload):
+        """POST JSON on a pooled connection and decode the reply"""
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                response = self._request(connection, path, payload)
+                data = json.loads(response.read())
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # The server closed an idle keep-alive connection; retry on a new one
+                connection.close()
+                if attempt:
+                    raise
+                continue
+            except BaseException:
+                connection.close()
+                raise
+            self.requests += 1
+            self._release(connection)
+            return data
+    
+    def close(self):
+        """Stop batching and close pooled connections"""
+        if self._closed:
+            return
+        self._closed = True
+        self._pending.put(None)
+        self._dispatcher.join()
+        self._workers.shutdown()
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+Response Cache
+
+Bounded LRU cache of model replies, so repeated messages such as "hi"
+or "good night" do not each cost a full generation. Entries are keyed on
+the normalized message, a fingerprint of the personality profile and a
+hash of the recent conversation, and expire after a time to live. Each
+key collects a few generated replies and picks among them on a hit, so
+a cached companion does not repeat itself word for word.
+"""
+
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from config import config
+
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s']")
+
+
+def normalize_message(message):
+    """
+    Normalize a message for cache lookups
+    
+    Args:
+        message (str): The user's message
+    
+    Returns:
+        str: Casefolded message without punctuation or repeated whitespace
+    """
+    return " ".join(PUNCTUATION_PATTERN.sub(" ", message.casefold()).split())
+
+
+def _plain(value):
+    """Turn read-only profile containers back into JSON types"""
+    if isinstance(value, Mapping):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(_plain(item) for item in value)
+    return value
+
+
+def _digest(value):
+    """Short stable digest of a JSON-compatible value"""
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def profile_fingerprint(profile):
+    """
+    Fingerprint a personality profile
+    
+    Args:
+        profile (dict): Profile from PersonalityAgent, possibly frozen
+    
+    Returns:
+        str: Hex digest that changes whenever the profile does
+    """
+    return _digest(_plain(profile or {}))
+
+
+class ResponseCache:
+    """Thread-safe LRU/TTL cache of generated replies"""
+    
+    def __init__(self, max_size=None, ttl=None, variants=None, context_turns=None):
+        """
+        Initialize the cache
+        
+        Args:
+            max_size (int, optional): Keys kept; defaults to
+                config.RESPONSE_CACHE_SIZE, and 0 disables caching
+            ttl (float, optional): Seconds a key stays valid; defaults to
+                config.RESPONSE_CACHE_TTL
+            variants (int, optional): Replies generated per key before hits
+                start; defaults to config.RESPONSE_CACHE_VARIANTS
+            context_turns (int, optional): Earlier turns in the key; defaults
+                to config.RESPONSE_CACHE_CONTEXT_TURNS
+        """
+        self.max_size = config.RESPONSE_CACHE_SIZE if max_size is None else max_size
+        self.ttl = config.RESPONSE_CACHE_TTL if ttl is None else ttl
+        self.variants = max(variants or config.RESPONSE_CACHE_VARIANTS, 1)
+        self.context_turns = config.RESPONSE_CACHE_CONTEXT_TURNS if context_turns is None else context_turns
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (expiry time, list of replies), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def key(self, user_message, fingerprint, context=None, memories=None):
+        """
+        Build the cache key for a reply
+        
+        Args:
+            user_message (str): The user's message
+            fingerprint (str): profile_fingerprint of the active profile
+            context (list, optional): Recent conversation, which may end
+                with user_message
+            memories (list, optional): Passages that go into the prompt
+        
+        Returns:
+            tuple: Normalized message, profile fingerprint and context hash
+        """
+        turns = list(context or [])
+        if turns and turns[-1]["message"] == user_message:
+            turns.pop()
+        turns = turns[-self.context_turns:] if self.context_turns else []
+        context_hash = _digest([[[turn["sender"], turn["message"]] for turn in turns],
+                                [memory["text"] for memory in memories or ()]])
+        return normalize_message(user_message), fingerprint, context_hash
+    
+    def get(self, key):
+        """
+        Look up a reply
+        
+        Args:
+            key (tuple): Key from key()
+        
+        Returns:
+            str: One of the cached replies, or None on a miss, which includes
+                keys still collecting their variants
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None or len(entry[1]) < self.variants:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return random.choice(entry[1])
+    
+    def put(self, key, response):
+        """
+        Cache a generated reply
+        
+        Args:
+            key (tuple): Key from key()
+            response (str): The reply
+        """
+        if not self.max_size:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = (time.monotonic() + self.ttl, [])
+            if len(entry[1]) < self.variants:
+                entry[1].append(response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every cached reply"""
+        with self._lock:
+            self._entries.clear()
+    
+    def get_statistics(self):
+        """
+        Get cache metrics
+        
+        Returns:
+            dict: Entries, hits, misses, evictions and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
\ No newline at end of file
@@ -0,0 +1,345 @@
+"""
+Memory Retrieval
+
+BM25 index over passages of the imported letters and the conversation,
+used to pull the memories most relevant to each user message into the
+response context.
+"""
+
+import os
+import re
+import math
+import mmap
+import heapq
+from array import array
+from collections import Counter, OrderedDict
+
+from config import config
+
+from .memory_index import tokenize
+
+PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+PARAGRAPH_BYTES = re.compile(rb"\n\s*\n")
+SENTENCE_BYTES = re.compile(rb"(?<=[.!?])\s+")
+
+
+def split_passages(text, max_words=None):
+    """
+    Split a document into passages
+    
+    Paragraphs become passages; paragraphs longer than max_words are
+    cut into runs of whole sentences.
+    
+    Args:
+        text (str): Document text
+        max_words (int, optional): Words per passage; defaults to
+            config.RETRIEVAL_PASSAGE_WORDS
+    
+    Returns:
+        list: Passage strings
+    """
+    max_words = max_words or config.RETRIEVAL_PASSAGE_WORDS
+    passages = []
+    for paragraph in PARAGRAPH_PATTERN.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph.split()) <= max_words:
+            passages.append(paragraph)
+            continue
+        
+        current = []
+        current_words = 0
+        for sentence in SENTENCE_PATTERN.split(paragraph):
+            words = len(sentence.split())
+            if current and current_words + words > max_words:
+                passages.append(" ".join(current))
+                current, current_words = [], 0
+            current.append(sentence)
+            current_words += words
+        if current:
+            passages.append(" ".join(current))
+    return passages
+
+
+def iter_passage_spans(data, max_words=None):
+    """
+    Split UTF-8 text into passages by byte offsets
+    
+    Passages are cut as split_passages cuts them, but only their offsets
+    are returned, so a memory-mapped file can be indexed without keeping
+    its text.
+    
+    Args:
+        data (bytes-like): UTF-8 text, e.g. a memory map
+        max_words (int, optional): Words per passage; defaults to
+            config.RETRIEVAL_PASSAGE_WORDS
+    
+    Yields:
+        tuple: (start, end) byte offsets of each passage
+    """
+    max_words = max_words or config.RETRIEVAL_PASSAGE_WORDS
+    start = 0
+    for separator in PARAGRAPH_BYTES.finditer(data):
+        yield from _paragraph_spans(data, start, separator.start(), max_words)
+        start = separator.end()
+    yield from _paragraph_spans(data, start, len(data), max_words)
+
+
+def _paragraph_spans(data, start, end, max_words):
+    """Offsets of the passages in one paragraph, runs of whole sentences if it is long"""
+    paragraph = data[start:end]
+    if len(paragraph.split()) <= max_words:
+        if paragraph.strip():
+            yield start, end
+        return
+    
+    run_start = run_end = run_words = 0
+    sentence_start = 0
+    for separator in list(SENTENCE_BYTES.finditer(paragraph)) + [None]:
+        sentence_end = separator.start() if separator else len(paragraph)
+        words = len(paragraph[sentence_start:sentence_end].split())
+        if run_words and run_words + words > max_words:
+            yield start + run_start, start + run_end
+            run_start, run_words = sentence_start, 0
+        run_end = sentence_end
+        run_words += words
+        if separator:
+            sentence_start = separator.end()
+    if run_words:
+        yield start + run_start, start + run_end
+
+
+class PassageRetriever:
+    """Okapi BM25 retrieval with impact-ordered postings and a query cache"""
+    
+    def __init__(self, k1=1.2, b=0.75, max_postings=None, cache_size=None):
+        """
+        Initialize an empty retriever
+        
+        Args:
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 length normalization
+            max_postings (int, optional): Postings scored per query term, which
+                bounds query latency; defaults to config.RETRIEVAL_MAX_POSTINGS
+            cache_size (int, optional): Queries kept in the LRU cache; defaults
+                to config.RETRIEVAL_CACHE_SIZE
+        """
+        self.k1 = k1
+        self.b = b
+        self.max_postings = max_postings or config.RETRIEVAL_MAX_POSTINGS
+        self.cache_size = cache_size if cache_size is not None else config.RETRIEVAL_CACHE_SIZE
+        # Passage text, or for mapped files an index into the span columns
+        self.passages = []
+        self.sources = []
+        self.files = []
+        self._span_files = array("L")
+        self._span_starts = array("Q")
+        self._span_ends = array("Q")
+        self.lengths = array("L")
+        self.total_length = 0
+        # token -> (passage ids, term frequencies), parallel arrays
+        self.postings = {}
+        # token -> min-heap of the max_postings highest (impact, passage id)
+        # pairs, kept once a posting outgrows the budget
+        self._top_impacts = {}
+        # token -> generation of the last passage containing it
+        self._term_generation = {}
+        self.generation = 0
+        self._cache = OrderedDict()
+        self.cache_hits = 0
+    
+    def __len__(self):
+        return len(self.passages)
+    
+    def _impact(self, frequency, length, average_length):
+        """BM25 term frequency component of one posting, without the idf"""
+        k1 = self.k1
+        return frequency * (k1 + 1) / (frequency + k1 * (1 - self.b + self.b * length / average_length))
+    
+    def add_passage(self, text, source="memory"):
+        """
+        Index one passage
+        
+        Args:
+            text (str): Passage text
+            source (str): Where the passage came from, e.g. "letters"
+        
+        Returns:
+            int: Passage id, or None if the passage has no words
+        """
+        return self._add(text, text, source)
+    
+    def _add(self, text, stored, source):
+        """Index a passage's text, keeping stored (the text or a span index) for retrieval"""
+        tokens = tokenize(text)
+        if not tokens:
+            return None
+        
+        passage_id = len(self.passages)
+        self.generation += 1
+        self.passages.append(stored)
+        self.sources.append(source)
+        self.lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        average_length = self.total_length / len(self.passages)
+        for token, frequency in Counter(tokens).items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = (array("L"), array("H"))
+            posting[0].append(passage_id)
+            posting[1].append(min(frequency, 0xFFFF))
+            self._term_generation[token] = self.generation
+            if len(posting[0]) > self.max_postings:
+                self._push_impact(token, posting, passage_id, frequency, average_length)
+        return passage_id
+    
+    def _push_impact(self, token, posting, passage_id, frequency, average_length):
+        """Offer a new posting to a long term's top-impact heap"""
+        heap = self._top_impacts.get(token)
+        if heap is None:
+            # The posting just outgrew the budget: seed the heap from it
+            ids, frequencies = posting
+            heap = [(self._impact(frequencies[i], self.lengths[ids[i]], average_length), ids[i])
+                    for i in range(len(ids))]
+            self._top_impacts[token] = heapq.nlargest(self.max_postings, heap)
+            heapq.heapify(self._top_impacts[token])
+            return
+        entry = (self._impact(frequency, self.lengths[passage_id], average_length), passage_id)
+        if entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+    
+    def add_document(self, text, source="memory"):
+        """
+        Split a document into passages and index them
+        
+        Args:
+            text (str): Document text
+            source (str): Where the document came from
+        
+        Returns:
+            int: Number of passages indexed
+        """
+        return sum(1 for passage in split_passages(text)
+                   if self.add_passage(passage, source) is not None)
+    
+    def add_mapped_file(self, file_path, source="memory"):
+        """
+        Index a UTF-8 text file through a memory map
+        
+        Only the byte offsets of its passages are kept; their text is read
+        back from the file when they are retrieved, so the file must not
+        change while the retriever is in use.
+        
+        Args:
+            file_path (str): Text or Markdown file
+            source (str): Where the file came from
+        
+        Returns:
+            int: Number of passages indexed
+        """
+        file_id = len(self.files)
+        self.files.append(file_path)
+        count = 0
+        with open(file_path, 'rb') as file:
+            if not os.fstat(file.fileno()).st_size:
+                return 0
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for start, end in iter_passage_spans(mapped):
+                    span = len(self._span_starts)
+                    if self._add(str(mapped[start:end], 'utf-8', errors='replace'), span, source) is None:
+                        continue
+                    self._span_files.append(file_id)
+                    self._span_starts.append(start)
+                    self._span_ends.append(end)
+                    count += 1
+        return count
+    
+    def passage_text(self, passage_id):
+        """
+        Get a passage's text, reading it from its file if it was mapped
+        
+        Args:
+            passage_id (int): Passage id
+        
+        Returns:
+            str: Passage text with whitespace collapsed, as split_passages gives it
+        """
+        passage = self.passages[passage_id]
+        if isinstance(passage, str):
+            return passage
+        start = self._span_starts[passage]
+        with open(self.files[self._span_files[passage]], 'rb') as file:
+            file.seek(start)
+            data = file.read(self._span_ends[passage] - start)
+        return " ".join(str(data, 'utf-8', errors='replace').split())
+    
+    def retrieve(self, query, top_k=None):
+        """
+        Find the passages most relevant to a query
+        
+        Only the rarest query terms are used, and each scores at most
+        max_postings passages, the ones it has the highest impact in, so
+        latency does not grow with the corpus. Results are cached until a passage containing one of the
+        query terms is added.
+        
+        Args:
+            query (str): The user's message
+            top_k (int, optional): Passages to return; defaults to
+                config.RETRIEVAL_TOP_K
+        
+        Returns:
+            list: Dicts with "text", "source" and "score", best first
+        """
+        top_k = top_k or config.RETRIEVAL_TOP_K
+        # Only the rarest terms count; common words barely move BM25 scores
+        terms = sorted(set(term for term in tokenize(query) if term in self.postings),
+                       key=lambda term: (len(self.postings[term][0]), term))
+        terms = tuple(sorted(terms[:config.RETRIEVAL_MAX_QUERY_TERMS]))
+        if not terms:
+            return []
+        
+        key = (terms, top_k)
+        cached = self._cache.get(key)
+        if cached is not None:
+            generation, results = cached
+            if all(self._term_generation[term] <= generation for term in terms):
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return [dict(result) for result in results]
+        
+        results = self._score(terms, top_k)
+        if self.cache_size:
+            self._cache[key] = (self.generation, results)
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return [dict(result) for result in results]
+    
+    def _score(self, terms, top_k):
+        """Accumulate BM25 scores term at a time and keep the best"""
+        passage_count = len(self.passages)
+        average_length = self.total_length / passage_count
+        k1 = self.k1
+        norm = k1 * (1 - self.b)
+        length_factor = k1 * self.b / average_length
+        lengths = self.lengths
+        
+        scores = {}
+        for term in terms:
+            ids, frequencies = self.postings[term]
+            idf = math.log(1 + (passage_count - len(ids) + 0.5) / (len(ids) + 0.5))
+            top_impacts = self._top_impacts.get(term)
+            if top_impacts is not None:
+                # Impacts were computed with the average length at the time
+                for impact, passage_id in top_impacts:
+                    scores[passage_id] = scores.get(passage_id, 0.0) + idf * impact
+                continue
+            for passage_id, frequency in zip(ids, frequencies):
+                score = idf * frequency * (k1 + 1) / (frequency + norm + length_factor * lengths[passage_id])
+                scores[passage_id] = scores.get(passage_id, 0.0) + score
+        
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], item[0]))
+        return tuple({"text": self.passage_text(passage_id), "source": self.sources[passage_id], "score": score}
+                     for passage_id, score in best)
\ No newline at end of file
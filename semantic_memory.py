@@ -0,0 +1,228 @@
+"""
+Semantic Memory
+
+Local embeddings for recalling memories by meaning rather than exact
+words. Messages are encoded as hashed word and character n-gram vectors
+(no network model), stored row by row in a contiguous float32 matrix,
+and recalled with a single matrix-vector product.
+"""
+
+import os
+import json
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from config import config
+
+from .memory_index import tokenize
+
+
+class HashedNgramEncoder:
+    """Deterministic hashed n-gram text encoder"""
+    
+    def __init__(self, dimensions=None, min_n=3, max_n=5):
+        """
+        Initialize the encoder
+        
+        Args:
+            dimensions (int, optional): Vector size; defaults to
+                config.EMBEDDING_DIMENSIONS
+            min_n (int): Shortest character n-gram
+            max_n (int): Longest character n-gram
+        """
+        self.dimensions = dimensions or config.EMBEDDING_DIMENSIONS
+        self.min_n = min_n
+        self.max_n = max_n
+        self._word_slots = lru_cache(maxsize=1 << 16)(self._hash_word)
+    
+    def _hash_feature(self, feature):
+        """Map a feature to a (column, sign) pair; crc32 is stable across runs"""
+        digest = zlib.crc32(feature.encode('utf-8'))
+        return digest % self.dimensions, 1.0 if digest & 0x80000000 else -1.0
+    
+    def _hash_word(self, word):
+        """Hash a word and its character n-grams, cached per distinct word"""
+        features = [word]
+        padded = f"<{word}>"
+        for n in range(self.min_n, min(self.max_n, len(padded)) + 1):
+            for start in range(len(padded) - n + 1):
+                features.append(padded[start:start + n])
+        return tuple(self._hash_feature(feature) for feature in features)
+    
+    def encode(self, text):
+        """
+        Encode one text
+        
+        Args:
+            text (str): Text to encode
+        
+        Returns:
+            numpy.ndarray: L2-normalized float32 vector; all zeros for text without words
+        """
+        slots = [slot for word in tokenize(text) for slot in self._word_slots(word)]
+        if not slots:
+            return np.zeros(self.dimensions, dtype=np.float32)
+        columns, signs = zip(*slots)
+        vector = np.bincount(columns, weights=signs, minlength=self.dimensions).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+    
+    def encode_batch(self, texts):
+        """
+        Encode several texts
+        
+        Args:
+            texts (iterable): Texts to encode
+        
+        Returns:
+            numpy.ndarray: One float32 row per text
+        """
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            matrix[row] = self.encode(text)
+        return matrix
+
+
+class EmbeddingStore:
+    """Contiguous float32 matrix of embeddings, optionally memory-mapped"""
+    
+    def __init__(self, dimensions, path=None, initial_capacity=64):
+        """
+        Open an embedding store
+        
+        Args:
+            dimensions (int): Vector size
+            path (str, optional): .npy file to memory-map; existing
+                embeddings in it are kept. Without a path the matrix
+                lives in RAM.
+            initial_capacity (int): Rows allocated up front
+        """
+        self.dimensions = dimensions
+        self.path = path
+        self.count = 0
+        self._matrix = None
+        if path and os.path.exists(path):
+            self._matrix = np.load(path, mmap_mode='r+')
+            if self._matrix.shape[1] != dimensions:
+                raise ValueError(f"{path} holds {self._matrix.shape[1]}-dimensional embeddings, not {dimensions}")
+            self.count = self._load_count()
+        else:
+            self._resize(max(initial_capacity, 1))
+    
+    def _meta_path(self):
+        """Sidecar file recording how many rows are in use"""
+        return f"{self.path}.json"
+    
+    def _load_count(self):
+        """Read the number of used rows of a memory-mapped store"""
+        try:
+            with open(self._meta_path(), 'r', encoding='utf-8') as file:
+                return min(json.load(file)["count"], self._matrix.shape[0])
+        except FileNotFoundError:
+            return 0
+    
+    def _resize(self, capacity):
+        """Reallocate the matrix with room for capacity rows, keeping used rows"""
+        if not self.path:
+            matrix = np.zeros((capacity, self.dimensions), dtype=np.float32)
+            if self._matrix is not None:
+                matrix[:self.count] = self._matrix[:self.count]
+            self._matrix = matrix
+            return
+        
+        # Build the larger file beside the old one, then swap it in
+        temp_path = f"{self.path}.tmp.npy"
+        matrix = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float32,
+                                           shape=(capacity, self.dimensions))
+        if self._matrix is not None:
+            matrix[:self.count] = self._matrix[:self.count]
+        matrix.flush()
+        del matrix
+        self._matrix = None
+        os.replace(temp_path, self.path)
+        self._matrix = np.load(self.path, mmap_mode='r+')
+    
+    def _grow(self, needed):
+        """Double the capacity until needed rows fit"""
+        capacity = self._matrix.shape[0]
+        if needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            self._resize(capacity)
+    
+    def __len__(self):
+        return self.count
+    
+    def add(self, vector):
+        """
+        Append one embedding
+        
+        Args:
+            vector (numpy.ndarray): Vector of the store's size
+        
+        Returns:
+            int: Row of the embedding
+        """
+        return self.add_batch(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+    
+    def add_batch(self, vectors):
+        """
+        Append several embeddings
+        
+        Args:
+            vectors (numpy.ndarray): One row per embedding
+        
+        Returns:
+            int: Row of the first embedding
+        """
+        first = self.count
+        self._grow(first + len(vectors))
+        self._matrix[first:first + len(vectors)] = vectors
+        self.count += len(vectors)
+        return first
+    
+    def search(self, vector, top_k=5):
+        """
+        Find the stored embeddings most similar to a vector
+        
+        Args:
+            vector (numpy.ndarray): L2-normalized query vector
+            top_k (int): Results to return
+        
+        Returns:
+            list: (row, cosine similarity) pairs, most similar first
+        """
+        if not self.count or top_k <= 0:
+            return []
+        scores = self._matrix[:self.count] @ np.asarray(vector, dtype=np.float32)
+        top_k = min(top_k, self.count)
+        rows = np.argpartition(-scores, top_k - 1)[:top_k]
+        rows = rows[np.lexsort((-rows, -scores[rows]))]
+        return [(int(row), float(scores[row])) for row in rows]
+    
+    def truncate(self, count):
+        """
+        Drop embeddings beyond the first count rows, keeping the allocated matrix
+        
+        Args:
+            count (int): Rows to keep
+        """
+        self.count = min(self.count, count)
+        self.flush()
+    
+    def clear(self):
+        """Drop every embedding"""
+        self.truncate(0)
+    
+    def flush(self):
+        """Write a memory-mapped store's rows and row count to disk"""
+        if not self.path:
+            return
+        self._matrix.flush()
+        with open(self._meta_path(), 'w', encoding='utf-8') as file:
+            json.dump({"count": self.count, "dimensions": self.dimensions}, file)
\ No newline at end of file
@@ -0,0 +1,617 @@
+"""
+Dearly Chat Server
+
+Asyncio HTTP and WebSocket server so many people can talk to their
+companions at once. Built on the standard library only.
+
+Endpoints:
+    POST /sessions/<id>/messages    Chat; a JSON reply, or streamed token
+                                    by token with ?stream=1
+    GET  /sessions/<id>/ws          Chat over a WebSocket; replies are
+                                    streamed token by token
+    GET  /sessions/<id>/memories    Inspect a session's memory; ?q= searches it
+    POST /companions/<id>/memories  Load memories (text or a list of
+                                    documents) for a companion
+    GET  /health                    Server statistics
+
+Run with `dearly serve`.
+"""
+
+import json
+import base64
+import struct
+import asyncio
+import hashlib
+import logging
+import argparse
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from agents.dearly_agent import DearlyAgent
+from agents.response_backend import HTTPModelBackend
+from agents.session_manager import Companion, SessionManager
+from config import config
+from utils.memory_inspector import MemoryInspector
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_HEADER_SIZE = 16 * 1024
+
+# WebSocket opcodes
+CONTINUATION, TEXT, BINARY, CLOSE, PING, PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+class HTTPError(Exception):
+    """Error answered with an HTTP status"""
+    
+    def __init__(self, status, message=None):
+        """
+        Initialize the error
+        
+        Args:
+            status (int): HTTP status code
+            message (str, optional): Explanation; defaults to the status phrase
+        """
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+        self.message = message or HTTPStatus(status).phrase
+
+
+class Request:
+    """A parsed HTTP request"""
+    
+    __slots__ = ("method", "path", "query", "headers", "body")
+    
+    def __init__(self, method, path, query, headers, body=b""):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+    
+    def json(self):
+        """
+        Decode the body as a JSON object
+        
+        Returns:
+            dict: The decoded body; empty for an empty body
+        
+        Raises:
+            HTTPError: 400 if the body is not a JSON object
+        """
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return data
+    
+    @property
+    def parts(self):
+        """Decoded path segments; ids may contain escaped slashes"""
+        return [unquote(part) for part in self.path.split("/") if part]
+    
+    def param(self, name, default=None):
+        """Get a query string parameter"""
+        values = self.query.get(name)
+        return values[0] if values else default
+
+
+class DearlyServer:
+    """Serves chat, memory loading and inspection over HTTP and WebSockets"""
+    
+    def __init__(self, manager=None, max_concurrent=None, max_pending=None, max_body=None, backend=None,
+                 eviction_interval=None):
+        """
+        Initialize the server
+        
+        Args:
+            manager (SessionManager, optional): Sessions to serve; defaults to
+                an in-memory manager with an empty default companion
+            max_concurrent (int, optional): Replies generated at once; defaults
+                to config.SERVER_MAX_CONCURRENT
+            max_pending (int, optional): Replies allowed to wait for a slot
+                before requests are refused with 503; defaults to
+                config.SERVER_MAX_PENDING
+            max_body (int, optional): Largest request body or WebSocket
+                message in bytes; defaults to config.MAX_FILE_SIZE
+            backend (ResponseBackend, optional): Model shared by every
+                companion; defaults to one for config.MODEL_BACKEND_URL, if set
+            eviction_interval (float, optional): Seconds between sweeps for
+                idle sessions; defaults to config.SESSION_EVICTION_INTERVAL
+        """
+        if backend is None and config.MODEL_BACKEND_URL:
+            backend = HTTPModelBackend()
+        self.backend = backend
+        self.manager = manager if manager is not None else SessionManager()
+        if "default" not in self.manager.companions:
+            self.manager.add_companion(Companion("default", backend=backend))
+        self.max_concurrent = max_concurrent or config.SERVER_MAX_CONCURRENT
+        self.max_pending = max_pending if max_pending is not None else config.SERVER_MAX_PENDING
+        self.max_body = max_body or config.MAX_FILE_SIZE
+        self.eviction_interval = eviction_interval or config.SESSION_EVICTION_INTERVAL
+        self._eviction_task = None
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self.waiting = 0
+        self.connections = 0
+        self.replies = 0
+        self.rejected = 0
+    
+    async def start(self, host=None, port=None):
+        """
+        Start listening, and sweeping for idle sessions until stop is called
+        
+        Args:
+            host (str, optional): Interface to bind; defaults to config.SERVER_HOST
+            port (int, optional): Port to bind, 0 for any; defaults to config.SERVER_PORT
+        
+        Returns:
+            asyncio.Server: The listening server
+        """
+        listener = await asyncio.start_server(
+            self.handle_connection,
+            host or config.SERVER_HOST,
+            config.SERVER_PORT if port is None else port,
+            limit=MAX_HEADER_SIZE
+        )
+        if self._eviction_task is None:
+            self._eviction_task = asyncio.ensure_future(self._evict_idle_sessions())
+        return listener
+    
+    async def stop(self):
+        """Stop sweeping for idle sessions"""
+        task, self._eviction_task = self._eviction_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
+    async def _evict_idle_sessions(self):
+        """
+        Evict idle sessions periodically
+        
+        Lookups evict expired sessions too, but a quiet server makes none,
+        and idle sessions would keep their memory and log files open.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.eviction_interval)
+            try:
+                # Closing sessions writes their logs, so keep it off the loop
+                await loop.run_in_executor(None, self.manager.evict_idle)
+            except Exception:
+                logger.exception("Evicting idle sessions failed")
+    
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until it closes"""
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as error:
+                    await self._send_json(writer, error.status, {"error": error.message}, close=True)
+                    break
+                if request is None:
+                    break
+                if request.headers.get("upgrade", "").lower() == "websocket":
+                    await self._websocket(request, reader, writer)
+                    break
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await self._dispatch(request, writer, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+    
+    async def _read_request(self, reader):
+        """Read one request; None once the client has closed the connection"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as error:
+            if error.partial.strip():
+                raise HTTPError(400, "Incomplete request")
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431)
+        
+        lines = head.decode('latin-1').split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        
+        # Chunked bodies are not decoded; reading on would take the body for the next request
+        if headers.get("transfer-encoding", "identity").lower() != "identity":
+            raise HTTPError(501, "Transfer-Encoding is not supported; send Content-Length")
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > self.max_body:
+            raise HTTPError(413)
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return Request(method.upper(), url.path, parse_qs(url.query), headers, body)
+    
+    async def _dispatch(self, request, writer, keep_alive):
+        """Route a request to its handler and send the response"""
+        parts = request.parts
+        if len(parts) == 1:
+            route = (request.method, parts[0])
+        elif len(parts) == 3:
+            # The middle part is the session or companion id
+            route = (request.method, parts[0], parts[2])
+        else:
+            route = None
+        try:
+            if route == ("GET", "health"):
+                await self._send_json(writer, 200, self.statistics(), close=not keep_alive)
+            elif route == ("POST", "sessions", "messages"):
+                await self._chat(parts[1], request, writer, keep_alive)
+            elif route == ("GET", "sessions", "memories"):
+                body = await self._inspect(parts[1], request)
+                await self._send_json(writer, 200, body, close=not keep_alive)
+            elif route == ("POST", "companions", "memories"):
+                body = await self._load_memories(parts[1], request)
+                await self._send_json(writer, 200, body, close=not keep_alive)
+            else:
+                raise HTTPError(404)
+        except HTTPError as error:
+            await self._send_json(writer, error.status, {"error": error.message}, close=not keep_alive)
+    
+    @asynccontextmanager
+    async def _reply_slot(self):
+        """
+        Hold one of the reply slots
+        
+        When every slot is busy and max_pending replies already wait for
+        one, the request is refused rather than queued without bound.
+        """
+        if self._slots.locked() and self.waiting >= self.max_pending:
+            self.rejected += 1
+            raise HTTPError(503, "Too many conversations in progress; try again shortly")
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            self._slots.release()
+    
+    async def _generate(self, session_id, message, companion_id):
+        """Generate a reply within the backpressure limits"""
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPError(400, "A non-empty message is required")
+        async with self._reply_slot():
+            try:
+                response = await self.manager.generate_response_async(session_id, message, companion_id)
+            except KeyError:
+                raise HTTPError(404, f"Unknown companion {companion_id!r}")
+            except ValueError as error:
+                raise HTTPError(409, str(error))
+        self.replies += 1
+        return response
+    
+    async def _stream(self, session_id, message, companion_id):
+        """
+        Stream a reply within the backpressure limits
+        
+        Errors about the request are raised before the first chunk, so
+        they can still be answered with a status.
+        """
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPError(400, "A non-empty message is required")
+        async with self._reply_slot():
+            chunks = self.manager.stream_response_async(session_id, message, companion_id)
+            try:
+                try:
+                    chunk = await chunks.__anext__()
+                except KeyError:
+                    raise HTTPError(404, f"Unknown companion {companion_id!r}")
+                except ValueError as error:
+                    raise HTTPError(409, str(error))
+                except StopAsyncIteration:
+                    return
+                yield chunk
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                await chunks.aclose()
+        self.replies += 1
+    
+    async def _chat(self, session_id, request, writer, keep_alive):
+        """POST /sessions/<id>/messages"""
+        data = request.json()
+        companion_id = data.get("companion") or request.param("companion", "default")
+        if request.param("stream") not in ("1", "true"):
+            response = await self._generate(session_id, data.get("message"), companion_id)
+            await self._send_json(writer, 200, {"session": session_id, "response": response},
+                                  close=not keep_alive)
+            return
+        
+        # Request errors surface with the first chunk, before the status is sent
+        chunks = self._stream(session_id, data.get("message"), companion_id)
+        try:
+            try:
+                first = [await chunks.__anext__()]
+            except StopAsyncIteration:
+                first = []
+            await self._send_head(writer, 200, "text/plain; charset=utf-8",
+                                  {"Transfer-Encoding": "chunked"}, close=not keep_alive)
+            for chunk in first:
+                await self._send_chunk(writer, chunk)
+            async for chunk in chunks:
+                await self._send_chunk(writer, chunk)
+        finally:
+            await chunks.aclose()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+    
+    async def _inspect(self, session_id, request):
+        """GET /sessions/<id>/memories"""
+        companion_id = request.param("companion", "default")
+        if not self.manager.has_session(session_id, companion_id):
+            raise HTTPError(404, f"Unknown session {session_id!r}")
+        loop = asyncio.get_running_loop()
+        try:
+            session = await loop.run_in_executor(None, self.manager.get_session, session_id, companion_id)
+        except ValueError as error:
+            raise HTTPError(409, str(error))
+        inspector = MemoryInspector(session.memory_agent)
+        body = {
+            "session": session_id,
+            "companion": session.companion.companion_id,
+            "statistics": inspector.get_memory_statistics(),
+            "emotions": session.emotion_agent.get_emotional_summary(),
+            "summaries": [summary.to_dict() for summary in session.memory_agent.summaries]
+        }
+        query = request.param("q")
+        if query:
+            try:
+                limit = int(request.param("limit", 10))
+            except ValueError:
+                raise HTTPError(400, "limit must be an integer")
+            if limit < 1:
+                raise HTTPError(400, "limit must be positive")
+            body["results"] = await loop.run_in_executor(None, inspector.search_memories, query, limit)
+        return body
+    
+    async def _load_memories(self, companion_id, request):
+        """
+        POST /companions/<id>/memories
+        
+        The body is plain text, or JSON with "text" or "documents". The
+        analyzed companion replaces any earlier one for new sessions;
+        sessions already open keep theirs.
+        """
+        if request.headers.get("content-type", "").startswith("application/json"):
+            data = request.json()
+            documents = data.get("documents") or [data.get("text") or ""]
+            if not isinstance(documents, list) or not all(isinstance(document, str) for document in documents):
+                raise HTTPError(400, '"documents" must be a list of strings and "text" a string')
+        else:
+            documents = [request.body.decode('utf-8', errors='replace')]
+        if not any(document.strip() for document in documents):
+            raise HTTPError(400, "No memories to load")
+        
+        def analyze():
+            agent = DearlyAgent(self.backend)
+            profile = agent.load_memories(documents)
+            agent.memory_agent.close()
+            self.manager.add_companion(Companion.from_agent(agent, companion_id))
+            return profile
+        
+        # Analysis is CPU-bound; it must not stall the other conversations
+        async with self._reply_slot():
+            profile = await asyncio.get_running_loop().run_in_executor(None, analyze)
+        return {"companion": companion_id, "profile": profile}
+    
+    async def _websocket(self, request, reader, writer):
+        """GET /sessions/<id>/ws"""
+        parts = request.parts
+        key = request.headers.get("sec-websocket-key")
+        if len(parts) != 3 or parts[0] != "sessions" or parts[2] != "ws" or not key:
+            await self._send_json(writer, 400, {"error": "Not a WebSocket endpoint"}, close=True)
+            return
+        session_id = parts[1]
+        companion_id = request.param("companion", "default")
+        
+        accept = base64.b64encode(hashlib.sha1(key.encode('latin-1') + WEBSOCKET_GUID).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                     b"Connection: Upgrade\r\nSec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        await writer.drain()
+        
+        while True:
+            opcode, payload = await self._read_message(reader, writer)
+            if opcode is None:
+                return
+            sent = []
+            try:
+                chunks = self._stream(session_id, payload.decode('utf-8'), companion_id)
+                try:
+                    async for chunk in chunks:
+                        sent.append(chunk)
+                        await self._send_frame(writer, TEXT, json.dumps({"token": chunk}))
+                finally:
+                    await chunks.aclose()
+            except (HTTPError, UnicodeDecodeError) as error:
+                text = error.message if isinstance(error, HTTPError) else "Messages must be UTF-8 text"
+                await self._send_frame(writer, TEXT, json.dumps({"error": text}))
+                continue
+            await self._send_frame(writer, TEXT, json.dumps({"done": True, "response": "".join(sent)}))
+    
+    async def _read_message(self, reader, writer):
+        """Read one WebSocket data message, answering control frames; (None, None) once closed"""
+        fragments = []
+        message_opcode = None
+        while True:
+            first, second = await reader.readexactly(2)
+            fin = first & 0x80
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", await reader.readexactly(8))[0]
+            if length + sum(map(len, fragments)) > self.max_body:
+                await self._send_frame(writer, CLOSE, struct.pack("!H", 1009))
+                return None, None
+            mask = await reader.readexactly(4) if second & 0x80 else None
+            payload = await reader.readexactly(length)
+            if mask:
+                # XOR the whole payload at once instead of byte by byte
+                key = (mask * (length // 4 + 1))[:length]
+                payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+            
+            if opcode == CLOSE:
+                await self._send_frame(writer, CLOSE, payload[:2])
+                return None, None
+            if opcode == PING:
+                await self._send_frame(writer, PONG, payload)
+                continue
+            if opcode == PONG:
+                continue
+            if opcode != CONTINUATION:
+                message_opcode = opcode
+            fragments.append(payload)
+            if fin:
+                return message_opcode, b"".join(fragments)
+    
+    @staticmethod
+    async def _send_frame(writer, opcode, payload):
+        """Send one unmasked WebSocket frame and wait for the buffer to drain"""
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        length = len(payload)
+        if length < 126:
+            head = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            head = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            head = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        writer.write(head + payload)
+        await writer.drain()
+    
+    @staticmethod
+    async def _send_chunk(writer, text):
+        """Send one chunk of a chunked response; draining lets slow readers push back"""
+        data = text.encode('utf-8')
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await writer.drain()
+    
+    @staticmethod
+    async def _send_head(writer, status, content_type, headers=None, close=False):
+        """Send a status line and headers"""
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        lines.append("Connection: close" if close else "Connection: keep-alive")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+    
+    async def _send_json(self, writer, status, body, close=False):
+        """Send a complete JSON response"""
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        headers = {"Content-Length": len(data)}
+        if status == 503:
+            headers["Retry-After"] = 1
+        await self._send_head(writer, status, "application/json", headers, close)
+        writer.write(data)
+        await writer.drain()
+    
+    def statistics(self):
+        """
+        Get server statistics
+        
+        Returns:
+            dict: Connection, session and reply counts, and reply cache
+                metrics per companion
+        """
+        return {
+            "connections": self.connections,
+            "active_sessions": len(self.manager),
+            "evicted_sessions": self.manager.evicted_count,
+            "replies": self.replies,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "response_cache": {companion.companion_id: companion.response_cache.get_statistics()
+                               for companion in self.manager.companions.values()
+                               if companion.response_cache is not None}
+        }
+
+
+async def serve(host=None, port=None, session_dir=None, memory_file=None):
+    """
+    Run the chat server until cancelled
+    
+    Args:
+        host (str, optional): Interface to bind
+        port (int, optional): Port to bind
+        session_dir (str, optional): Directory conversations are saved in
+        memory_file (str, optional): Memories to load for the default companion
+    """
+    manager = SessionManager(session_dir)
+    # One connection pool and batcher for every companion
+    backend = HTTPModelBackend() if config.MODEL_BACKEND_URL else None
+    if memory_file:
+        agent = DearlyAgent(backend)
+        agent.load_memory_file(memory_file)
+        agent.memory_agent.close()
+        manager.add_companion(Companion.from_agent(agent))
+    
+    server = DearlyServer(manager, backend=backend)
+    # Every reply in flight may hold an executor thread while the model answers
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=server.max_concurrent + 4, thread_name_prefix="dearly"))
+    listener = await server.start(host, port)
+    address = listener.sockets[0].getsockname()
+    print(f"Serving {config.PROJECT_NAME} on http://{address[0]}:{address[1]}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.stop()
+        # Let the last replies be stored before the logs close
+        for session in list(manager.sessions.values()):
+            await session.wait_for_bookkeeping()
+        manager.close()
+        if backend is not None:
+            backend.close()
+
+
+def main(argv=None):
+    """Command line entry point for `dearly serve`"""
+    parser = argparse.ArgumentParser(prog="dearly serve", description="Run the Dearly chat server")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--session-dir", help="directory conversations are saved in")
+    parser.add_argument("--memories", help="memory file to load for the default companion")
+    args = parser.parse_args(argv)
+    
+    try:
+        asyncio.run(serve(args.host, args.port, args.session_dir, args.memories))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
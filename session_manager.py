@@ -0,0 +1,549 @@
+"""
+Session Manager
+
+Serves many conversations from one process. Each companion's personality
+profile, analyzer and letter index are built once and shared read-only;
+a session only holds its own memory and emotion log. Idle sessions are
+evicted least recently used first and restored from their conversation
+log on the next message.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from urllib.parse import quote
+
+from config import config
+
+from .emotion_agent import EmotionAgent
+from .memory_agent import MemoryAgent
+from .pipeline import AsyncResponsePipeline
+from .response_agent import ResponseAgent, compile_response_plan
+from .response_cache import ResponseCache
+from .retrieval import PassageRetriever
+from .semantic_memory import HashedNgramEncoder
+
+
+def freeze_profile(profile):
+    """
+    Make a read-only copy of a personality profile
+    
+    Args:
+        profile (dict): Profile as built by PersonalityAgent
+    
+    Returns:
+        MappingProxyType: The profile with dicts made read-only and lists made tuples
+    """
+    if isinstance(profile, (dict, MappingProxyType)):
+        return MappingProxyType({key: freeze_profile(value) for key, value in profile.items()})
+    if isinstance(profile, (list, tuple)):
+        return tuple(freeze_profile(value) for value in profile)
+    if isinstance(profile, set):
+        return frozenset(profile)
+    return profile
+
+
+class SessionClosedError(RuntimeError):
+    """Raised when a session is used after being evicted"""
+
+
+class Companion:
+    """Read-only state shared by every session with one companion"""
+    
+    def __init__(self, companion_id="default", personality_profile=None, retriever=None,
+                 personality_agent=None, backend=None):
+        """
+        Initialize a companion
+        
+        Args:
+            companion_id (str): Companion identifier
+            personality_profile (dict, optional): Profile from PersonalityAgent;
+                a frozen copy is kept
+            retriever (PassageRetriever, optional): Index of the companion's
+                letters; must not be written to once sessions use it
+            personality_agent (PersonalityAgent, optional): Analyzer the profile
+                came from
+            backend (ResponseBackend, optional): Model writing the replies; its
+                connection pool, batches and reply cache are shared by every session
+        """
+        self.companion_id = companion_id
+        self.personality_profile = freeze_profile(personality_profile or {})
+        # Compiled once; every session samples from the same plan
+        self.response_plan = compile_response_plan(self.personality_profile)
+        self.retriever = retriever if retriever is not None else PassageRetriever()
+        self.personality_agent = personality_agent
+        self.backend = backend
+        self.response_cache = ResponseCache() if backend is not None else None
+        # Retrieval updates the query cache, so concurrent sessions take turns
+        self._retrieve_lock = threading.Lock()
+    
+    @classmethod
+    def from_agent(cls, agent, companion_id="default"):
+        """
+        Share the memories a DearlyAgent has loaded
+        
+        Only the letters are shared; the agent's own conversation index
+        is not.
+        
+        Args:
+            agent (DearlyAgent): Agent with memories loaded
+            companion_id (str): Companion identifier
+        
+        Returns:
+            Companion: The companion
+        """
+        return cls(companion_id, agent.personality_profile, agent.retriever, agent.personality_agent,
+                   agent.response_agent.backend)
+    
+    def retrieve(self, query):
+        """
+        Find the letters most relevant to a message
+        
+        Args:
+            query (str): The user's message
+        
+        Returns:
+            list: Passages from PassageRetriever.retrieve
+        """
+        with self._retrieve_lock:
+            return self.retriever.retrieve(query)
+
+
+class Session(AsyncResponsePipeline):
+    """One user's conversation with a companion"""
+    
+    __slots__ = ("session_id", "companion", "memory_agent", "emotion_agent", "response_agent",
+                 "last_active", "closed", "bookkeeping_failures", "_lock", "_turns", "_async_loop",
+                 "_async_lock", "_bookkeeping")
+    
+    def __init__(self, session_id, companion, memory_agent):
+        """
+        Initialize a session
+        
+        Args:
+            session_id (str): Session identifier
+            companion (Companion): Shared companion state
+            memory_agent (MemoryAgent): The session's memory
+        """
+        self.session_id = session_id
+        self.companion = companion
+        self.memory_agent = memory_agent
+        self.emotion_agent = EmotionAgent(config.SESSION_EMOTION_HISTORY)
+        self.response_agent = ResponseAgent(companion.backend, companion.response_cache)
+        self.response_agent.set_personality_profile(companion.personality_profile, companion.response_plan)
+        self.last_active = time.monotonic()
+        self.closed = False
+        self.bookkeeping_failures = 0
+        # One turn at a time per conversation
+        self._lock = threading.Lock()
+        # Turns started and not yet recorded; the memory stays open until they are
+        self._turns = 0
+    
+    @property
+    def in_turn(self):
+        """Whether a turn is being generated or recorded"""
+        return self._turns > 0
+    
+    def replay_emotions(self):
+        """Rebuild the emotion summary and recent log from the turns in the conversation log"""
+        for record in self.memory_agent.iter_logged_history():
+            self.emotion_agent.analyze_sentiment(record.message, record.sender, record.timestamp)
+    
+    def generate_response(self, user_input):
+        """
+        Generate the companion's reply, as DearlyAgent.generate_response does
+        
+        Args:
+            user_input (str): The user's message
+        
+        Returns:
+            str: The companion's response
+        
+        Raises:
+            SessionClosedError: If the session was evicted
+        """
+        with self._lock:
+            if self.closed:
+                raise SessionClosedError(self.session_id)
+            self.last_active = time.monotonic()
+            self._turns += 1
+            try:
+                self.memory_agent.store_message("user", user_input)
+                self.emotion_agent.analyze_sentiment(user_input, "user")
+                context = self.memory_agent.get_recent_context(include_summaries=True)
+                memories = self._retrieve_memories(user_input)
+                response = self.response_agent.generate_response(user_input, context, memories)
+                self._record_reply(user_input, response)
+                return response
+            finally:
+                self._turns -= 1
+    
+    async def generate_response_async(self, user_input):
+        """
+        Generate the companion's reply without blocking the event loop
+        
+        Args:
+            user_input (str): The user's message
+        
+        Returns:
+            str: The companion's response
+        
+        Raises:
+            SessionClosedError: If the session was evicted
+        """
+        with self._lock:
+            if self.closed:
+                raise SessionClosedError(self.session_id)
+            self.last_active = time.monotonic()
+            self._turns += 1
+        try:
+            return await super().generate_response_async(user_input)
+        except BaseException:
+            self._end_turn()
+            raise
+    
+    async def stream_response_async(self, user_input):
+        """
+        Stream the companion's reply without blocking the event loop
+        
+        Args:
+            user_input (str): The user's message
+        
+        Yields:
+            str: Chunks of the companion's response
+        
+        Raises:
+            SessionClosedError: If the session was evicted, before any chunk
+        """
+        with self._lock:
+            if self.closed:
+                raise SessionClosedError(self.session_id)
+            self.last_active = time.monotonic()
+            self._turns += 1
+        chunks = super().stream_response_async(user_input)
+        started = False
+        try:
+            async for chunk in chunks:
+                started = True
+                yield chunk
+        finally:
+            await chunks.aclose()
+            # Once a chunk is out, recording the reply ends the turn
+            if not started:
+                self._end_turn()
+    
+    async def _finish_turn(self, sentiment, user_input, response):
+        """Record the reply, then end the turn"""
+        try:
+            await super()._finish_turn(sentiment, user_input, response)
+        finally:
+            await asyncio.get_running_loop().run_in_executor(None, self._end_turn)
+    
+    def _end_turn(self):
+        """End an async turn; the last one out closes an evicted session"""
+        with self._lock:
+            self._turns -= 1
+            if self.closed and not self._turns:
+                self.memory_agent.close()
+    
+    def _retrieve_memories(self, user_input):
+        """Find the companion's letters most relevant to a message"""
+        return self.companion.retrieve(user_input)
+    
+    def _record_reply(self, user_input, response):
+        """Store a reply and log its sentiment"""
+        self.memory_agent.store_message("companion", response)
+        self.emotion_agent.analyze_sentiment(response, "companion")
+    
+    def close(self):
+        """
+        Persist the session's memory and release it
+        
+        Turns already under way finish first; the last of them closes the
+        memory once its reply is recorded.
+        """
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            if not self._turns:
+                self.memory_agent.close()
+
+
+class SessionManager:
+    """Maps session ids to sessions, evicting idle ones to disk"""
+    
+    def __init__(self, session_dir=None, max_sessions=None, idle_timeout=None):
+        """
+        Initialize the session manager
+        
+        Args:
+            session_dir (str, optional): Directory of per-session conversation
+                logs; without one, evicted sessions are forgotten
+            max_sessions (int, optional): Sessions kept in RAM; defaults to
+                config.MAX_ACTIVE_SESSIONS
+            idle_timeout (float, optional): Seconds before an idle session is
+                evicted; defaults to config.SESSION_IDLE_TIMEOUT
+        """
+        self.session_dir = session_dir
+        self.max_sessions = max_sessions or config.MAX_ACTIVE_SESSIONS
+        self.idle_timeout = idle_timeout if idle_timeout is not None else config.SESSION_IDLE_TIMEOUT
+        self.companions = {}
+        # Least recently used first
+        self.sessions = OrderedDict()
+        self.evicted_count = 0
+        self._lock = threading.Lock()
+        # Sessions being restored, and evicted ones not yet closed, by id
+        self._opening = {}
+        self._evicted = {}
+        # Shared by every session instead of one per MemoryAgent
+        self.encoder = HashedNgramEncoder() if config.ENABLE_SEMANTIC_MEMORY else None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="compaction")
+        if session_dir:
+            os.makedirs(session_dir, exist_ok=True)
+    
+    def __len__(self):
+        return len(self.sessions)
+    
+    def __contains__(self, session_id):
+        return session_id in self.sessions
+    
+    def add_companion(self, companion):
+        """
+        Register a companion sessions can talk to
+        
+        Args:
+            companion (Companion): The companion
+        
+        Returns:
+            Companion: The same companion
+        """
+        self.companions[companion.companion_id] = companion
+        return companion
+    
+    def _log_path(self, companion_id, session_id):
+        """Conversation log of a session; ids are quoted to stay inside the directory"""
+        directory = quote(companion_id, safe="")
+        if directory in (".", ".."):
+            # quote() keeps dots, and these would name the directory itself or its parent
+            directory = directory.replace(".", "%2E")
+        return os.path.join(self.session_dir, directory, quote(session_id, safe="") + ".jsonl")
+    
+    def _open_session(self, session_id, companion):
+        """Create a session, restoring its conversation if one was saved"""
+        memory_agent = MemoryAgent(encoder=self.encoder, executor=self.executor)
+        session = Session(session_id, companion, memory_agent)
+        if self.session_dir:
+            log_path = self._log_path(companion.companion_id, session_id)
+            if os.path.exists(log_path):
+                memory_agent.load_conversation(log_path)
+                session.replay_emotions()
+            else:
+                os.makedirs(os.path.dirname(log_path), exist_ok=True)
+                memory_agent.save_conversation(log_path)
+        return session
+    
+    def has_session(self, session_id, companion_id="default"):
+        """
+        Check whether a session is in RAM or saved on disk
+        
+        Args:
+            session_id (str): Session identifier
+            companion_id (str): Companion of a saved session
+        
+        Returns:
+            bool: Whether the session exists
+        """
+        if session_id in self.sessions:
+            return True
+        return bool(self.session_dir) and os.path.exists(self._log_path(companion_id, session_id))
+    
+    def get_session(self, session_id, companion_id="default"):
+        """
+        Get a session, creating or restoring it as needed
+        
+        Args:
+            session_id (str): Session identifier
+            companion_id (str): Companion of a new session
+        
+        Returns:
+            Session: The session
+        
+        Raises:
+            KeyError: If the companion was never added
+            ValueError: If the session belongs to another companion
+        """
+        while True:
+            with self._lock:
+                session = self.sessions.get(session_id)
+                if session is not None:
+                    if session.companion.companion_id != companion_id:
+                        raise ValueError(f"Session {session_id!r} belongs to companion "
+                                         f"{session.companion.companion_id!r}")
+                    session.last_active = time.monotonic()
+                    self.sessions.move_to_end(session_id)
+                    return session
+                opening = self._opening.get(session_id)
+                if opening is None:
+                    companion = self.companions[companion_id]
+                    opening = self._opening[session_id] = threading.Event()
+                    previous = self._evicted.get(session_id)
+                    break
+            # Another thread is restoring this session
+            opening.wait()
+        
+        # Restoring reads the whole log, so other sessions are not held up meanwhile
+        try:
+            if previous is not None:
+                # Its last turns must reach the log before the log is read
+                previous.close()
+            session = self._open_session(session_id, companion)
+        except BaseException:
+            with self._lock:
+                del self._opening[session_id]
+            opening.set()
+            raise
+        with self._lock:
+            del self._opening[session_id]
+            self.sessions[session_id] = session
+            evicted = self._pop_expired(keep=session)
+        opening.set()
+        self._close_evicted(evicted)
+        return session
+    
+    def _pop_expired(self, keep=None):
+        """Remove sessions over capacity or past the idle timeout, except keep; the lock must be held"""
+        expired = []
+        excess = len(self.sessions) - self.max_sessions
+        deadline = time.monotonic() - self.idle_timeout
+        for session_id, session in self.sessions.items():
+            if len(expired) >= excess and session.last_active > deadline:
+                break
+            # A session mid-turn stays until the turn is recorded, so a restore
+            # never reads its log while it is still being written
+            if not session.in_turn and session is not keep:
+                expired.append(session_id)
+        evicted = [self.sessions.pop(session_id) for session_id in expired]
+        for session in evicted:
+            self._evicted[session.session_id] = session
+        self.evicted_count += len(evicted)
+        return evicted
+    
+    def _close_evicted(self, evicted):
+        """Close sessions _pop_expired or evict removed"""
+        for session in evicted:
+            session.close()
+            with self._lock:
+                if self._evicted.get(session.session_id) is session:
+                    del self._evicted[session.session_id]
+    
+    def generate_response(self, session_id, user_input, companion_id="default"):
+        """
+        Generate a reply within a session
+        
+        Args:
+            session_id (str): Session identifier
+            user_input (str): The user's message
+            companion_id (str): Companion of a new session
+        
+        Returns:
+            str: The companion's response
+        """
+        while True:
+            session = self.get_session(session_id, companion_id)
+            try:
+                return session.generate_response(user_input)
+            except SessionClosedError:
+                # Evicted between lookup and use; the next lookup restores it
+                continue
+    
+    async def generate_response_async(self, session_id, user_input, companion_id="default"):
+        """
+        Generate a reply within a session from an event loop
+        
+        Args:
+            session_id (str): Session identifier
+            user_input (str): The user's message
+            companion_id (str): Companion of a new session
+        
+        Returns:
+            str: The companion's response
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            # Restoring a session reads its log, so keep it off the loop
+            session = await loop.run_in_executor(None, self.get_session, session_id, companion_id)
+            try:
+                return await session.generate_response_async(user_input)
+            except SessionClosedError:
+                continue
+    
+    async def stream_response_async(self, session_id, user_input, companion_id="default"):
+        """
+        Stream a reply within a session from an event loop
+        
+        Args:
+            session_id (str): Session identifier
+            user_input (str): The user's message
+            companion_id (str): Companion of a new session
+        
+        Yields:
+            str: Chunks of the companion's response
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            session = await loop.run_in_executor(None, self.get_session, session_id, companion_id)
+            chunks = session.stream_response_async(user_input)
+            try:
+                async for chunk in chunks:
+                    yield chunk
+                return
+            except SessionClosedError:
+                # Raised before the first chunk, so nothing has been sent
+                continue
+            finally:
+                await chunks.aclose()
+    
+    def evict_idle(self):
+        """
+        Evict sessions idle for longer than the timeout
+        
+        Returns:
+            int: Number of sessions evicted
+        """
+        with self._lock:
+            evicted = self._pop_expired()
+        self._close_evicted(evicted)
+        return len(evicted)
+    
+    def evict(self, session_id):
+        """
+        Evict one session, saving it to disk
+        
+        Args:
+            session_id (str): Session identifier
+        
+        Returns:
+            bool: Whether the session was in RAM
+        """
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self._evicted[session_id] = session
+            self.evicted_count += 1
+        self._close_evicted([session])
+        return True
+    
+    def close(self):
+        """Evict every session and stop the compaction worker"""
+        with self._lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            session.close()
+        self.executor.shutdown()
\ No newline at end of file
@@ -38,6 +38,7 @@ setup(
     entry_points={
         "console_scripts": [
             "dearly=app:main",
+            "dearly-serve=server:main",
         ],
     },
 )
\ No newline at end of file
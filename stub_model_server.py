@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Stub Model Server
+
+Deterministic local stand-in for a model server, speaking the protocol
+of response_backend.HTTPModelBackend. Replies depend only on the prompt,
+and latency is simulated, so throughput and latency can be measured
+offline.
+
+Run with:
+    python stub_model_server.py --port 8780 --latency 0.05
+"""
+
+import json
+import time
+import zlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import config
+
+
+def stub_completion(prompt):
+    """
+    Deterministic reply to a prompt
+    
+    Args:
+        prompt (str): The prompt
+    
+    Returns:
+        str: One of config.SAMPLE_RESPONSES, chosen by the prompt's checksum
+    """
+    responses = config.SAMPLE_RESPONSES
+    return responses[zlib.crc32(prompt.encode('utf-8')) % len(responses)]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Serves /v1/generate and /v1/stream"""
+    
+    protocol_version = "HTTP/1.1"
+    # Streamed tokens are tiny writes; send each at once
+    disable_nagle_algorithm = True
+    
+    def do_POST(self):
+        stub = self.server.stub
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        if self.path.endswith("/v1/generate"):
+            prompts = payload["prompts"]
+            stub.record(len(prompts))
+            # A batch costs one model call, however many prompts it holds
+            time.sleep(stub.latency)
+            body = json.dumps({"completions": [stub_completion(prompt) for prompt in prompts]}).encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path.endswith("/v1/stream"):
+            stub.record(1)
+            time.sleep(stub.latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for index, token in enumerate(stub_completion(payload["prompt"]).split(" ")):
+                if index:
+                    time.sleep(stub.token_latency)
+                line = (json.dumps({"token": (" " if index else "") + token}) + "\n").encode('utf-8')
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_error(404)
+    
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up, e.g. after its timeout
+            pass
+    
+    def log_message(self, format, *args):
+        """Keep benchmark output clean"""
+
+
+class StubModelServer:
+    """Local model server with simulated latency"""
+    
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, token_latency=0.0):
+        """
+        Initialize the stub
+        
+        Args:
+            host (str): Interface to bind
+            port (int): Port to bind; 0 picks a free one
+            latency (float): Seconds per model call (a batch or a stream's first token)
+            token_latency (float): Seconds between streamed tokens
+        """
+        self.latency = latency
+        self.token_latency = token_latency
+        self.calls = 0
+        self.prompts = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+    
+    @property
+    def url(self):
+        """Base URL to give HTTPModelBackend"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def record(self, prompt_count):
+        """Count one model call"""
+        with self._lock:
+            self.calls += 1
+            self.prompts += prompt_count
+    
+    def start(self):
+        """
+        Serve in a background thread
+        
+        Returns:
+            StubModelServer: This server
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def serve_forever(self):
+        """Serve in the calling thread until closed"""
+        self._server.serve_forever()
+    
+    def close(self):
+        """Stop serving"""
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main():
+    """Run the stub in the foreground"""
+    parser = argparse.ArgumentParser(description="Deterministic local model server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per model call")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="seconds between streamed tokens")
+    args = parser.parse_args()
+    
+    stub = StubModelServer(args.host, args.port, args.latency, args.token_latency)
+    print(f"Stub model server on {stub.url}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        stub.close()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
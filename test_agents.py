@@ -2,12 +2,28 @@
 Basic tests for Dearly agents
 """
 
+import os
+import json
+import asyncio
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from unittest import mock
 from agents.dearly_agent import DearlyAgent
 from agents.personality_agent import PersonalityAgent
 from agents.memory_agent import MemoryAgent
-from agents.response_agent import ResponseAgent
+from agents.response_agent import ResponseAgent, compile_response_plan, HUMOROUS_RESPONSES, WARM_RESPONSES
 from agents.emotion_agent import EmotionAgent
+from agents.text_analysis import TextStatistics, collect_statistics
+from agents.memory_store import SQLiteMemoryStore
+from agents.response_backend import HTTPModelBackend
+from agents.response_cache import ResponseCache
+from agents.session_manager import Companion, SessionManager
+from config import config
+from server import DearlyServer
+from stub_model_server import StubModelServer, stub_completion
+from utils.memory_inspector import MemoryInspector
 
 
 class TestDearlyAgents(unittest.TestCase):
@@ -45,6 +61,57 @@ class TestDearlyAgents(unittest.TestCase):
         profile = agent.get_memory_profile()
         self.assertIsInstance(profile, dict)
     
+    def test_text_statistics_single_pass(self):
+        """Test that one tokenizer pass feeds all trait extractors"""
+        stats = TextStatistics.from_text("I love you so much. You always know best!! haha :)")
+        
+        self.assertEqual(stats.word_counts["love"], 1)
+        self.assertEqual(stats.sentence_count, 3)
+        self.assertEqual(stats.humor_marks, 2)
+        self.assertIn("I love you", stats.phrase_counts)
+        self.assertIn("You always know", stats.phrase_counts)
+        
+        # Keywords only match whole words
+        careful = TextStatistics.from_text("Be careful")
+        self.assertEqual(careful.count_present(["care"]), 0)
+        
+        # Empty input yields a neutral profile instead of failing
+        results = PersonalityAgent().analyze_text("")
+        self.assertEqual(results["tone"]["emotional_tone"], "neutral")
+    
+    def test_incremental_and_merged_profiles(self):
+        """Test that incremental updates and merged partials match a full pass"""
+        letters = [
+            "I love our walks. You always make me laugh, haha!!",
+            "However, the weather was awful. I miss you.",
+            "Hey, that joke was so silly :) You never change.",
+        ]
+        full = PersonalityAgent()
+        full_profile = full.analyze_text(letters)
+        
+        # One letter at a time
+        incremental = PersonalityAgent()
+        incremental.analyze_text(letters[0])
+        for letter in letters[1:]:
+            profile = incremental.update_analysis(letter)
+        self.assertEqual(profile, full_profile)
+        
+        # Two workers, merged
+        merged = PersonalityAgent()
+        merged.analyze_text(letters[:1])
+        other = TextStatistics.from_text(letters[1:])
+        self.assertEqual(merged.merge_statistics(other), full_profile)
+        self.assertEqual(merged.get_statistics(), full.get_statistics())
+    
+    def test_parallel_analysis_matches_serial(self):
+        """Test that sharded multi-process analysis matches a serial pass"""
+        archive = "Hey there! How was your day? I hope you're doing well.\n" * 50
+        letters = [archive, "I love you. You always know what to say!!"]
+        
+        serial = TextStatistics.from_text(letters)
+        parallel = collect_statistics(letters, max_workers=2, shard_size=500)
+        self.assertEqual(parallel, serial)
+    
     def test_memory_agent_storage(self):
         """Test memory agent storage functionality"""
         agent = MemoryAgent()
@@ -63,6 +130,472 @@ class TestDearlyAgents(unittest.TestCase):
         retrieved = agent.retrieve_memory("name")
         self.assertEqual(retrieved, "John")
     
+    def test_memory_agent_ring_buffer(self):
+        """Test that session memory is bounded, shared with history and spills"""
+        with tempfile.TemporaryDirectory() as directory:
+            spill_path = os.path.join(directory, "spill.jsonl")
+            agent = MemoryAgent(max_session_memory=3, spill_path=spill_path)
+            for i in range(5):
+                agent.store_message("user", f"message {i}")
+            
+            self.assertIs(agent.session_memory, agent.conversation_history)
+            self.assertEqual(len(agent.session_memory), 3)
+            self.assertEqual([m["message"] for m in agent.get_recent_context(2)],
+                             ["message 3", "message 4"])
+            self.assertEqual([m["message"] for m in agent.iter_spilled_history()],
+                             ["message 0", "message 1"])
+    
+    def test_compact_message_records(self):
+        """Test that evicted turns are archived column-wise with dict views on demand"""
+        agent = MemoryAgent(max_session_memory=2)
+        for i in range(4):
+            agent.store_message("user" if i % 2 == 0 else "companion", f"message {i}",
+                                f"2024-01-01T00:00:0{i}")
+        
+        self.assertEqual(len(agent.archive), 2)
+        self.assertEqual([m.message for m in agent.iter_history()],
+                         ["message 0", "message 1", "message 2", "message 3"])
+        self.assertEqual(agent.archive[1].to_dict(), {
+            "sender": "companion",
+            "message": "message 1",
+            "timestamp": "2024-01-01T00:00:01"
+        })
+        
+        emotion_agent = EmotionAgent()
+        emotion_agent.analyze_sentiment("I am happy", "user")
+        emotion_agent.analyze_sentiment("So am I", "companion")
+        log = emotion_agent.get_emotional_log()
+        self.assertIs(emotion_agent.emotional_log, emotion_agent.sentiment_history)
+        self.assertEqual([entry["sender"] for entry in log], ["user", "companion"])
+        self.assertEqual(log[1]["confidence"], 0.75)
+        self.assertEqual(emotion_agent.sentiment_history.count_sentiment(log[0]["sentiment"]), 2)
+    
+    def test_conversation_log_round_trip(self):
+        """Test that turns are logged durably and streamed back on load"""
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, "conversation.jsonl")
+            agent = MemoryAgent(max_session_memory=2, log_path=log_path)
+            for i in range(3):
+                agent.store_message("user", f"message {i}")
+            agent.close()
+            
+            # A crash mid-write leaves a torn last line behind
+            with open(log_path, 'a', encoding='utf-8') as file:
+                file.write('{"sender": "us')
+            
+            restored = MemoryAgent(max_session_memory=2)
+            restored.load_conversation(log_path)
+            self.assertEqual([m["message"] for m in restored.get_recent_context(5)],
+                             ["message 1", "message 2"])
+            self.assertEqual(len(list(restored.iter_logged_history())), 3)
+            restored.store_message("user", "message 3")
+            self.assertEqual(len(list(restored.iter_logged_history())), 4)
+            
+            saved_path = os.path.join(directory, "saved.jsonl")
+            restored.save_conversation(saved_path)
+            restored.store_message("companion", "welcome back")
+            restored.close()
+            self.assertEqual(sum(1 for line in open(saved_path, encoding='utf-8')), 5)
+    
+    def test_sqlite_long_term_memory(self):
+        """Test that long-term memory is batched into a shared SQLite database"""
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = os.path.join(directory, "memory.db")
+            agent = MemoryAgent(store=SQLiteMemoryStore(db_path, companion_id="grandma"))
+            reader = SQLiteMemoryStore(db_path, companion_id="grandma")
+            
+            agent.store_long_term_memory("profile", {"tone": "warm"})
+            self.assertEqual(agent.retrieve_memory("profile"), {"tone": "warm"})
+            self.assertNotIn("profile", reader)
+            
+            # Written once MEMORY_SAVE_INTERVAL interactions have passed
+            for i in range(config.MEMORY_SAVE_INTERVAL):
+                agent.store_message("user", f"message {i}")
+            self.assertEqual(reader["profile"], {"tone": "warm"})
+            
+            # Keys are scoped per companion
+            other = SQLiteMemoryStore(db_path, companion_id="grandpa")
+            self.assertEqual(len(other), 0)
+            
+            agent.close()
+            reader.close()
+            other.close()
+    
+    def test_indexed_memory_search(self):
+        """Test AND, phrase and ranked search across every memory tier"""
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, "conversation.jsonl")
+            writer = MemoryAgent(log_path=log_path)
+            writer.store_message("user", "We walked by the lake")
+            writer.store_message("companion", "The lake was cold, the lake was calm")
+            writer.store_message("user", "Remember the cold lake walk?")
+            writer.close()
+            
+            agent = MemoryAgent(max_session_memory=2)
+            agent.load_conversation(log_path)
+            agent.store_message("user", "Walked home later")
+            inspector = MemoryInspector(agent)
+            
+            # Turn 0 is only on disk now, turn 1 in the archive
+            results = inspector.search_memories("lake")
+            self.assertEqual([entry["id"] for entry in results], [1, 2, 0])
+            self.assertEqual([entry["id"] for entry in inspector.search_memories("cold lake")], [1, 2])
+            self.assertEqual([entry["id"] for entry in inspector.search_memories('"cold lake"')], [2])
+            self.assertEqual(inspector.search_memories("lake", limit=1)[0]["message"],
+                             "The lake was cold, the lake was calm")
+            self.assertEqual(inspector.search_memories("ocean"), [])
+            agent.close()
+    
+    def test_bm25_memory_retrieval(self):
+        """Test that relevant letter passages reach the response agent"""
+        agent = DearlyAgent()
+        agent.load_memories([
+            "We planted tomatoes in the garden every spring.\n\nYour grandfather loved fishing at the lake.",
+            "Remember to call your sister on Sundays."
+        ])
+        self.assertEqual(len(agent.retriever), 3)
+        
+        agent.generate_response("I went fishing at the lake today")
+        memories = agent.response_agent.relevant_memories
+        self.assertEqual(memories[0]["text"], "Your grandfather loved fishing at the lake.")
+        self.assertEqual(memories[0]["source"], "letters")
+        
+        # Turns go to a separate index that keeps only the newest of them
+        with mock.patch.object(config, "RETRIEVAL_CONVERSATION_PASSAGES", 2):
+            for day in range(3):
+                agent.generate_response(f"Tell me about day {day}")
+        self.assertEqual(len(agent.retriever), 3)
+        self.assertLessEqual(len(agent.conversation_retriever), 4)
+        self.assertEqual(agent.conversation_passages[-2], "Tell me about day 2")
+        self.assertEqual(agent.conversation_retriever.retrieve("day 2")[0]["source"], "conversation")
+        
+        # Repeat queries are served from the cache until matching passages arrive
+        first = agent.retriever.retrieve("tomatoes garden")
+        self.assertEqual(agent.retriever.retrieve("garden tomatoes"), first)
+        self.assertEqual(agent.retriever.cache_hits, 1)
+        agent.retriever.add_passage("The garden tomatoes were huge this year", "conversation")
+        self.assertEqual(len(agent.retriever.retrieve("garden tomatoes")), 2)
+        self.assertEqual(agent.retriever.cache_hits, 1)
+    
+        # Memory-mapped archives are indexed by offset and read back on retrieval
+        with tempfile.TemporaryDirectory() as directory:
+            letters_path = os.path.join(directory, "letters.txt")
+            with open(letters_path, "w", encoding="utf-8") as letters:
+                letters.write("We planted tomatoes in the garden.\n\nYour grandfather   loved\nfishing at the lake.\n")
+            mapped = DearlyAgent()
+            mapped.load_memory_file(letters_path)
+            self.assertFalse(any(isinstance(passage, str) for passage in mapped.retriever.passages))
+            self.assertEqual(mapped.retriever.retrieve("fishing lake")[0]["text"],
+                             "Your grandfather loved fishing at the lake.")
+    
+    def test_semantic_memory_recall(self):
+        """Test that paraphrases are recalled and embeddings persist in a .npy file"""
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, "conversation.jsonl")
+            embedding_path = os.path.join(directory, "embeddings.npy")
+            agent = MemoryAgent(log_path=log_path, embedding_path=embedding_path)
+            for message in ["We walked along the lakeshore at sunset",
+                            "Your cousin is getting married in June",
+                            "The soup recipe needs more garlic"]:
+                agent.store_message("user", message)
+            
+            message_id, record, similarity = agent.recall_similar("walking by the lake", 1)[0]
+            self.assertEqual(message_id, 0)
+            self.assertEqual(record.message, "We walked along the lakeshore at sunset")
+            agent.close()
+            
+            restored = MemoryAgent(embedding_path=embedding_path)
+            restored.load_conversation(log_path)
+            self.assertEqual(len(restored.semantic_memory), 3)
+            self.assertEqual(restored.recall_similar("marriage of my cousin", 1)[0][0], 1)
+            restored.close()
+    
+            # Rows from another conversation are refused rather than dropped
+            stale = MemoryAgent(embedding_path=embedding_path)
+            with self.assertRaises(ValueError):
+                stale.store_message("user", "Hello again")
+            self.assertEqual(len(stale.semantic_memory), 3)
+            self.assertEqual(stale.message_count, 0)
+            
+            # Concurrent turns keep embedding rows aligned with message ids
+            shared = MemoryAgent()
+            messages = [f"Message number {i} about {topic}" for i, topic in
+                        enumerate(["gardens", "fishing", "weddings", "soup"] * 25)]
+            with ThreadPoolExecutor(8) as executor:
+                list(executor.map(partial(shared.store_message, "user"), messages))
+            for message_id in range(len(messages)):
+                text = shared.get_message(message_id).message
+                self.assertEqual(shared.recall_similar(text, 1)[0][0], message_id)
+    
+    def test_conversation_compaction(self):
+        """Test that old turns are rolled into summaries and still readable from the log"""
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.multiple(config, COMPACTION_THRESHOLD=4, COMPACTION_BATCH=2, MAX_SUMMARIES=2):
+            agent = MemoryAgent(max_session_memory=2, log_path=os.path.join(directory, "conversation.jsonl"))
+            for i in range(12):
+                agent.store_message("user", f"I miss our garden walks, day {i}")
+            agent.wait_for_compaction()
+            
+            # 10 turns left the ring buffer; fewer than the threshold stay raw
+            self.assertLess(len(agent.archive), 4)
+            self.assertEqual(len(agent.summaries), 2)
+            self.assertEqual(sum(summary.turn_count for summary in agent.summaries) + len(agent.archive), 10)
+            self.assertEqual(agent.summaries[0].first_id, 0)
+            self.assertIn("garden", agent.summaries[-1].keywords)
+            
+            context = agent.get_recent_context(2, include_summaries=True)
+            self.assertEqual([entry["sender"] for entry in context], ["summary", "summary", "user", "user"])
+            self.assertEqual(agent.get_message(0).message, "I miss our garden walks, day 0")
+            self.assertEqual(MemoryInspector(agent).get_memory_statistics()["summary_count"], 2)
+            agent.close()
+    
+    def test_session_manager_eviction(self):
+        """Test that sessions share a companion and are restored after LRU eviction"""
+        with tempfile.TemporaryDirectory() as directory:
+            manager = SessionManager(directory, max_sessions=2)
+            companion = manager.add_companion(Companion("grandma", {"phrases": ["Hello dear"]}))
+            with self.assertRaises(TypeError):
+                companion.personality_profile["phrases"] = []
+            
+            manager.generate_response("alice", "I planted the roses today", "grandma")
+            manager.generate_response("bob", "Hi grandma", "grandma")
+            manager.generate_response("carol", "Good morning", "grandma")
+            self.assertNotIn("alice", manager)
+            self.assertEqual(manager.evicted_count, 1)
+            self.assertIs(manager.get_session("bob", "grandma").companion, companion)
+            
+            alice = manager.get_session("alice", "grandma")
+            self.assertEqual(alice.memory_agent.get_message(0).message, "I planted the roses today")
+            self.assertEqual(len(alice.emotion_agent.emotional_log), 2)
+            manager.idle_timeout = 0
+            self.assertEqual(manager.evict_idle(), 2)
+            self.assertEqual(len(manager), 0)
+            
+            # A companion id cannot lead out of the session directory
+            manager.add_companion(Companion(".."))
+            manager.generate_response("dave", "Hello", "..")
+            self.assertTrue(os.path.exists(os.path.join(directory, "%2E%2E", "dave.jsonl")))
+            manager.close()
+        
+        # Long sessions keep a bounded emotion log, while the summary counts every message
+        emotions = EmotionAgent(max_history=3)
+        for _ in range(10):
+            emotions.analyze_sentiment("Hello again")
+        self.assertLess(len(emotions.emotional_log), 6)
+        self.assertEqual(emotions.get_emotional_summary()["neutral_count"], 10)
+    
+    def test_async_response_pipeline(self):
+        """Test that async turns are recorded in order once bookkeeping finishes"""
+        agent = DearlyAgent()
+        
+        async def converse():
+            first = await agent.generate_response_async("I found your old letters")
+            second = await agent.generate_response_async("They made me smile")
+            await agent.wait_for_bookkeeping()
+            return first, second
+        
+        first, second = asyncio.run(converse())
+        self.assertEqual([m["sender"] for m in agent.memory_agent.get_recent_context()],
+                         ["user", "companion", "user", "companion"])
+        self.assertEqual(agent.memory_agent.get_message(1).message, first)
+        self.assertEqual(agent.memory_agent.get_message(3).message, second)
+        self.assertEqual([entry["sender"] for entry in agent.emotion_agent.get_emotional_log()],
+                         ["user", "companion", "user", "companion"])
+        self.assertEqual(len(agent.conversation_retriever), 4)
+    
+    def test_async_bookkeeping_failures_are_logged(self):
+        """Test that a failed background record is logged and counted"""
+        agent = DearlyAgent()
+        
+        async def converse():
+            reply = await agent.generate_response_async("I found your old letters")
+            await agent.wait_for_bookkeeping()
+            return reply
+        
+        with mock.patch.object(agent, "_record_reply", side_effect=RuntimeError("disk full")), \
+                self.assertLogs("agents.pipeline", level="ERROR") as logs:
+            self.assertTrue(asyncio.run(converse()))
+        self.assertIn("Recording a reply failed", logs.output[0])
+        self.assertEqual(agent.bookkeeping_failures, 1)
+    
+    def test_async_sessions_survive_eviction(self):
+        """Test that evicting sessions mid-turn loses no async turns"""
+        with tempfile.TemporaryDirectory() as directory:
+            manager = SessionManager(directory, max_sessions=1)
+            manager.add_companion(Companion("default"))
+            
+            async def talk(session_id):
+                for turn in range(3):
+                    await manager.generate_response_async(session_id, f"Message {turn}")
+            
+            async def converse():
+                await asyncio.gather(*(talk(f"user{index}") for index in range(4)))
+                for session in list(manager.sessions.values()):
+                    await session.wait_for_bookkeeping()
+                manager.close()
+            
+            asyncio.run(converse())
+            for index in range(4):
+                with open(os.path.join(directory, "default", f"user{index}.jsonl")) as log:
+                    self.assertEqual(len(log.readlines()), 6)
+    
+    def test_chat_server(self):
+        """Test chatting over HTTP, with and without token streaming, and inspecting the session"""
+        async def request(port, raw):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(raw)
+            response = await reader.read()
+            writer.close()
+            return response.partition(b"\r\n\r\n")
+        
+        async def exchange():
+            chat_server = DearlyServer()
+            listener = await chat_server.start("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            body = json.dumps({"message": "I miss your cooking"}).encode()
+            post = b"POST /sessions/ann/messages%s HTTP/1.1\r\nConnection: close\r\nContent-Length: %d\r\n\r\n%s"
+            results = [await request(port, post % (b"", len(body), body)),
+                       await request(port, post % (b"?stream=1", len(body), body)),
+                       await request(port, b"GET /sessions/ann/memories?q=cooking HTTP/1.1\r\nConnection: close\r\n\r\n"),
+                       await request(port, b"GET /sessions/bob/memories HTTP/1.1\r\nConnection: close\r\n\r\n")]
+            # Bad input is answered with an error status, never a dropped connection
+            invalid = [await request(port, b"GET /sessions/ann/memories?q=cooking&limit=abc HTTP/1.1\r\n"
+                                           b"Connection: close\r\n\r\n"),
+                       await request(port, b"POST /companions/mum/memories HTTP/1.1\r\nConnection: close\r\n"
+                                           b"Content-Type: application/json\r\nContent-Length: 16\r\n\r\n"
+                                           b'{"documents": 5}'),
+                       await request(port, b"POST /sessions/ann/messages HTTP/1.1\r\nTransfer-Encoding: chunked\r\n"
+                                           b"\r\n5\r\nhello\r\n0\r\n\r\n")]
+            unrouted = [await request(port, b"GET /health/anything HTTP/1.1\r\nConnection: close\r\n\r\n"),
+                        await request(port, b"POST /sessions/ann/messages/extra HTTP/1.1\r\nConnection: close\r\n"
+                                            b"Content-Length: %d\r\n\r\n%s" % (len(body), body))]
+            listener.close()
+            await chat_server.stop()
+            await chat_server.manager.get_session("ann").wait_for_bookkeeping()
+            chat_server.manager.close()
+            return results, invalid, unrouted
+        
+        results, invalid, unrouted = asyncio.run(exchange())
+        (head, _, body), (stream_head, _, chunks), (_, _, inspection), (missing, _, _) = results
+        self.assertEqual([response[0][:12] for response in invalid], [b"HTTP/1.1 400", b"HTTP/1.1 400", b"HTTP/1.1 501"])
+        self.assertTrue(head.startswith(b"HTTP/1.1 200"))
+        self.assertIsInstance(json.loads(body)["response"], str)
+        self.assertIn(b"Transfer-Encoding: chunked", stream_head)
+        self.assertTrue(chunks.endswith(b"0\r\n\r\n"))
+        inspection = json.loads(inspection)
+        self.assertEqual(inspection["statistics"]["session_memory_count"], 4)
+        self.assertEqual(len(inspection["results"]), 2)
+        self.assertTrue(missing.startswith(b"HTTP/1.1 404"))
+        self.assertEqual([response[0][:12] for response in unrouted], [b"HTTP/1.1 404", b"HTTP/1.1 404"])
+    
+    def test_server_evicts_idle_sessions(self):
+        """Test that a quiet server still evicts idle sessions"""
+        async def run():
+            manager = SessionManager(idle_timeout=0.05)
+            chat_server = DearlyServer(manager, eviction_interval=0.02)
+            listener = await chat_server.start("127.0.0.1", 0)
+            await manager.generate_response_async("ann", "Hello")
+            session = manager.sessions["ann"]
+            await session.wait_for_bookkeeping()
+            # No further requests arrive
+            await asyncio.sleep(0.3)
+            listener.close()
+            await chat_server.stop()
+            return "ann" in manager, session.closed
+        
+        self.assertEqual(asyncio.run(run()), (False, True))
+    
+    def test_model_backend_batching(self):
+        """Test pooled, batched and streamed generation against the stub model server"""
+        with StubModelServer(latency=0.05) as stub:
+            backend = HTTPModelBackend(stub.url, pool_size=1, max_batch=8, timeout=5)
+            with ThreadPoolExecutor(8) as executor:
+                replies = list(executor.map(backend.generate, [f"prompt {i}" for i in range(8)]))
+            self.assertEqual(replies, [stub_completion(f"prompt {i}") for i in range(8)])
+            # The first prompt goes out alone; the rest queue behind it and share a call
+            self.assertLessEqual(stub.calls, 3)
+            self.assertEqual("".join(backend.stream("hello")), stub_completion("hello"))
+            
+            agent = ResponseAgent(backend)
+            self.assertIn("user: Good night", agent.build_prompt("Good night"))
+            self.assertEqual(agent.generate_response("Good night"), stub_completion(agent.build_prompt("Good night")))
+            # Only letters are presented as the companion's own words
+            agent.relevant_memories = [{"text": "Sleep tight", "source": "letters", "score": 2.0},
+                                       {"text": "I miss you", "source": "conversation", "score": 1.0}]
+            prompt = agent.build_prompt("Good night")
+            self.assertLess(prompt.index("Sleep tight"), prompt.index("Earlier in your conversations:"))
+            self.assertGreater(prompt.index("I miss you"), prompt.index("Earlier in your conversations:"))
+            backend.close()
+            
+            # A model slower than the timeout falls back to a template reply
+            slow = HTTPModelBackend(stub.url, timeout=0.01)
+            agent = ResponseAgent(slow)
+            self.assertIn(agent.generate_response("Hello"), config.SAMPLE_RESPONSES)
+            self.assertEqual(agent.backend_failures, 1)
+            slow.close()
+    
+    def test_streaming_replies(self):
+        """Test that model replies are passed on as they stream and stored once sent"""
+        with StubModelServer() as stub:
+            backend = HTTPModelBackend(stub.url, timeout=5)
+            agent = ResponseAgent(backend)
+            chunks = list(agent.stream_response("Good night"))
+            self.assertGreater(len(chunks), 1)
+            self.assertEqual("".join(chunks), stub_completion(agent.build_prompt("Good night")))
+            
+            manager = SessionManager()
+            manager.add_companion(Companion(backend=backend))
+            
+            async def chat():
+                streamed = [chunk async for chunk in manager.stream_response_async("ann", "Good night")]
+                # A reader that stops early still has what it was sent recorded
+                abandoned = manager.stream_response_async("ann", "Sleep well")
+                first = await abandoned.__anext__()
+                await abandoned.aclose()
+                session = manager.get_session("ann")
+                await session.wait_for_bookkeeping()
+                return streamed, first, session
+            
+            streamed, first, session = asyncio.run(chat())
+            context = session.memory_agent.get_recent_context()
+            self.assertEqual([turn["message"] for turn in context],
+                             ["Good night", "".join(streamed), "Sleep well", first])
+            self.assertFalse(session.in_turn)
+            manager.close()
+            backend.close()
+        
+        # Without a model the template reply comes as one chunk
+        dearly = DearlyAgent()
+        reply = list(dearly.stream_response("Hello"))
+        self.assertEqual(len(reply), 1)
+        self.assertEqual(dearly.memory_agent.get_recent_context()[-1]["message"], reply[0])
+    
+    def test_response_cache(self):
+        """Test that repeated messages reuse model replies until the key changes"""
+        with StubModelServer() as stub:
+            backend = HTTPModelBackend(stub.url, timeout=5)
+            agent = ResponseAgent(backend, ResponseCache(variants=2))
+            agent.set_personality_profile({"tone": {"emotional_tone": "warm"}})
+            
+            # Two replies are generated for a key before hits sample among them
+            replies = [agent.generate_response(message) for message in ["Good night!", "good night", "Good  night."]]
+            self.assertEqual(stub.calls, 2)
+            self.assertIn(replies[2], replies[:2])
+            self.assertEqual(agent.cache.get_statistics()["hits"], 1)
+            
+            # A different conversation or personality is a different key
+            agent.generate_response("Good night", [{"sender": "user", "message": "I got the job"},
+                                                   {"sender": "user", "message": "Good night"}])
+            agent.set_personality_profile({"tone": {"emotional_tone": "formal"}})
+            agent.generate_response("Good night")
+            self.assertEqual(stub.calls, 4)
+            
+            expired = ResponseAgent(backend, ResponseCache(ttl=0, variants=1))
+            expired.generate_response("Hi")
+            expired.generate_response("Hi")
+            self.assertEqual(expired.cache.get_statistics()["hits"], 0)
+            backend.close()
+    
     def test_response_agent_generation(self):
         """Test response agent generation functionality"""
         agent = ResponseAgent()
@@ -72,6 +605,30 @@ class TestDearlyAgents(unittest.TestCase):
         self.assertIsInstance(response, str)
         self.assertGreater(len(response), 0)
     
+    def test_response_plan(self):
+        """Test that a profile compiles to a fixed plan sampled with a seedable RNG"""
+        profile = {"tone": {"emotional_tone": "warm"}, "humor": {"uses_humor": True}}
+        plan = compile_response_plan(profile)
+        self.assertEqual(plan.style, "warm")
+        self.assertEqual(set(plan.responses), set(HUMOROUS_RESPONSES + WARM_RESPONSES))
+        self.assertAlmostEqual(plan.cum_weights[-1], 1.0)
+        with self.assertRaises(AttributeError):
+            plan.style = "formal"
+        
+        # The same seed gives the same replies, and about 30% are jokes
+        first, second = ResponseAgent(seed=7), ResponseAgent(seed=7)
+        first.set_personality_profile(profile)
+        second.set_personality_profile(profile, plan)
+        replies = [first.generate_response("Hi") for _ in range(2000)]
+        self.assertEqual(replies, [second.generate_response("Hi") for _ in range(2000)])
+        jokes = sum(reply in HUMOROUS_RESPONSES for reply in replies) / len(replies)
+        self.assertAlmostEqual(jokes, 0.3, delta=0.05)
+        
+        phrases = compile_response_plan({"phrases": ["love you kiddo"], "sentiment": {"overall_sentiment": "neutral"}})
+        self.assertEqual(phrases.style, "phrases")
+        self.assertTrue(all(reply.startswith("love you kiddo ") for reply in phrases.responses))
+        self.assertIn(ResponseAgent().generate_response("Hi"), config.SAMPLE_RESPONSES)
+    
     def test_emotion_agent_analysis(self):
         """Test emotion agent analysis functionality"""
         agent = EmotionAgent()
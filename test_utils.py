@@ -5,8 +5,11 @@ Basic tests for Dearly utilities
 import unittest
 import tempfile
 import os
+import json
 from utils.file_importer import FileImporter
+from utils.import_cache import ImportManifest
 from utils.validation_checker import ValidationChecker
+from utils.message_parser import Message
 
 
 class TestFileImporter(unittest.TestCase):
@@ -17,7 +20,7 @@ class TestFileImporter(unittest.TestCase):
     
     def test_supported_formats(self):
         """Test that supported formats are correctly identified"""
-        expected_formats = ['.txt', '.json', '.csv', '.md']
+        expected_formats = ['.txt', '.json', '.csv', '.md', '.jsonl']
         self.assertEqual(self.importer.supported_formats, expected_formats)
     
     def test_txt_import(self):
@@ -36,6 +39,181 @@ class TestFileImporter(unittest.TestCase):
             # Clean up
             os.unlink(temp_path)
     
+    def test_streaming_chunks(self):
+        """Test that large files stream in bounded chunks on sentence boundaries"""
+        content = "I miss you. We laughed so hard!\n" * 2000
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+            f.write(content)
+            temp_path = f.name
+        
+        try:
+            chunks = list(self.importer.iter_chunks(temp_path, chunk_size=1024))
+            self.assertGreater(len(chunks), 1)
+            self.assertEqual("".join(chunks), content)
+            for chunk in chunks[:-1]:
+                self.assertLessEqual(len(chunk), 2048)
+                self.assertIn(chunk[-1], ".!?")
+        finally:
+            os.unlink(temp_path)
+    
+    def test_max_file_size_enforced(self):
+        """Test that import_file refuses files above MAX_FILE_SIZE"""
+        importer = FileImporter(max_file_size=10)
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+            f.write("This file is longer than ten bytes.")
+            temp_path = f.name
+        
+        try:
+            with self.assertRaises(ValueError):
+                importer.import_file(temp_path)
+            # Streaming is not limited
+            self.assertEqual(len(list(importer.iter_chunks(temp_path))), 1)
+        finally:
+            os.unlink(temp_path)
+    
+    def test_memory_mapped_chunks(self):
+        """Test that memory-mapped slices split on message boundaries"""
+        content = "Dear you,\nI miss our talks.\n\nLove, always ❤\n\n" * 500
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', encoding='utf-8', delete=False) as f:
+            f.write(content)
+            temp_path = f.name
+        
+        try:
+            ranges = list(self.importer.iter_message_ranges(temp_path, chunk_size=1000))
+            self.assertGreater(len(ranges), 1)
+            self.assertEqual(ranges[0][0], 0)
+            for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(end, start)
+            
+            pieces = []
+            for piece in self.importer.iter_mapped_chunks(temp_path, chunk_size=1000):
+                self.assertIsInstance(piece, memoryview)
+                self.assertTrue(piece.tobytes().endswith(b"\n\n"))
+                pieces.append(str(piece, 'utf-8'))
+            self.assertEqual("".join(pieces), content)
+        finally:
+            os.unlink(temp_path)
+    
+    def test_concurrent_directory_import(self):
+        """Test recursive concurrent import with progress and structured errors"""
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, "2019"))
+            with open(os.path.join(directory, "letter.txt"), 'w') as f:
+                f.write("Dear you, I miss you.")
+            with open(os.path.join(directory, "2019", "chat.json"), 'w') as f:
+                f.write('[{"text": "hi"}]')
+            with open(os.path.join(directory, "2019", "broken.json"), 'w') as f:
+                f.write('{not json')
+            with open(os.path.join(directory, "notes.exe"), 'w') as f:
+                f.write("ignored")
+            
+            events = []
+            result = self.importer.import_directory(directory, progress_callback=events.append,
+                                                    max_workers=2, parse_workers=1)
+            
+            self.assertEqual(result["files"]["letter.txt"], "Dear you, I miss you.")
+            self.assertEqual(result["files"][os.path.join("2019", "chat.json")], ["hi"])
+            self.assertEqual(result["failed"], 1)
+            error = result["errors"][0]
+            self.assertEqual(error["name"], os.path.join("2019", "broken.json"))
+            self.assertEqual(error["error"]["stage"], "parse")
+            self.assertEqual(len(events), 3)
+            self.assertEqual(events[-1]["completed"] + events[-1]["failed"], 3)
+            
+            # The flat batch import keeps its original shape
+            self.assertEqual(list(self.importer.batch_import(directory)), ["letter.txt"])
+    
+    def test_import_cache_skips_unchanged_and_duplicates(self):
+        """Test that the manifest skips unchanged files and drops seen messages"""
+        with tempfile.TemporaryDirectory() as directory:
+            exports = os.path.join(directory, "exports")
+            os.makedirs(exports)
+            march = [{"sender": "Mom", "date": "2020-03-01", "text": "morning!"},
+                     {"sender": "Mom", "date": "2020-03-01", "text": "love you"},
+                     {"sender": "Mom", "date": "2020-03-02", "text": "love you"}]
+            with open(os.path.join(exports, "march.json"), 'w') as f:
+                json.dump(march, f)
+            with open(os.path.join(exports, "letter.txt"), 'w') as f:
+                f.write("Remember the summer we drove to the coast?\n\nLove you")
+            cache_path = os.path.join(directory, "manifest.json")
+            
+            first = FileImporter(cache_path=cache_path).import_directory(exports, parse_workers=0)
+            self.assertEqual(first["files"]["march.json"], ["morning!", "love you", "love you"])
+            
+            # Overlapping exports plus an identical copy under another name
+            april = march[1:] + [{"sender": "Mom", "date": "2020-04-01", "text": "love you"}]
+            with open(os.path.join(exports, "march_april.json"), 'w') as f:
+                json.dump(april, f)
+            with open(os.path.join(exports, "march_copy.json"), 'w') as f:
+                json.dump(march, f)
+            with open(os.path.join(exports, "letters.txt"), 'w') as f:
+                f.write("Remember the summer we drove to the coast?\n\nLove you\n\nSee you soon")
+            
+            second = FileImporter(cache_path=cache_path).import_directory(exports, parse_workers=0)
+            # Dated messages repeat only with the same date; short undated ones never do
+            self.assertEqual(second["files"], {"march_april.json": ["love you"],
+                                               "letters.txt": "Love you\n\nSee you soon"})
+            self.assertEqual(second["skipped"], 3)
+            
+            third = FileImporter(cache_path=cache_path).import_directory(exports, parse_workers=0)
+            self.assertEqual(third["files"], {})
+            self.assertEqual(third["skipped"], 5)
+            
+            # The digest set is bounded, least recently seen first
+            manifest = ImportManifest(cache_path, max_messages=2)
+            self.assertEqual(len(manifest.message_digests), 2)
+    
+            # Of identical copies imported concurrently, exactly one is imported
+            copies = os.path.join(directory, "copies")
+            os.makedirs(copies)
+            for index in range(16):
+                with open(os.path.join(copies, f"copy{index}.txt"), 'w') as f:
+                    f.write("The same letter, saved again and again.\n" * 2000)
+            fourth = FileImporter(cache_path=cache_path).import_directory(copies, max_workers=8, parse_workers=0)
+            self.assertEqual(len(fourth["files"]), 1)
+            self.assertEqual(fourth["skipped"], 15)
+    
+    def test_structured_message_parsing(self):
+        """Test CSV and JSONL exports parse into typed, sender-filtered records"""
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "chat.csv")
+            with open(csv_path, 'w', newline='') as f:
+                f.write('Date,From,Message\n'
+                        '2020-01-01 09:00,Mom,"Good morning, sweetheart"\n'
+                        '2020-01-01 09:05,Me,morning!\n')
+            jsonl_path = os.path.join(directory, "chat.json")
+            with open(jsonl_path, 'w') as f:
+                f.write('{"sender": "Mom", "timestamp": 1577869200, "text": "Call me later"}\n'
+                        '{"sender": "Me", "timestamp": 1577869260, "text": "ok"}\n')
+            
+            messages = list(self.importer.iter_messages(csv_path, sender="mom"))
+            self.assertEqual(messages, [Message("Mom", "2020-01-01 09:00", "Good morning, sweetheart")])
+            
+            messages = list(self.importer.iter_messages(jsonl_path))
+            self.assertEqual([m.text for m in messages], ["Call me later", "ok"])
+            self.assertEqual(messages[0].timestamp, 1577869200)
+            with self.assertRaises(AttributeError):
+                messages[0].extra = "no __dict__"
+    
+            # A spreadsheet's byte order mark does not hide the header
+            bom_path = os.path.join(directory, "excel.csv")
+            with open(bom_path, 'w', encoding='utf-8-sig', newline='') as f:
+                f.write('Message,Sender\nSee you soon,Mom\n')
+            self.assertEqual(list(self.importer.iter_messages(bom_path)), [Message("Mom", None, "See you soon")])
+            
+            # JSONL exports are picked up by directory scans
+            with open(os.path.join(directory, "export.jsonl"), 'w') as f:
+                f.write('{"sender": "Mom", "text": "Love you"}\n')
+            imported = self.importer.batch_import(directory)
+            self.assertEqual(imported["export.jsonl"], ["Love you"])
+            
+            # Only message text reaches analysis, never headers, dates or senders
+            expected = ["Good morning, sweetheart", "morning!"]
+            self.assertEqual(imported["chat.csv"], expected)
+            self.assertEqual(self.importer.import_file(csv_path), expected)
+            self.assertEqual(list(self.importer.iter_chunks(csv_path)), expected)
+            self.assertEqual(self.importer.import_file(jsonl_path), ["Call me later", "ok"])
+    
     def test_invalid_file_format(self):
         """Test handling of unsupported file formats"""
         # Create a temporary file with unsupported extension
@@ -75,6 +253,49 @@ class TestValidationChecker(unittest.TestCase):
         self.assertFalse(result["is_safe"])
         self.assertIn("harm", str(result["issues"]))
 
+    def test_validate_many(self):
+        """Test batch validation in chunks, serially and across processes"""
+        responses = ["Sleep well, love.", "Don't kill the mood!", "A charming day",
+                     "The attack and the threat", "Love you"] * 3
+        serial = self.validator.validate_many(iter(responses), chunk_size=2, max_workers=1)
+        self.assertEqual([record.index for record in serial["records"]], [1, 3, 6, 8, 11, 13])
+        self.assertEqual(serial["records"][1].flags, ("attack", "threat"))
+        self.assertEqual(serial["statistics"]["validated"], 15)
+        self.assertEqual(serial["statistics"]["unsafe"], 6)
+        self.assertEqual(serial["statistics"]["flag_counts"], {"kill": 3, "attack": 3, "threat": 3})
+        
+        # Worker processes give the same records, in order
+        self.assertEqual(self.validator.validate_many(responses, chunk_size=4, max_workers=2), serial)
+        self.assertEqual(self.validator.validate_many([])["statistics"]["validated"], 0)
+    
+    def test_keywords_match_whole_words(self):
+        """Test that keywords and phrases only match as whole words"""
+        result = self.validator.validate_response("What a charming, skillful answer.")
+        self.assertTrue(result["is_safe"])
+        self.assertEqual(result["issues"], [])
+        
+        context = [{"sender": "user", "message": "Do you remember?"}]
+        result = self.validator._check_consistency("Hmm, I don't know. Maybe?", context)
+        self.assertEqual(result["issues"], ["Response may be too generic: 'I don't know'"])
+        self.assertEqual(self.validator._check_consistency("Maybelline", context)["issues"], [])
+        
+        # Growing the lists takes a recompile, not a slower scan
+        self.validator.safety_keywords.extend(f"term{index}" for index in range(5000))
+        self.validator.inappropriate_patterns.append("shut up")
+        self.validator.compile()
+        result = self.validator.validate_response("Oh SHUT UP, term4999 is harmless")
+        self.assertEqual(result["issues"], ["Inappropriate content: 'shut up' detected",
+                                            "Potential safety concern: 'term4999' detected"])
+
+        # A phrase in more than one list is reported under each
+        self.validator.generic_responses.append("Shut up")
+        self.validator.compile()
+        self.assertEqual(self.validator._matcher.find("shut up!"),
+                         [("inappropriate", "shut up"), ("generic", "Shut up")])
+        self.assertFalse(self.validator.validate_response("shut up!")["is_safe"])
+        self.assertEqual(self.validator._check_consistency("shut up!", context)["issues"],
+                         ["Response may be too generic: 'Shut up'"])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,347 @@
+"""
+Text Analysis Engine
+
+Single-pass tokenizer shared by the personality trait extractors.
+The corpus is scanned once and reduced to word, mark, sentence and
+phrase counts that every extractor reads from.
+"""
+
+import os
+import re
+import mmap
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+# Emoticons first so ":)" is not split into two punctuation tokens,
+# then words, sentence terminators and any other single symbol.
+TOKEN_PATTERN = re.compile(r":\)+|:\(+|;\)+|\w+|[.!?]+|[^\w\s]")
+MULTI_PUNCT_PATTERN = re.compile(r"[!?]{2,}")
+
+PHRASE_STARTERS = frozenset(["I", "You"])
+PHRASE_PIVOTS = frozenset(["always", "never"])
+SENTENCE_END_CHARS = frozenset(".!?")
+EMOTICON_STARTS = frozenset(":;")
+
+# A sentence terminator followed by whitespace: splitting a document here
+# leaves both token streams and sentence state unchanged.
+SENTENCE_BOUNDARY_PATTERN = re.compile(r"[.!?](?=\s)")
+DEFAULT_SHARD_SIZE = 4 * 1024 * 1024  # characters per worker task
+
+
+def _as_text(item):
+    """
+    Get the text of one document
+    
+    Strings pass through, UTF-8 buffers (bytes, memoryview slices) are
+    decoded, message records contribute only their text, and anything
+    else is str()-ed.
+    """
+    if isinstance(item, str):
+        return item
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        return str(item, 'utf-8')
+    text = getattr(item, 'text', None)
+    if isinstance(text, str):
+        return text
+    return str(item)
+
+
+def iter_documents(text_data):
+    """
+    Normalize analysis input into a sequence of document strings
+    
+    Lists and tuples become lists; iterators such as
+    FileImporter.iter_chunks are consumed lazily, one document at a time.
+    UTF-8 buffers such as memory-mapped slices are decoded one at a time,
+    and message records (FileImporter.iter_messages) contribute only
+    their text.
+    
+    Args:
+        text_data (str, bytes, list or iterator): Text data to analyze
+    
+    Returns:
+        iterable: Document strings
+    """
+    if isinstance(text_data, (list, tuple)):
+        return [_as_text(item) for item in text_data]
+    if isinstance(text_data, Iterator):
+        return (_as_text(item) for item in text_data)
+    return [_as_text(text_data)]
+
+
+def split_text(text, target_size):
+    """
+    Split a document into segments of roughly target_size characters
+    
+    Segments end on sentence boundaries, so analyzing them separately and
+    merging the statistics is identical to analyzing the whole document.
+    
+    Args:
+        text (str): Document to split
+        target_size (int): Preferred segment size in characters
+    
+    Yields:
+        str: Consecutive segments of the document
+    """
+    start = 0
+    length = len(text)
+    while length - start > target_size:
+        match = SENTENCE_BOUNDARY_PATTERN.search(text, start + target_size)
+        if match is None:
+            break
+        yield text[start:match.end()]
+        start = match.end()
+    if start < length:
+        yield text[start:]
+
+
+def _iter_shards(documents, shard_size):
+    """
+    Group documents into shards of roughly shard_size characters
+    
+    Yields:
+        list: Documents or document segments for one worker task
+    """
+    shard = []
+    shard_length = 0
+    for document in documents:
+        for segment in split_text(document, shard_size):
+            shard.append(segment)
+            shard_length += len(segment)
+            if shard_length >= shard_size:
+                yield shard
+                shard = []
+                shard_length = 0
+    if shard:
+        yield shard
+
+
+def _shard_statistics(shard):
+    """Worker task: build statistics for one shard"""
+    stats = TextStatistics()
+    for segment in shard:
+        stats.add_text(segment)
+    return stats
+
+
+def collect_statistics(text_data, max_workers=None, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Build text statistics, sharding large corpora across processes
+    
+    Shards are analyzed in a ProcessPoolExecutor and the partial
+    statistics are merged, which gives the same result as a serial pass.
+    
+    Args:
+        text_data (str or list): Text data to analyze
+        max_workers (int, optional): Worker processes; defaults to the CPU count
+        shard_size (int): Characters per worker task
+    
+    Returns:
+        TextStatistics: Statistics for all documents
+    """
+    documents = list(iter_documents(text_data))
+    total_size = sum(len(document) for document in documents)
+    workers = max_workers or os.cpu_count() or 1
+    
+    if workers <= 1 or total_size <= shard_size:
+        return TextStatistics.from_text(documents)
+    
+    stats = TextStatistics()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for partial in executor.map(_shard_statistics, _iter_shards(documents, shard_size)):
+            stats.merge(partial)
+    return stats
+
+
+def _mapped_range_statistics(task):
+    """Worker task: map the file and build statistics for one byte range"""
+    file_path, start, end = task
+    stats = TextStatistics()
+    with open(file_path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                with view[start:end] as piece:
+                    stats.add_text(str(piece, 'utf-8'))
+    return stats
+
+
+def collect_mapped_statistics(file_path, ranges, max_workers=None):
+    """
+    Build text statistics for byte ranges of a memory-mapped file
+    
+    Workers receive only (path, start, end) and map the file themselves,
+    so they share the operating system's page cache instead of each
+    receiving a pickled copy of the text. Ranges should end on message
+    boundaries, e.g. from FileImporter.iter_message_ranges.
+    
+    Args:
+        file_path (str): Path to a UTF-8 text file
+        ranges (iterable): (start, end) byte offsets covering the file
+        max_workers (int, optional): Worker processes; defaults to the CPU count
+    
+    Returns:
+        TextStatistics: Statistics for all ranges
+    """
+    tasks = [(file_path, start, end) for start, end in ranges]
+    workers = max_workers or os.cpu_count() or 1
+    
+    stats = TextStatistics()
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            stats.merge(_mapped_range_statistics(task))
+        return stats
+    
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        for partial in executor.map(_mapped_range_statistics, tasks):
+            stats.merge(partial)
+    return stats
+
+
+def _is_word(token):
+    """Return True if the token matched the \\w+ alternative"""
+    first = token[0]
+    return first.isalnum() or first == "_"
+
+
+class TextStatistics:
+    """Counts gathered from one tokenizer pass over a corpus"""
+    
+    def __init__(self):
+        """Initialize empty statistics"""
+        self.word_counts = Counter()
+        self.humor_marks = 0
+        self.sentence_count = 0
+        self.sentence_word_total = 0
+        self.phrase_counts = Counter()
+    
+    def add_text(self, text):
+        """
+        Tokenize a document once and fold it into the statistics
+        
+        Sentences and phrases never span two documents.
+        
+        Args:
+            text (str): Document to add
+        """
+        tokens = TOKEN_PATTERN.findall(text)
+        if not tokens:
+            return
+        
+        # Case-sensitive counts come from C; folding is O(vocabulary)
+        for token, count in Counter(tokens).items():
+            if _is_word(token):
+                self.word_counts[token.lower()] += count
+            elif token[0] in EMOTICON_STARTS:
+                self.humor_marks += count
+            elif token[0] in SENTENCE_END_CHARS and len(token) > 1:
+                self.humor_marks += len(MULTI_PUNCT_PATTERN.findall(token)) * count
+        
+        sentence_words = 0
+        prev2 = prev1 = None
+        phrase_counts = self.phrase_counts
+        for token in tokens:
+            if _is_word(token):
+                sentence_words += 1
+                # prev2 set implies prev1 set: both are words in this run
+                if prev2 is not None and (prev2 in PHRASE_STARTERS or prev1 in PHRASE_PIVOTS):
+                    phrase_counts[f"{prev2} {prev1} {token}"] += 1
+                prev2, prev1 = prev1, token
+                continue
+            
+            prev2 = prev1 = None
+            if token[0] in SENTENCE_END_CHARS and sentence_words:
+                self.sentence_count += 1
+                self.sentence_word_total += sentence_words
+                sentence_words = 0
+        
+        if sentence_words:
+            self.sentence_count += 1
+            self.sentence_word_total += sentence_words
+    
+    @classmethod
+    def from_text(cls, text_data):
+        """
+        Build statistics for text data
+        
+        Args:
+            text_data (str, list or iterator): Text data to analyze
+        
+        Returns:
+            TextStatistics: Statistics for all documents
+        """
+        stats = cls()
+        for document in iter_documents(text_data):
+            stats.add_text(document)
+        return stats
+    
+    def merge(self, other):
+        """
+        Merge another set of statistics into this one
+        
+        Every field is a count or a sum, so merging partial statistics
+        gives exactly the statistics of a single pass over all documents.
+        
+        Args:
+            other (TextStatistics): Statistics to fold in
+        
+        Returns:
+            TextStatistics: self, for chaining
+        """
+        self.word_counts.update(other.word_counts)
+        self.humor_marks += other.humor_marks
+        self.sentence_count += other.sentence_count
+        self.sentence_word_total += other.sentence_word_total
+        self.phrase_counts.update(other.phrase_counts)
+        return self
+    
+    def copy(self):
+        """
+        Return an independent copy of the statistics
+        
+        Returns:
+            TextStatistics: Copy of these statistics
+        """
+        return TextStatistics().merge(self)
+    
+    def __eq__(self, other):
+        if not isinstance(other, TextStatistics):
+            return NotImplemented
+        return (self.word_counts == other.word_counts
+                and self.humor_marks == other.humor_marks
+                and self.sentence_count == other.sentence_count
+                and self.sentence_word_total == other.sentence_word_total
+                and self.phrase_counts == other.phrase_counts)
+    
+    def count_present(self, words):
+        """
+        Count how many of the given words occur at least once
+        
+        Args:
+            words (iterable): Lowercase words to look up
+        
+        Returns:
+            int: Number of distinct words present
+        """
+        word_counts = self.word_counts
+        return sum(1 for word in words if word in word_counts)
+    
+    def count_occurrences(self, words):
+        """
+        Count total occurrences of the given words
+        
+        Args:
+            words (iterable): Lowercase words to look up
+        
+        Returns:
+            int: Total occurrences
+        """
+        word_counts = self.word_counts
+        return sum(word_counts.get(word, 0) for word in words)
+    
+    @property
+    def average_sentence_length(self):
+        """Average number of words per sentence"""
+        if not self.sentence_count:
+            return 0
+        return self.sentence_word_total / self.sentence_count
\ No newline at end of file
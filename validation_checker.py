@@ -4,7 +4,101 @@ Validation Checker Utility
 Ensures generated messages remain contextually consistent and emotionally safe.
 """
 
-from typing import List, Dict, Optional
+import os
+import re
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import List, Dict, Optional, Iterable, Tuple, NamedTuple
+
+# Words, keeping contractions such as "don't" whole
+WORD_PATTERN = re.compile(r"\w+(?:'\w+)*")
+
+DEFAULT_VALIDATION_CHUNK = 2000  # Responses per worker task in validate_many
+
+
+class ValidationRecord(NamedTuple):
+    """A response validate_many flagged: its position and the phrases found"""
+    index: int
+    flags: Tuple[str, ...]
+
+
+class PhraseMatcher:
+    """
+    Finds whole-word phrases in text in one pass
+    
+    The phrases are compiled into a trie over words, so scanning costs
+    one lookup per word of the text (plus a few for multi-word phrases)
+    however many phrases there are, and "harm" never matches inside
+    "charming".
+    """
+    
+    def __init__(self, phrases: Iterable[Tuple[str, object]]):
+        """
+        Compile the phrases
+        
+        Args:
+            phrases (Iterable[Tuple[str, object]]): (phrase, label) pairs;
+                the label is what find reports for the phrase
+        """
+        self.root = {}
+        for phrase, label in phrases:
+            words = WORD_PATTERN.findall(phrase.lower())
+            if not words:
+                continue
+            node = self.root
+            for word in words:
+                node = node.setdefault(word, {})
+            # The end of a phrase is marked by the None key, holding every
+            # label the phrase was given
+            labels = node.get(None, ())
+            if label not in labels:
+                node[None] = labels + (label,)
+    
+    def find(self, text: str) -> List:
+        """
+        Find the phrases in a text
+        
+        Args:
+            text (str): The text to scan
+        
+        Returns:
+            List: Labels of the phrases found, each once, in order of first occurrence
+        """
+        words = WORD_PATTERN.findall(text.lower())
+        found = {}
+        root = self.root
+        for start, word in enumerate(words):
+            node = root.get(word)
+            index = start + 1
+            while node is not None:
+                for label in node.get(None, ()):
+                    found[label] = None
+                if index == len(words):
+                    break
+                node = node.get(words[index])
+                index += 1
+        return list(found)
+
+
+# The checker a validate_many worker process uses, built once per process
+_worker_checker = None
+
+
+def _init_worker(safety_keywords, inappropriate_patterns, generic_responses):
+    """Worker initializer: build the checker from the parent's phrase lists"""
+    global _worker_checker
+    _worker_checker = ValidationChecker()
+    _worker_checker.safety_keywords = safety_keywords
+    _worker_checker.inappropriate_patterns = inappropriate_patterns
+    _worker_checker.generic_responses = generic_responses
+    _worker_checker.compile()
+
+
+def _validate_chunk_task(task):
+    """Worker task: validate one chunk of responses"""
+    start, responses = task
+    return _worker_checker._validate_chunk(start, responses)
 
 
 class ValidationChecker:
@@ -19,6 +113,24 @@ class ValidationChecker:
         self.inappropriate_patterns = [
             # Add patterns that would be inappropriate
         ]
+        self.generic_responses = [
+            "I don't know", "I'm not sure", "Maybe",
+            "I don't understand", "What do you mean?"
+        ]
+        self.compile()
+    
+    def compile(self):
+        """
+        Compile the phrase lists into one matcher
+        
+        Call this again after changing safety_keywords,
+        inappropriate_patterns or generic_responses.
+        """
+        self._matcher = PhraseMatcher(
+            [(keyword, ("safety", keyword)) for keyword in self.safety_keywords]
+            + [(pattern, ("inappropriate", pattern)) for pattern in self.inappropriate_patterns]
+            + [(generic, ("generic", generic)) for generic in self.generic_responses]
+        )
     
     def validate_response(self, response: str, context: Optional[List] = None) -> Dict:
         """
@@ -38,27 +150,31 @@ class ValidationChecker:
             "confidence": 0.9
         }
         
+        # One scan finds every phrase the checks look for
+        matches = self._matcher.find(response)
+        
         # Check for safety concerns
-        safety_check = self._check_safety(response)
+        safety_check = self._check_safety(response, matches)
         if not safety_check["is_safe"]:
             validation_results["is_safe"] = False
             validation_results["issues"].extend(safety_check["issues"])
         
         # Check for consistency with context
         if context:
-            consistency_check = self._check_consistency(response, context)
+            consistency_check = self._check_consistency(response, context, matches)
             if not consistency_check["is_consistent"]:
                 validation_results["is_consistent"] = False
                 validation_results["issues"].extend(consistency_check["issues"])
         
         return validation_results
     
-    def _check_safety(self, response: str) -> Dict:
+    def _check_safety(self, response: str, matches: Optional[List] = None) -> Dict:
         """
         Check response for safety concerns
         
         Args:
             response (str): The response to check
+            matches (List, optional): Phrases already found in the response
             
         Returns:
             Dict: Safety check results
@@ -66,27 +182,31 @@ class ValidationChecker:
         issues = []
         is_safe = True
         
-        # Convert to lowercase for checking
-        response_lower = response.lower()
+        if matches is None:
+            matches = self._matcher.find(response)
         
-        # Check for explicit safety keywords
-        for keyword in self.safety_keywords:
-            if keyword in response_lower:
+        # Check for explicit safety keywords and inappropriate content, as whole words
+        for kind, phrase in matches:
+            if kind == "safety":
+                is_safe = False
+                issues.append(f"Potential safety concern: '{phrase}' detected")
+            elif kind == "inappropriate":
                 is_safe = False
-                issues.append(f"Potential safety concern: '{keyword}' detected")
+                issues.append(f"Inappropriate content: '{phrase}' detected")
         
         return {
             "is_safe": is_safe,
             "issues": issues
         }
     
-    def _check_consistency(self, response: str, context: List) -> Dict:
+    def _check_consistency(self, response: str, context: List, matches: Optional[List] = None) -> Dict:
         """
         Check response for consistency with context
         
         Args:
             response (str): The response to check
             context (List): Conversation context
+            matches (List, optional): Phrases already found in the response
             
         Returns:
             Dict: Consistency check results
@@ -97,16 +217,13 @@ class ValidationChecker:
         # Basic consistency checks
         # In a full implementation, this would be more sophisticated
         
-        # Check if response is too generic
-        generic_responses = [
-            "I don't know", "I'm not sure", "Maybe", 
-            "I don't understand", "What do you mean?"
-        ]
+        if matches is None:
+            matches = self._matcher.find(response)
         
-        response_lower = response.lower()
-        for generic in generic_responses:
-            if generic.lower() in response_lower:
-                issues.append(f"Response may be too generic: '{generic}'")
+        # Check if response is too generic
+        for kind, phrase in matches:
+            if kind == "generic":
+                issues.append(f"Response may be too generic: '{phrase}'")
                 break
         
         return {
@@ -114,6 +231,95 @@ class ValidationChecker:
             "issues": issues
         }
     
+    def validate_many(self, responses: Iterable[str], chunk_size: int = DEFAULT_VALIDATION_CHUNK,
+                      max_workers: Optional[int] = None) -> Dict:
+        """
+        Validate many responses for safety, e.g. to audit conversation logs
+        
+        Responses are read lazily in chunks and validated across worker
+        processes, with at most two chunks per worker in flight, so a
+        stream of millions of messages is never held in memory. Like
+        validate_response without context, only safety is checked.
+        
+        Args:
+            responses (Iterable[str]): Responses to validate
+            chunk_size (int): Responses per worker task
+            max_workers (int, optional): Worker processes; defaults to the
+                CPU count, and 1 validates in this process
+        
+        Returns:
+            Dict: "records", a ValidationRecord for each flagged response in
+                input order, and "statistics" over all of them
+        """
+        chunks = self._iter_chunks(responses, chunk_size)
+        workers = max_workers or os.cpu_count() or 1
+        if workers <= 1:
+            results = (self._validate_chunk(start, chunk) for start, chunk in chunks)
+        else:
+            results = self._validate_in_pool(chunks, workers)
+        
+        records = []
+        counts = Counter()
+        validated = 0
+        for chunk_count, chunk_records in results:
+            validated += chunk_count
+            records.extend(chunk_records)
+            for record in chunk_records:
+                counts.update(record.flags)
+        
+        return {
+            "records": records,
+            "statistics": {
+                "validated": validated,
+                "unsafe": len(records),
+                "safe_rate": 1 - len(records) / validated if validated else 1.0,
+                "flag_counts": dict(counts.most_common())
+            }
+        }
+    
+    @staticmethod
+    def _iter_chunks(responses: Iterable[str], chunk_size: int):
+        """Yield (index of the first response, list of responses) chunks"""
+        iterator = iter(responses)
+        start = 0
+        while True:
+            chunk = list(islice(iterator, max(chunk_size, 1)))
+            if not chunk:
+                return
+            yield start, chunk
+            start += len(chunk)
+    
+    def _validate_in_pool(self, chunks, workers: int):
+        """Validate chunks across worker processes, yielding results in order"""
+        initargs = (self.safety_keywords, self.inappropriate_patterns, self.generic_responses)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+            in_flight = deque()
+            for task in chunks:
+                if len(in_flight) >= workers * 2:
+                    yield in_flight.popleft().result()
+                in_flight.append(executor.submit(_validate_chunk_task, task))
+            while in_flight:
+                yield in_flight.popleft().result()
+    
+    def _validate_chunk(self, start: int, responses: List[str]) -> Tuple[int, List[ValidationRecord]]:
+        """
+        Validate a chunk of responses
+        
+        Args:
+            start (int): Index of the chunk's first response
+            responses (List[str]): The responses
+        
+        Returns:
+            Tuple[int, List[ValidationRecord]]: Responses checked and records of those flagged
+        """
+        find = self._matcher.find
+        records = []
+        for offset, response in enumerate(responses):
+            flags = tuple(phrase for kind, phrase in find(response) if kind != "generic")
+            if flags:
+                records.append(ValidationRecord(start + offset, flags))
+        return len(responses), records
+    
     def validate_personality_consistency(self, response: str, personality_profile: Dict) -> Dict:
         """
         Validate that response is consistent with personality profile